@@ -19,468 +19,537 @@
 #   2. Wait for Alicat A pressure to stabilize
 #   3. Close valve on Alicat A
 #   4. Record pressure decay over time
+#
+# Each station (stations.py) is one bench with its own serial port, Alicat
+# pair, part number and output file. Runs are AcquisitionWorkers
+# (acquisition.py) on one shared Scheduler, so several benches run at once.
+# The GUI drains their samples every DRAIN_INTERVAL_MS.
+# Rows are journaled as they arrive and the xlsx is written once at the end
+# (run_recorder.py), on a background Finalizer so the next part can start
+# (batch.py). The live plot blits persistent traces (live_plot.py).
+# Startup: the window appears before matplotlib and openpyxl are loaded
+# (deferred_imports.py), the plot canvas is built when first needed and
+# serial ports open on a background thread, retrying every PORT_RETRY_MS.
+# Each run uses the recipe for its part number (recipes.py): Test.ini is
+# checked every RECIPE_CHECK_MS and reloaded when it changes, between runs.
 
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, filedialog
 import serial
 import time
-import datetime
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import os
-from openpyxl import Workbook
+import sys
+import collections
+import queue
+import threading
+from run_recorder import RunRecorder
+from run_metrics import RunMetrics
+from alicat import AlicatLink
+from alicat_bus import SerialTransport
+from acquisition import AcquisitionWorker, Scheduler
+from stations import Station, parse_stations
+from batch import Finalizer, read_part_numbers
+import ini_config
+from ini_config import OUTPUT_PATH, SERIAL_PORT
+from recipes import DEFAULT_PROFILE, RecipeStore
+from deferred_imports import RECORDER_PRELOAD, preload
 
-# Change path name for your box folder
-path = r"C:\Users\patri\RnD\SW Test Data"
+# How often the GUI drains the acquisition workers (ms)
+DRAIN_INTERVAL_MS = 50
+
+# How long a station whose port failed to open waits before trying again (ms)
+PORT_RETRY_MS = 5000
+
+# How often Test.ini is checked for changes (ms)
+RECIPE_CHECK_MS = 1000
+
+# Test Parameters panel: (parameter, label, unit), laid out in rows of three
+PARAMETER_LABELS = [
+    ('a_flow_test_pressure', "A Flow Test Pressure", "PSI"),
+    ('b_flow_test_pressure', "B Flow Test Pressure", "PSI"),
+    ('b_decay_test_pressure', "B Decay Test Pressure", "PSI"),
+    ('flow_sample_time', "Flow Sample Time", "s"),
+    ('pressure_sample_time', "Pressure Sample Time", "s"),
+    ('read_rate', "Read Rate", "s"),
+]
 
 class DualAlicatTestApp:
-    def __init__(self, root):
+    def __init__(self, root, ports=None):
         self.root = root
         self.root.title("Catheter Pressure Flow Test v1.0")
         
-        # Initialize serial connection
-        try:
-            self.ser = serial.Serial('COM23', 38400, timeout=1)  #  Connect throug BB9.
-        except serial.SerialException as e:
-            messagebox.showerror("Serial Error", f"Could not open serial port: {e}")
-            self.root.quit()
-            return
+        # Read configuration from ini file: the station list plus the default
+        # and per part number recipes (pressures are absolute PSI)
+        self.read_ini()
         
-        # Initialize test parameters - Set pressures using absolute pressure (PSI)
-        self.ambient_pressure = 14.7  # PSI
-        self.a_flow_test_pressure = self.ambient_pressure + 10.0  # PSI
-        self.b_flow_test_pressure = 0.0
-        self.a_decay_test_pressure = 0.0
-        self.b_decay_test_pressure = 0.0
-        self.flow_sample_time = 5.0 # seconds
-        self.pressure_sample_time = 20.0
-        self.read_rate = .25
-        self.pressure_read_rate = 1.0
-        self.pressurize_time = 10.0
+        # Stations: command-line ports (e.g. the ptys printed by alicat_emulator.py),
+        # else STATIONS from Test.ini, else one on SERIAL_PORT
+        self.stations = [Station(name, port) for name, port in
+                         parse_stations(ports or self.stations_config or [SERIAL_PORT])]
         
-        # Read configuration from ini file
-        self.read_ini()
+        # Ports are opened in the background once the window is up
+        self.port_results = queue.Queue()
+        self.port_retry = None
         
-        # Data storage
-        self.time_data = []
-        self.pressure_a_data = []
-        self.pressure_b_data = []
-        self.flow_a_data = []
-        self.flow_b_data = []
+        # All stations' runs share one acquisition loop
+        self.scheduler = Scheduler()
         
-        # Excel workbook
-        self.workbook = None
-        self.settings_sheet = None
-        self.data_sheet = None
-        self.excel_path = None
+        # Batch queue of part numbers; finished runs are written in the background
+        self.batch = collections.deque()
+        self.finalizer = Finalizer()
         
         # Build GUI
         self.build_gui()
+        self.connect_ports()
+        preload(RECORDER_PRELOAD)
+        self.root.after(DRAIN_INTERVAL_MS, self.drain_workers)
+        self.root.after(RECIPE_CHECK_MS, self.check_recipes)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
     def read_ini(self):
         """Read settings from Test.ini file"""
-        try:
-            with open("Test.ini", "r") as file:
-                for line in file:
-                    line = line.strip()
-                    if not line or line.startswith('#'):
-                        continue
-                    if "=" in line:
-                        key, value = line.split('=', 1)
-                        key = key.strip()
-                        value = value.strip()
-                        
-                        if key == "A_FLOW_TEST_PRESSURE":
-                            self.a_flow_test_pressure = float(value)
-                        elif key == "B_FLOW_TEST_PRESSURE":
-                            self.b_flow_test_pressure = float(value)
-                        elif key == "A_DECAY_TEST_PRESSURE":
-                            self.a_decay_test_pressure = float(value)
-                        elif key == "B_DECAY_TEST_PRESSURE":
-                            self.b_decay_test_pressure = float(value)
-                        elif key == "FLOW_SAMPLE_TIME":
-                            self.flow_sample_time = float(value)
-                        elif key == "PRESSURE_SAMPLE_TIME":
-                            self.pressure_sample_time = float(value)
-                        elif key == "READ_RATE":
-                            self.read_rate = float(value)
-                        elif key == "PRESSURE_READ_RATE":
-                            self.pressure_read_rate = float(value)
-                        elif key == "PRESSURIZE_TIME":
-                            self.pressurize_time = float(value)
-        except FileNotFoundError:
+        if not os.path.exists(ini_config.INI_FILE):
             messagebox.showwarning("Warning", "Test.ini file not found! Using default values.")
-            self.create_default_ini()
+            ini_config.create_default_ini()
+        self.recipes = RecipeStore(ini_config.INI_FILE)
+        self.recipe_error = self.recipes.error
+        if self.recipe_error:
+            messagebox.showwarning("Warning", f"{self.recipe_error}\nUsing default values.")
+        # Test parameters always come from self.recipes; only the station list is read once
+        self.stations_config = self.recipes.default.config['stations_config']
+    
+    def check_recipes(self):
+        """Reload Test.ini if it changed; errors are logged once and the last good recipes kept"""
+        if self.recipes.refresh():
+            self.results_list.insert(tk.END, f"Reloaded {ini_config.INI_FILE}")
+            self.results_list.see(tk.END)
+            self.show_recipe()
+        if self.recipes.error and self.recipes.error != self.recipe_error:
+            self.results_list.insert(tk.END, f"{self.recipes.error} (keeping previous settings)")
+            self.results_list.see(tk.END)
+        self.recipe_error = self.recipes.error
+        self.root.after(RECIPE_CHECK_MS, self.check_recipes)
     
-    def create_default_ini(self):
-        """Create a default Test.ini file"""
-        with open("Test.ini", "w") as file:
-            file.write("# Dual Alicat Test Configuration\n")
-            file.write("# Pressures in PSI\n")
-            file.write("# Times in seconds\n\n")
-            file.write("A_FLOW_TEST_PRESSURE=10.0\n")
-            file.write("B_FLOW_TEST_PRESSURE=0.0\n")
-            file.write("A_DECAY_TEST_PRESSURE=0.0\n")
-            file.write("B_DECAY_TEST_PRESSURE=0.0\n")
-            file.write("FLOW_SAMPLE_TIME=5.0\n")
-            file.write("PRESSURE_SAMPLE_TIME=20.0\n")
-            file.write("READ_RATE=1.0\n")
-            file.write("PRESSURE_READ_RATE=1.0\n")
-            file.write("PRESSURIZE_TIME=10.0\n")
+    def show_recipe(self, *args):
+        """Show the parameters the plotted station's part number will run with"""
+        recipe = self.recipes.recipe_for(self.plotted_station().vars['part_number'].get())
+        self.params_frame.config(text=f"Test Parameters - {recipe.name}")
+        for name, label, unit in PARAMETER_LABELS:
+            self.param_vars[name].set(f"{label}: {recipe.config[name]} {unit}")
+    
+    def connect_ports(self):
+        """Open the ports of disconnected stations on a background thread"""
+        self.port_retry = None
+        stations = [station for station in self.stations if station.ser is None and not station.connecting]
+        if not stations:
+            return
+        for station in stations:
+            station.connecting = True
+            station.vars['phase'].set("Connecting")
+        threading.Thread(target=self.open_ports, args=(stations,), name="open-ports", daemon=True).start()
+    
+    def open_ports(self, stations):
+        """Runs on the connect thread: try each port and queue the outcome for drain_ports"""
+        for station in stations:
+            try:
+                ser = serial.Serial(station.port, 38400, timeout=1)  #  Connect throug BB9.
+                self.port_results.put((station, ser, None))
+            except Exception as e:
+                # SerialException, or ValueError/OSError from a bad port setting: any
+                # failure must reach drain_ports, which clears station.connecting
+                self.port_results.put((station, None, str(e) or type(e).__name__))
+    
+    def drain_ports(self):
+        """Enable stations whose port opened; failed ones are retried every PORT_RETRY_MS"""
+        changed = False
+        while not self.port_results.empty():
+            station, ser, error = self.port_results.get_nowait()
+            station.connecting = False
+            changed = True
+            if ser is not None:
+                station.ser = ser
+                station.error = None
+                station.vars['phase'].set("Idle")
+                continue
+            if error != station.error:
+                # Log each new failure once, without a dialog: a busy port is not fatal
+                self.results_list.insert(tk.END, f"{station.name} ({station.port}): could not open port: {error}")
+                self.results_list.see(tk.END)
+            station.error = error
+            station.vars['phase'].set("Port Error")
+        
+        if changed:
+            self.update_buttons()
+            self.dispatch_batch()
+        if self.port_retry is None and any(station.ser is None and not station.connecting for station in self.stations):
+            self.port_retry = self.root.after(PORT_RETRY_MS, self.connect_ports)
     
     def build_gui(self):
         """Build the GUI interface"""
-        # Part Number Entry
-        tk.Label(self.root, text="Part Number:").grid(row=0, column=0, padx=5, pady=5, sticky='e')
-        self.part_number = tk.StringVar()
-        tk.Entry(self.root, textvariable=self.part_number, width=30).grid(row=0, column=1, padx=5, pady=5)
-        
         # Test Parameters Display
-        params_frame = tk.LabelFrame(self.root, text="Test Parameters", padx=10, pady=10)
-        params_frame.grid(row=1, column=0, columnspan=2, padx=10, pady=10, sticky='ew')
-        
-        tk.Label(params_frame, text=f"A Flow Test Pressure: {self.a_flow_test_pressure} PSI").grid(row=0, column=0, sticky='w')
-        tk.Label(params_frame, text=f"B Flow Test Pressure: {self.b_flow_test_pressure} PSI").grid(row=1, column=0, sticky='w')
-        tk.Label(params_frame, text=f"B Decay Test Pressure: {self.b_decay_test_pressure} PSI").grid(row=2, column=0, sticky='w')
-        tk.Label(params_frame, text=f"Flow Sample Time: {self.flow_sample_time} s").grid(row=0, column=1, padx=20, sticky='w')
-        tk.Label(params_frame, text=f"Pressure Sample Time: {self.pressure_sample_time} s").grid(row=1, column=1, padx=20, sticky='w')
-        tk.Label(params_frame, text=f"Read Rate: {self.read_rate} s").grid(row=2, column=1, padx=20, sticky='w')
-        
-        # Real-time Data Display
-        data_frame = tk.LabelFrame(self.root, text="Real-time Data", padx=10, pady=10)
-        data_frame.grid(row=2, column=0, columnspan=2, padx=10, pady=10, sticky='ew')
-        
-        tk.Label(data_frame, text="Alicat A Pressure:").grid(row=0, column=0, sticky='e')
-        self.pressure_a_display = tk.StringVar(value="0.00")
-        tk.Label(data_frame, textvariable=self.pressure_a_display, font=('Arial', 12, 'bold')).grid(row=0, column=1, sticky='w')
-        tk.Label(data_frame, text="PSI").grid(row=0, column=2, sticky='w')
-        
-        tk.Label(data_frame, text="Alicat B Pressure:").grid(row=1, column=0, sticky='e')
-        self.pressure_b_display = tk.StringVar(value="0.00")
-        tk.Label(data_frame, textvariable=self.pressure_b_display, font=('Arial', 12, 'bold')).grid(row=1, column=1, sticky='w')
-        tk.Label(data_frame, text="PSI").grid(row=1, column=2, sticky='w')
-        
-        tk.Label(data_frame, text="Alicat A Flow:").grid(row=0, column=3, sticky='e', padx=(20, 0))
-        self.flow_a_display = tk.StringVar(value="0.000")
-        tk.Label(data_frame, textvariable=self.flow_a_display, font=('Arial', 12, 'bold')).grid(row=0, column=4, sticky='w')
-        tk.Label(data_frame, text="SLPM").grid(row=0, column=5, sticky='w')
-        
-        tk.Label(data_frame, text="Alicat B Flow:").grid(row=1, column=3, sticky='e', padx=(20, 0))
-        self.flow_b_display = tk.StringVar(value="0.000")
-        tk.Label(data_frame, textvariable=self.flow_b_display, font=('Arial', 12, 'bold')).grid(row=1, column=4, sticky='w')
-        tk.Label(data_frame, text="SLPM").grid(row=1, column=5, sticky='w')
-        
-        # Test Status
-        status_frame = tk.LabelFrame(self.root, text="Test Status", padx=10, pady=10)
-        status_frame.grid(row=3, column=0, columnspan=2, padx=10, pady=10, sticky='ew')
-        
-        tk.Label(status_frame, text="Phase:").grid(row=0, column=0, sticky='e')
-        self.test_phase = tk.StringVar(value="Idle")
-        tk.Label(status_frame, textvariable=self.test_phase, font=('Arial', 12, 'bold'), fg='blue').grid(row=0, column=1, sticky='w')
-        
-        tk.Label(status_frame, text="Time Remaining:").grid(row=0, column=2, sticky='e', padx=(20, 0))
-        self.time_remaining = tk.StringVar(value="0")
-        self.time_remaining_label = tk.Label(status_frame, textvariable=self.time_remaining, 
-                                             font=('Arial', 12, 'bold'), fg='black')
-        self.time_remaining_label.grid(row=0, column=3, sticky='w')
-        tk.Label(status_frame, text="s").grid(row=0, column=4, sticky='w')
+        # (filled in by show_recipe for the plotted station's part number)
+        self.params_frame = tk.LabelFrame(self.root, text="Test Parameters", padx=10, pady=10)
+        self.params_frame.grid(row=0, column=0, columnspan=2, padx=10, pady=10, sticky='ew')
+        
+        self.param_vars = {}
+        for index, (name, label, unit) in enumerate(PARAMETER_LABELS):
+            self.param_vars[name] = tk.StringVar()
+            tk.Label(self.params_frame, textvariable=self.param_vars[name]).grid(
+                row=index % 3, column=index // 3, padx=(0, 20), sticky='w')
+        
+        # Station status panel: one compact row per bench
+        stations_frame = tk.LabelFrame(self.root, text="Stations", padx=10, pady=10)
+        stations_frame.grid(row=1, column=0, columnspan=2, padx=10, pady=10, sticky='ew')
+        
+        headings = ["Plot", "Station", "Part Number", "Phase", "Time (s)",
+                    "A PSI", "B PSI", "A SLPM", "B SLPM"]
+        for column, heading in enumerate(headings):
+            tk.Label(stations_frame, text=heading, font=('Arial', 9, 'bold')).grid(row=0, column=column, padx=4, sticky='w')
+        
+        self.plot_station = tk.IntVar(value=0)
+        multi = len(self.stations) > 1
+        for index, station in enumerate(self.stations):
+            row = index + 1
+            station.vars = {
+                'part_number': tk.StringVar(),
+                'phase': tk.StringVar(value="Connecting"),
+                'remaining': tk.StringVar(value="0"),
+                'pressure_a': tk.StringVar(value="0.00"),
+                'pressure_b': tk.StringVar(value="0.00"),
+                'flow_a': tk.StringVar(value="0.000"),
+                'flow_b': tk.StringVar(value="0.000"),
+            }
+            tk.Radiobutton(stations_frame, variable=self.plot_station, value=index,
+                           command=self.select_plot_station).grid(row=row, column=0)
+            tk.Label(stations_frame, text=f"{station.name} ({station.port})").grid(row=row, column=1, padx=4, sticky='w')
+            tk.Entry(stations_frame, textvariable=station.vars['part_number'], width=20).grid(row=row, column=2, padx=4)
+            station.vars['part_number'].trace_add('write', self.show_recipe)
+            tk.Label(stations_frame, textvariable=station.vars['phase'], font=('Arial', 11, 'bold'), fg='blue',
+                     width=22, anchor='w').grid(row=row, column=3, padx=4, sticky='w')
+            for column, name in enumerate(['remaining', 'pressure_a', 'pressure_b', 'flow_a', 'flow_b'], start=4):
+                tk.Label(stations_frame, textvariable=station.vars[name], font=('Arial', 11, 'bold'),
+                         width=7, anchor='e').grid(row=row, column=column, padx=4)
+            
+            if multi:
+                start = tk.Button(stations_frame, text="Start", bg='green', fg='white', width=6,
+                                  command=lambda s=station: self.start_test(s))
+                stop = tk.Button(stations_frame, text="Stop", bg='red', fg='white', width=6,
+                                 command=lambda s=station: self.stop_test(s))
+                start.grid(row=row, column=9, padx=(10, 2))
+                stop.grid(row=row, column=10, padx=2)
+                station.widgets = {'start': start, 'stop': stop}
+        
+        # Batch queue: scanned or loaded part numbers run back to back
+        batch_frame = tk.LabelFrame(self.root, text="Batch", padx=10, pady=10)
+        batch_frame.grid(row=2, column=0, columnspan=2, padx=10, pady=10, sticky='ew')
+        
+        tk.Label(batch_frame, text="Scan Part Number:").grid(row=0, column=0, sticky='e')
+        self.scan_entry = tk.StringVar()
+        scan = tk.Entry(batch_frame, textvariable=self.scan_entry, width=25)
+        scan.grid(row=0, column=1, padx=5, sticky='w')
+        scan.bind('<Return>', self.scan_part)
+        scan.focus_set()
+        tk.Button(batch_frame, text="Load List...", command=self.load_part_list).grid(row=0, column=2, padx=5)
+        tk.Button(batch_frame, text="Clear Queue", command=self.clear_batch).grid(row=0, column=3, padx=5)
+        self.batch_running = tk.BooleanVar(value=False)
+        tk.Checkbutton(batch_frame, text="Run Batch", variable=self.batch_running,
+                       command=self.dispatch_batch).grid(row=0, column=4, padx=5)
+        
+        self.batch_count = tk.StringVar(value="Queue (0)")
+        tk.Label(batch_frame, textvariable=self.batch_count).grid(row=1, column=0, columnspan=2, sticky='w')
+        tk.Label(batch_frame, text="Results").grid(row=1, column=2, columnspan=3, sticky='w')
+        self.batch_list = tk.Listbox(batch_frame, height=4, width=30)
+        self.batch_list.grid(row=2, column=0, columnspan=2, sticky='ew')
+        self.results_list = tk.Listbox(batch_frame, height=4, width=60)
+        self.results_list.grid(row=2, column=2, columnspan=3, sticky='ew', padx=(5, 0))
         
         # Control Buttons
         button_frame = tk.Frame(self.root, padx=10, pady=10)
-        button_frame.grid(row=4, column=0, columnspan=2)
+        button_frame.grid(row=3, column=0, columnspan=2)
         
-        self.start_button = tk.Button(button_frame, text="Start Test", command=self.start_test, 
-                                      bg='green', fg='white', width=15, height=2)
+        self.start_button = tk.Button(button_frame, text="Start All" if multi else "Start Test",
+                                      command=self.start_all, bg='green', fg='white', width=15, height=2)
         self.start_button.grid(row=0, column=0, padx=5)
         
-        self.stop_button = tk.Button(button_frame, text="Stop Test", command=self.stop_test, 
-                                     bg='red', fg='white', width=15, height=2, state='disabled')
+        self.stop_button = tk.Button(button_frame, text="Stop All" if multi else "Stop Test",
+                                     command=self.stop_all, bg='red', fg='white', width=15, height=2)
         self.stop_button.grid(row=0, column=1, padx=5)
         
-        # Plot Area
-        plot_frame = tk.LabelFrame(self.root, text="Pressure Decay Plot", padx=10, pady=10)
-        plot_frame.grid(row=5, column=0, columnspan=2, padx=10, pady=10, sticky='nsew')
-        
-        self.fig, self.ax = plt.subplots(figsize=(8, 4))
-        self.ax.set_xlabel('Time (s)')
-        self.ax.set_ylabel('Pressure (PSI)')
-        self.ax.set_title('Alicat A Pressure Decay')
-        self.ax.grid(True)
+        # Plot Area: the canvas is built on first use (ensure_live_plot)
+        self.plot_frame = tk.LabelFrame(self.root, text="Live Plot", padx=10, pady=10)
+        self.plot_frame.grid(row=4, column=0, columnspan=2, padx=10, pady=10, sticky='nsew')
         
-        self.canvas = FigureCanvasTkAgg(self.fig, master=plot_frame)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack()
+        self.live_plot = None
+        self.plot_placeholder = tk.Label(self.plot_frame, text="The live plot appears when a test starts",
+                                         fg='gray', height=10)
+        self.plot_placeholder.pack(fill='both', expand=True)
         
         # Configure grid weights for resizing
-        self.root.grid_rowconfigure(5, weight=1)
+        self.root.grid_rowconfigure(4, weight=1)
         self.root.grid_columnconfigure(0, weight=1)
-        
-    def send_command(self, command):
-        """Send command over serial port"""
-        self.ser.write(command.encode())
-        time.sleep(0.1)
+        self.update_buttons()
+        self.show_recipe()
     
-    def read_alicat(self, device):
-        """Read data from specified Alicat device (A or B)"""
-        command = f"{device}\r"
-        self.ser.reset_input_buffer()
-        self.send_command(command)
-        response = self.ser.read_until(b"\r").decode('utf-8', errors='ignore')
-        data = response.split()
-        
-        if len(data) >= 5:
-            # Alicat response format: [ID, Pressure, Temperature, VolumetricFlow, MassFlow, SetPoint, Gas]
-            return {
-                'pressure': float(data[1]),
-                'temperature': float(data[2]),
-                'volumetric_flow': float(data[3]),
-                'mass_flow': float(data[4])
-            }
-        return None
+    def update_buttons(self):
+        """Enable Start/Stop to match which stations are idle or running"""
+        for station in self.stations:
+            if station.widgets:
+                station.widgets['start'].config(state='normal' if station.ser and not station.busy else 'disabled')
+                station.widgets['stop'].config(state='normal' if station.busy else 'disabled')
+        idle = any(station.ser and not station.busy for station in self.stations)
+        self.start_button.config(state='normal' if idle else 'disabled')
+        self.stop_button.config(state='normal' if any(station.busy for station in self.stations) else 'disabled')
     
-    def start_test(self):
-        """Start the dual Alicat test sequence"""
-        if not self.part_number.get():
-            messagebox.showerror("Error", "Please enter a part number.")
+    def plotted_station(self):
+        return self.stations[self.plot_station.get()]
+    
+    def ensure_live_plot(self):
+        """Build the live plot canvas; matplotlib has usually been preloaded by now"""
+        if self.live_plot is None:
+            from live_plot import LivePlot
+            self.plot_placeholder.destroy()
+            self.live_plot = LivePlot(self.plot_frame)
+            self.live_plot.get_tk_widget().pack(fill='both', expand=True)
+        return self.live_plot
+    
+    def select_plot_station(self):
+        """Show the selected station's current run on the live plot"""
+        self.show_recipe()
+        station = self.plotted_station()
+        if self.live_plot is None and not station.busy and not station.recorded:
+            return
+        config = station.recipe.config if station.recipe else self.recipes.default.config
+        self.ensure_live_plot().reset(config['flow_sample_time'], config['pressure_sample_time'])
+        for sample in station.recorded:
+            self.plot_sample(sample)
+        self.refresh_plot(force=True)
+    
+    def scan_part(self, event=None):
+        """Queue the scanned part number (scanners end each code with Enter)"""
+        part_number = self.scan_entry.get().strip()
+        self.scan_entry.set("")
+        if part_number:
+            self.batch.append(part_number)
+            self.dispatch_batch()
+    
+    def load_part_list(self):
+        """Queue every part number in a list file"""
+        file_path = filedialog.askopenfilename(
+            title="Select Part Number List",
+            filetypes=[("Part lists", "*.txt *.csv"), ("All files", "*.*")]
+        )
+        if not file_path:
             return
-        
-        # Disable start button, enable stop button
-        self.start_button.config(state='disabled')
-        self.stop_button.config(state='normal')
-        
-        # Create Excel file
-        part_number = self.part_number.get()
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        os.makedirs(path, exist_ok=True)
-        self.excel_path = os.path.join(path, f"{part_number}_{timestamp}.xlsx")
-        
-        # Create workbook with two sheets
-        self.workbook = Workbook()
-        self.settings_sheet = self.workbook.active
-        self.settings_sheet.title = "Settings"
-        self.data_sheet = self.workbook.create_sheet(title="Data")
-        
-        # Write settings
-        self.settings_sheet.append(["Setting", "Value"])
-        self.settings_sheet.append(["Part Number", part_number])
-        self.settings_sheet.append(["Timestamp", timestamp])
-        self.settings_sheet.append(["A Flow Test Pressure (PSI)", round(self.a_flow_test_pressure, 2)])
-        self.settings_sheet.append(["B Flow Test Pressure (PSI)", round(self.b_flow_test_pressure, 2)])
-        self.settings_sheet.append(["B Decay Test Pressure (PSI)", round(self.b_decay_test_pressure, 2)])
-        self.settings_sheet.append(["Flow Sample Time (s)", round(self.flow_sample_time, 2)])
-        self.settings_sheet.append(["Pressure Sample Time (s)", round(self.pressure_sample_time, 2)])
-        self.settings_sheet.append(["Read Rate (s)", round(self.read_rate, 2)])
-        self.settings_sheet.append(["Pressurize Time (s)", round(self.pressurize_time, 2)])
-        
-        # Write data headers
-        self.data_sheet.append(["Phase", "Time (s)", "A Pressure (PSI)", "B Pressure (PSI)", 
-                               "A Flow (SLPM)", "B Flow (SLPM)"])
-        
-        self.workbook.save(self.excel_path)
-        
-        # Reset data arrays
-        self.time_data = []
-        self.pressure_a_data = []
-        self.pressure_b_data = []
-        self.flow_a_data = []
-        self.flow_b_data = []
-        
-        # Run test sequence
         try:
-            self.run_flow_test()
-            self.run_pressure_decay_test()
-            messagebox.showinfo("Test Complete", f"Test completed successfully!\nData saved to:\n{self.excel_path}")
-        except Exception as e:
-            messagebox.showerror("Test Error", f"An error occurred during the test:\n{e}")
-        finally:
-            self.test_phase.set("Complete")
-            self.start_button.config(state='normal')
-            self.stop_button.config(state='disabled')
-            if self.workbook:
-                self.workbook.save(self.excel_path)
+            self.batch.extend(read_part_numbers(file_path))
+        except (OSError, UnicodeDecodeError) as e:
+            messagebox.showerror("Error", f"Could not read {os.path.basename(file_path)}:\n{e}")
+            return
+        self.dispatch_batch()
     
-    def run_flow_test(self):
-        """Execute the flow test phase"""
-        self.test_phase.set("Flow Test - Setup")
-        self.root.update_idletasks()
-        
-        # Step 1: Release valve on A
-        self.send_command("AC\r")
-        time.sleep(0.5)
-        
-        # Step 2: Set A to flow test pressure
-        self.send_command(f"AS{self.a_flow_test_pressure}\r")
-        
-        # Step 3: Set B to flow test pressure
-        self.send_command(f"BS{self.b_flow_test_pressure}\r")
-        
-        # Step 4: Wait for pressure stabilization
-        self.test_phase.set("Flow Test - Stabilizing")
-        remaining = int(self.pressurize_time)
-        while remaining > 0:
-            self.time_remaining.set(str(remaining))
-            
-            # Read and display pressures during stabilization
-            data_a = self.read_alicat('A')
-            data_b = self.read_alicat('B')
-            if data_a:
-                self.pressure_a_display.set(f"{data_a['pressure']:.2f}")
-                self.flow_a_display.set(f"{data_a['mass_flow']:.3f}")
-            if data_b:
-                self.pressure_b_display.set(f"{data_b['pressure']:.2f}")
-                self.flow_b_display.set(f"{data_b['mass_flow']:.3f}")
-            
-            self.root.update_idletasks()
-            time.sleep(1)
-            remaining -= 1
-        
-        # Step 5: Record mass flow for both devices
-        self.test_phase.set("Flow Test - Recording")
-        flow_start_time = time.time()
-        flow_end_time = flow_start_time + self.flow_sample_time
-        
-        while time.time() < flow_end_time:
-            elapsed = time.time() - flow_start_time
-            remaining_time = int(flow_end_time - time.time())
-            self.time_remaining.set(str(remaining_time))
-            
-            # Read data from both Alicats
-            data_a = self.read_alicat('A')
-            data_b = self.read_alicat('B')
-            
-            if data_a and data_b:
-                # Update displays
-                self.pressure_a_display.set(f"{data_a['pressure']:.2f}")
-                self.pressure_b_display.set(f"{data_b['pressure']:.2f}")
-                self.flow_a_display.set(f"{data_a['mass_flow']:.3f}")
-                self.flow_b_display.set(f"{data_b['mass_flow']:.3f}")
-                
-                # Store data (as numbers, not strings)
-                self.data_sheet.append(["Flow Test", round(elapsed, 2), 
-                                       round(data_a['pressure'], 2), round(data_b['pressure'], 2),
-                                       round(data_a['mass_flow'], 3), round(data_b['mass_flow'], 3)])
-                self.workbook.save(self.excel_path)
-            
-            self.root.update_idletasks()
-        time.sleep(self.read_rate)
+    def clear_batch(self):
+        self.batch.clear()
+        self.update_batch_view()
     
-    def run_pressure_decay_test(self):
-        """Execute the pressure decay test phase"""
-        self.test_phase.set("Decay Test - Setup")
-        self.root.update_idletasks()
-        
-        # Step 1: Set B to decay test pressure (close valve)
-        self.send_command(f"BS{self.b_decay_test_pressure}\r")
-        
-        # Step 2: Wait for A pressure to stabilize
-        self.send_command(f"AS{self.a_decay_test_pressure}\r")  # Ensure A is at flow test pressure for decay test
-        self.test_phase.set("Decay Test - Stabilizing")
-        remaining = int(self.pressurize_time)
-        while remaining > 0:
-            self.time_remaining.set(str(remaining))
-            
-            # Read and display pressures during stabilization
-            data_a = self.read_alicat('A')
-            data_b = self.read_alicat('B')
-            if data_a:
-                self.pressure_a_display.set(f"{data_a['pressure']:.2f}")
-                self.flow_a_display.set(f"{data_a['mass_flow']:.3f}")
-            if data_b:
-                self.pressure_b_display.set(f"{data_b['pressure']:.2f}")
-                self.flow_b_display.set(f"{data_b['mass_flow']:.3f}")
-            
-            self.root.update_idletasks()
-            time.sleep(self.read_rate)
-            remaining -= 1
-        
-        # Step 3: Close valve on A
-        self.send_command("AHC\r")
-        time.sleep(0.25)
-        
-        # Step 4: Record pressure decay
-        self.test_phase.set("Decay Test - Recording")
-        self.time_remaining.set("0")
-        
-        decay_start_time = time.time()
-        decay_end_time = decay_start_time + self.pressure_sample_time
-        
-        # Clear plot data for decay test
-        self.time_data = []
-        self.pressure_a_data = []
+    def update_batch_view(self):
+        self.batch_list.delete(0, tk.END)
+        for part_number in self.batch:
+            self.batch_list.insert(tk.END, part_number)
+        self.batch_count.set(f"Queue ({len(self.batch)})")
+    
+    def dispatch_batch(self):
+        """While the batch is running, start queued parts on idle stations"""
+        if self.batch_running.get():
+            for station in self.stations:
+                if not self.batch:
+                    break
+                if station.ser and not station.busy:
+                    station.vars['part_number'].set(self.batch.popleft())
+                    self.start_test(station, batch=True)
+        self.update_batch_view()
+    
+    def start_all(self):
+        """Start every idle station that has a part number"""
+        ready = [station for station in self.stations
+                 if station.ser and not station.busy and station.vars['part_number'].get()]
+        if not ready:
+            messagebox.showerror("Error", "Please enter a part number.")
+            return
+        for station in ready:
+            self.start_test(station)
+    
+    def start_test(self, station, batch=False):
+        """Start the dual Alicat test sequence on one station"""
+        part_number = station.vars['part_number'].get()
+        if not part_number:
+            messagebox.showerror("Error", f"Please enter a part number for {station.name}.")
+            return
         
-        while time.time() < decay_end_time:
-            elapsed = time.time() - decay_start_time
-            remaining_time = int(decay_end_time - time.time())
-            self.time_remaining.set(str(remaining_time))
-            
-            # Read data from Alicat A
-            data_a = self.read_alicat('A')
-            data_b = self.read_alicat('B')
-            
-            if data_a:
-                # Update displays
-                self.pressure_a_display.set(f"{data_a['pressure']:.2f}")
-                if data_b:
-                    self.pressure_b_display.set(f"{data_b['pressure']:.2f}")
-                
-                # Store data for plotting
-                self.time_data.append(elapsed)
-                self.pressure_a_data.append(data_a['pressure'])
-                
-                # Store data in Excel (as numbers, not strings)
-                self.data_sheet.append(["Pressure Decay", round(elapsed, 2), 
-                                       round(data_a['pressure'], 2), 
-                                       round(data_b['pressure'], 2) if data_b else "N/A",
-                                       round(data_a['mass_flow'], 3),
-                                       round(data_b['mass_flow'], 3) if data_b else "N/A"])
-                self.workbook.save(self.excel_path)
-                
-                # Update plot
-                self.update_plot()
+        # Create Excel file (tagged with the station when several share the folder)
+        os.makedirs(OUTPUT_PATH, exist_ok=True)
+        station.excel_path, timestamp = station.output_path(OUTPUT_PATH, part_number, tagged=len(self.stations) > 1)
+        
+        # The part number's recipe from the current Test.ini
+        station.recipe = self.recipes.recipe_for(part_number)
+        config = station.recipe.config
+        
+        # Journal settings now; the Settings/Data workbook is built when the run ends
+        station.recorder = RunRecorder(station.excel_path, binary=config['write_binary'])
+        station_name = f"{station.name} ({station.port})" if len(self.stations) > 1 else None
+        profile = station.recipe.name if station.recipe.name != DEFAULT_PROFILE else None
+        for name, value in ini_config.run_settings(config, part_number, timestamp, station_name, profile):
+            station.recorder.add_setting(name, value)
+        
+        # Clear the live plot if it shows this station
+        station.recorded = []
+        if station is self.plotted_station():
+            self.ensure_live_plot().reset(config['flow_sample_time'], config['pressure_sample_time'])
+        
+        # Run test sequence on the shared scheduler
+        station.samples.clear()
+        station.metrics = RunMetrics()
+        transport = SerialTransport(AlicatLink(station.ser, config['transaction_timeout'], config['fast_poll']))
+        station.worker = AcquisitionWorker(transport, config, station.recorder, station.samples,
+                                           station.events, station.metrics, self.scheduler,
+                                           station.recipe.commands)
+        station.worker.start()
+        station.batch_run = batch
+        self.update_buttons()
+    
+    def drain_workers(self):
+        """Move buffered samples and events from the running stations into the GUI"""
+        self.drain_ports()
+        self.drain_stations()
+        
+        # Redraws are capped at the live plot's frame rate, not the sample rate
+        self.refresh_plot()
+        self.report_finished()
+        self.root.after(DRAIN_INTERVAL_MS, self.drain_workers)
+    
+    def drain_stations(self):
+        for station in self.stations:
+            if not station.busy:
+                continue
+            self.handle_samples(station, station.samples.drain())
             
-            self.root.update_idletasks()
-            time.sleep(self.pressure_read_rate)
-        
-        self.time_remaining.set("0")
+            while not station.events.empty():
+                kind, value = station.events.get_nowait()
+                if kind == 'phase':
+                    station.vars['phase'].set(value)
+                elif kind == 'remaining':
+                    station.vars['remaining'].set(value)
+                else:
+                    self.finish_test(station, kind, value)
+                    break
+    
+    def handle_samples(self, station, samples):
+        """Display the latest readings of a batch and plot its recorded samples"""
+        data_a = next((sample.data_a for sample in reversed(samples) if sample.data_a), None)
+        data_b = next((sample.data_b for sample in reversed(samples) if sample.data_b), None)
+        if data_a:
+            station.vars['pressure_a'].set(f"{data_a['pressure']:.2f}")
+            station.vars['flow_a'].set(f"{data_a['mass_flow']:.3f}")
+        if data_b:
+            station.vars['pressure_b'].set(f"{data_b['pressure']:.2f}")
+            station.vars['flow_b'].set(f"{data_b['mass_flow']:.3f}")
+        
+        plotted = station is self.plotted_station()
+        for sample in samples:
+            if sample.record:
+                station.recorded.append(sample)
+                if plotted:
+                    self.plot_sample(sample)
+    
+    def plot_sample(self, sample):
+        if sample.phase == "Flow Test":
+            self.live_plot.add_flow(sample.elapsed, sample.data_a['mass_flow'], sample.data_b['mass_flow'])
+        else:
+            self.live_plot.add_decay(sample.elapsed, sample.data_a['pressure'])
+    
+    def refresh_plot(self, force=False):
+        """Refresh the live plot, timing frames that were actually drawn"""
+        if self.live_plot is None:
+            return
+        start = time.perf_counter()
+        metrics = self.plotted_station().metrics
+        if self.live_plot.refresh(force) and metrics:
+            metrics.add_stage("draw", time.perf_counter() - start)
     
-    def update_plot(self):
-        """Update the pressure decay plot"""
-        self.ax.clear()
-        if self.time_data and self.pressure_a_data:
-            self.ax.plot(self.time_data, self.pressure_a_data, 'b-', linewidth=2, label='Alicat A Pressure')
-            self.ax.set_xlabel('Time (s)')
-            self.ax.set_ylabel('Pressure (PSI)')
-            self.ax.set_title('Alicat A Pressure Decay')
-            self.ax.grid(True, alpha=0.3)
-            self.ax.legend()
+    def finish_test(self, station, kind, value):
+        """Wrap up a station's run after its worker reports done, stopped or error.
+
+        The run is written by the Finalizer in the background, so a batch
+        moves straight on to the next part.
+        """
+        self.handle_samples(station, station.samples.drain())
+        if station is self.plotted_station():
+            self.refresh_plot(force=True)
+        context = (station, station.vars['part_number'].get(), kind, value, station.batch_run)
+        self.finalizer.submit(context, station.recorder, station.metrics)
+        
+        station.vars['remaining'].set("0")
+        station.vars['phase'].set({'done': "Complete", 'stopped': "Stopped"}.get(kind, "Error"))
+        station.worker = None
+        
+        # A stop or an error pauses the batch so the operator can look at the bench
+        if kind != 'done':
+            self.batch_running.set(False)
+        self.update_buttons()
+        self.dispatch_batch()
+    
+    def report_finished(self):
+        """Report runs whose files have been written"""
+        for (station, part_number, kind, value, batch), excel_path, error in self.finalizer.completed():
+            status = {'done': "Complete", 'stopped': "Stopped"}.get(kind, f"Error: {value}")
+            if error:
+                status += f"; save failed: {error}"
+                self.batch_running.set(False)
+            self.results_list.insert(tk.END, f"{part_number} ({station.name}): {status}")
+            self.results_list.see(tk.END)
+            if batch:
+                # Batch runs never block on a dialog; the results list has it all
+                continue
             
-            # Set reasonable y-axis limits
-            if len(self.pressure_a_data) > 0:
-                min_p = min(self.pressure_a_data)
-                max_p = max(self.pressure_a_data)
-                padding = (max_p - min_p) * 0.1 or 1
-                self.ax.set_ylim(min_p - padding, max_p + padding)
-        
-        self.canvas.draw()
+            if error:
+                messagebox.showerror("Save Error", f"Could not write the results of {part_number}:\n{error}\n"
+                                     f"Samples are kept in the .journal file next to it")
+            # With several benches running, only errors interrupt the operator
+            if kind == 'done' and not error and len(self.stations) == 1:
+                messagebox.showinfo("Test Complete", f"Test completed successfully!\nData saved to:\n{excel_path}")
+            elif kind not in ('done', 'stopped'):
+                messagebox.showerror("Test Error", f"An error occurred during the test on {station.name}:\n{value}")
+    
+    def stop_all(self):
+        self.batch_running.set(False)
+        for station in self.stations:
+            self.stop_test(station)
+    
+    def stop_test(self, station):
+        """Stop a station's test; its worker closes the valves at the next sample"""
+        if station.worker:
+            station.vars['phase'].set("Stopping")
+            if station.widgets:
+                station.widgets['stop'].config(state='disabled')
+            station.worker.stop()
     
-    def stop_test(self):
-        """Stop the test and close valves"""
-        self.test_phase.set("Stopping")
-        self.send_command("AHC\r")  # Close valve A
-        self.send_command(f"BS{self.b_decay_test_pressure}\r")  # Set B to decay pressure
-        self.test_phase.set("Stopped")
-        self.start_button.config(state='normal')
-        self.stop_button.config(state='disabled')
-        if self.workbook:
-            self.workbook.save(self.excel_path)
+    def on_close(self):
+        """Let queued runs finish writing before the window goes away"""
+        self.stop_all()
+        for station in self.stations:
+            if station.worker:
+                station.worker.join(5)
+        self.drain_stations()
+        self.finalizer.shutdown()
+        self.root.destroy()
     
     def __del__(self):
         """Cleanup on exit"""
-        if hasattr(self, 'ser') and self.ser.is_open:
-            self.ser.close()
+        for station in getattr(self, 'stations', []):
+            if station.ser and station.ser.is_open:
+                station.ser.close()
 
 # Create and run the application
 if __name__ == "__main__":
     root = tk.Tk()
-    app = DualAlicatTestApp(root)
+    app = DualAlicatTestApp(root, sys.argv[1:])
     root.mainloop()
@@ -0,0 +1,410 @@
+# Acquisition worker for the Dual Alicat Pressure Flow Test
+# Runs the flow and decay test sequence off the Tk thread so serial polling
+# never blocks the mainloop. Several stations' runs can share one Scheduler.
+# - The worker owns the line for the duration of a run; the sequence runs as
+#   coroutines on an asyncio AlicatBus (alicat_bus.py) over the transport it
+#   is given (serial port, pty or the in-memory emulator)
+# - Recorded samples are written straight to the RunRecorder journal
+# - Every reading is also pushed into a bounded ring buffer (SampleRing)
+#   for display, so a slow GUI can never cost data
+# - Phase, countdown and completion events are posted to a queue
+# - The GUI drains both on an after() tick
+# - stop() is honoured within one sample period
+# - Stage timings, transaction latencies and sample intervals go to the
+#   run's RunMetrics (run_metrics.py)
+# - Stabilize steps end as soon as Alicat A is stable (stability.py), with
+#   PRESSURIZE_TIME as the limit
+# - The decay is fitted as it is recorded (decay_fit.py) and ends early once
+#   the leak rate is known well enough
+# - Recording loops are paced by a SampleClock: samples are due at absolute
+#   times on the loop's monotonic clock, so I/O time never stretches the
+#   interval; overrun slots are skipped and counted, and each sample's
+#   lateness against its deadline goes to the RunMetrics
+
+import asyncio
+import collections
+import threading
+
+from alicat_bus import AlicatBus
+from run_metrics import RunMetrics
+from stability import StabilityDetector
+from decay_fit import DecayFit
+
+# Parameters copied from the app into each run
+TEST_PARAMETERS = (
+    'a_flow_test_pressure',
+    'b_flow_test_pressure',
+    'a_decay_test_pressure',
+    'b_decay_test_pressure',
+    'flow_sample_time',
+    'pressure_sample_time',
+    'read_rate',
+    'pressure_read_rate',
+    'pressurize_time',
+    'adaptive_stabilize',
+    'stability_window',
+    'stability_tolerance',
+    'stability_slope',
+    'stability_std',
+    'ambient_pressure',
+    'decay_fit',
+    'decay_fit_tolerance',
+    'decay_min_time',
+)
+
+# Seconds between polls while waiting for the pressure to stabilize
+STABILIZE_POLL_INTERVAL = 0.05
+
+# One reading of both Alicats. Only samples with record=True go to the Data sheet.
+Sample = collections.namedtuple('Sample', ['phase', 'elapsed', 'data_a', 'data_b', 'record'])
+
+
+class SampleClock:
+    """Fixed-rate sample deadlines on the event loop's monotonic clock.
+
+    Sample n is due at start + n * interval. When a sample overruns past the
+    next deadline, the missed slots are skipped (and counted) rather than
+    sampled back to back, so the schedule never drifts or bursts. An interval
+    of 0 samples as fast as the bus answers.
+    """
+
+    def __init__(self, loop, interval):
+        self.loop = loop
+        self.interval = interval
+        self.start = loop.time()
+        self.index = 0
+        self.skipped = 0
+
+    @property
+    def deadline(self):
+        return self.start + self.index * self.interval
+
+    def elapsed(self):
+        return self.loop.time() - self.start
+
+    def lateness(self, elapsed):
+        """Seconds a sample taken at `elapsed` is behind its deadline (0 without a fixed rate)"""
+        if self.interval <= 0:
+            return 0.0
+        return max(0.0, elapsed - self.index * self.interval)
+
+    def advance(self):
+        """Move to the next deadline still ahead; returns seconds until it"""
+        self.index += 1
+        if self.interval <= 0:
+            return 0.0
+        now = self.loop.time()
+        if self.deadline <= now:
+            missed = int((now - self.deadline) / self.interval) + 1
+            self.index += missed
+            self.skipped += missed
+        return self.deadline - now
+
+
+def sample_row(sample):
+    """Format a recorded sample as a Data sheet row"""
+    data_a, data_b = sample.data_a, sample.data_b
+    if sample.phase == "Flow Test":
+        return ["Flow Test", round(sample.elapsed, 2),
+                round(data_a['pressure'], 2), round(data_b['pressure'], 2),
+                round(data_a['mass_flow'], 3), round(data_b['mass_flow'], 3)]
+    return ["Pressure Decay", round(sample.elapsed, 2),
+            round(data_a['pressure'], 2),
+            round(data_b['pressure'], 2) if data_b else "N/A",
+            round(data_a['mass_flow'], 3),
+            round(data_b['mass_flow'], 3) if data_b else "N/A"]
+
+
+class SampleRing:
+    """Bounded FIFO shared by the acquisition worker and the GUI.
+
+    When the GUI falls behind, the oldest samples are overwritten and counted
+    in `dropped` so sampling itself never waits on the consumer. Recording
+    does not go through the ring, so drops only affect the display.
+    """
+
+    def __init__(self, capacity=4096):
+        self._items = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def push(self, item):
+        with self._lock:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+
+    def drain(self):
+        """Remove and return everything currently buffered"""
+        with self._lock:
+            items = list(self._items)
+            self._items.clear()
+        return items
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.dropped = 0
+
+
+class Scheduler:
+    """One asyncio loop on a background thread, shared by every station's runs.
+
+    Each run is a coroutine on this loop; blocking serial I/O happens on each
+    transport's own I/O thread, so stations never wait on each other.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="acquisition", daemon=True)
+        self.thread.start()
+
+    def submit(self, coroutine):
+        """Schedule a coroutine from any thread; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+class AcquisitionWorker:
+    """Runs one flow + decay test in the background.
+
+    The sequence is a set of coroutines talking to the Alicats through an
+    AlicatBus. With a Scheduler they run on its shared loop; without one the
+    worker hosts its own loop on a thread.
+    """
+
+    def __init__(self, transport, params, recorder, samples, events, metrics=None, scheduler=None,
+                 commands=None):
+        self.metrics = metrics or RunMetrics()
+        self.transport = transport
+        self.params = params
+        self.commands = commands  # pre-encoded Alicat commands (Recipe.commands)
+        self.recorder = recorder
+        self.samples = samples
+        self.events = events
+        self.scheduler = scheduler
+        self.thread = None
+        self.future = None
+        self.bus = None
+        self.loop = None
+        self.stop_event = None
+        self.stop_requested = False
+
+    def start(self):
+        if self.scheduler is not None:
+            self.future = self.scheduler.submit(self.main())
+        else:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def join(self, timeout=None):
+        """Wait for the run to end"""
+        if self.future is not None:
+            try:
+                self.future.result(timeout)
+            except Exception:
+                pass
+        elif self.thread is not None:
+            self.thread.join(timeout)
+
+    def stop(self):
+        """Request the run to stop at the next sample boundary (any thread)"""
+        self.stop_requested = True
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+
+    def stopped(self):
+        return self.stop_requested
+
+    async def wait(self, seconds):
+        """Sleep for up to `seconds`; returns True if a stop was requested"""
+        if seconds <= 0:
+            await asyncio.sleep(0)
+            return self.stop_requested
+        with self.metrics.stage("sleep"):
+            try:
+                await asyncio.wait_for(self.stop_event.wait(), seconds)
+            except asyncio.TimeoutError:
+                pass
+        return self.stop_requested
+
+    def post(self, kind, value=None):
+        self.events.put((kind, value))
+
+    def push(self, sample):
+        """Record a sample to the journal and hand it to the GUI"""
+        if sample.record:
+            self.recorder.add_row(sample_row(sample))
+        self.samples.push(sample)
+
+    def run(self):
+        asyncio.run(self.main())
+
+    async def main(self):
+        self.stop_event = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        if self.stop_requested:
+            self.stop_event.set()
+
+        self.bus = AlicatBus(self.transport, self.metrics, self.commands)
+        try:
+            await self.run_flow_test()
+            if not self.stopped():
+                await self.run_pressure_decay_test()
+            if self.stopped():
+                await self.abort()
+                self.post('stopped')
+            else:
+                self.post('done')
+        except Exception as e:
+            try:
+                await self.abort()
+            except Exception:
+                pass
+            self.post('error', str(e))
+        finally:
+            await self.bus.close()
+
+    async def abort(self):
+        """Close valve A and set B to decay pressure"""
+        await asyncio.gather(self.bus.hold_valve('A'),
+                             self.bus.set_pressure('B', self.params['b_decay_test_pressure']))
+
+    async def stabilize(self, phase, setpoint):
+        """Poll until Alicat A is stable at `setpoint`, for at most PRESSURIZE_TIME.
+
+        The time taken is logged to Settings. Without ADAPTIVE_STABILIZE the
+        full PRESSURIZE_TIME is always waited.
+        """
+        p = self.params
+        detector = None
+        if p['adaptive_stabilize']:
+            detector = StabilityDetector(setpoint, p['stability_window'], p['stability_tolerance'],
+                                         p['stability_slope'], p['stability_std'])
+        start = self.loop.time()
+        deadline = start + p['pressurize_time']
+        remaining = None
+        result = "timeout"
+        while not self.stopped():
+            now = self.loop.time()
+            if now >= deadline:
+                break
+            if int(deadline - now) != remaining:
+                remaining = int(deadline - now)
+                self.post('remaining', str(remaining))
+            data_a, data_b = await self.bus.poll_all('A', 'B')
+            self.push(Sample(None, 0.0, data_a, data_b, False))
+            if detector is not None and data_a and detector.add(self.loop.time(), data_a['pressure']):
+                result = "stable"
+                break
+            if await self.wait(STABILIZE_POLL_INTERVAL):
+                return
+        if self.stopped():
+            return
+        if detector is None:
+            result = "fixed"
+        self.recorder.add_setting(f"{phase} Stabilize Time (s)", f"{self.loop.time() - start:.2f} ({result})")
+
+    async def run_flow_test(self):
+        """Execute the flow test phase"""
+        p = self.params
+        self.post('phase', "Flow Test - Setup")
+
+        with self.metrics.stage("flow setup"):
+            # Step 1: Release valve on A
+            await self.bus.release_valve('A')
+            if await self.wait(0.5):
+                return
+
+            # Steps 2-3: Set A and B to flow test pressure (sent back to back)
+            await asyncio.gather(self.bus.set_pressure('A', p['a_flow_test_pressure']),
+                                 self.bus.set_pressure('B', p['b_flow_test_pressure']))
+
+        # Step 4: Wait for pressure stabilization
+        self.post('phase', "Flow Test - Stabilizing")
+        with self.metrics.stage("flow stabilize"):
+            await self.stabilize("Flow Test", p['a_flow_test_pressure'])
+        if self.stopped():
+            return
+
+        # Step 5: Record mass flow for both devices
+        self.post('phase', "Flow Test - Recording")
+        clock = SampleClock(self.loop, p['read_rate'])
+
+        with self.metrics.stage("flow record"):
+            while not self.stopped():
+                elapsed = clock.elapsed()
+                if elapsed >= p['flow_sample_time']:
+                    break
+                lateness = clock.lateness(elapsed)
+                self.post('remaining', str(int(p['flow_sample_time'] - elapsed)))
+
+                data_a, data_b = await self.bus.poll_all('A', 'B')
+                sample = Sample("Flow Test", elapsed, data_a, data_b, bool(data_a and data_b))
+                self.push(sample)
+                if sample.record:
+                    self.metrics.sample("Flow Test", elapsed, p['read_rate'], lateness)
+                if await self.wait(clock.advance()):
+                    break
+            self.metrics.overruns("Flow Test", clock.skipped)
+
+    async def run_pressure_decay_test(self):
+        """Execute the pressure decay test phase"""
+        p = self.params
+        self.post('phase', "Decay Test - Setup")
+
+        # Step 1: Set B to decay test pressure (close valve)
+        # Step 2: Set A to decay test pressure and wait for it to stabilize
+        with self.metrics.stage("decay setup"):
+            await asyncio.gather(self.bus.set_pressure('B', p['b_decay_test_pressure']),
+                                 self.bus.set_pressure('A', p['a_decay_test_pressure']))
+        self.post('phase', "Decay Test - Stabilizing")
+        with self.metrics.stage("decay stabilize"):
+            await self.stabilize("Pressure Decay", p['a_decay_test_pressure'])
+        if self.stopped():
+            return
+
+        # Step 3: Close valve on A
+        with self.metrics.stage("decay setup"):
+            await self.bus.hold_valve('A')
+            if await self.wait(0.25):
+                return
+
+        # Step 4: Record pressure decay
+        self.post('phase', "Decay Test - Recording")
+        self.post('remaining', "0")
+
+        clock = SampleClock(self.loop, p['pressure_read_rate'])
+        fit = DecayFit(p['decay_fit'], p['ambient_pressure'])
+        early_stop = None
+
+        with self.metrics.stage("decay record"):
+            while True:
+                elapsed = clock.elapsed()
+                if elapsed >= p['pressure_sample_time']:
+                    break
+                lateness = clock.lateness(elapsed)
+                self.post('remaining', str(int(p['pressure_sample_time'] - elapsed)))
+
+                data_a, data_b = await self.bus.poll_all('A', 'B')
+                sample = Sample("Pressure Decay", elapsed, data_a, data_b, bool(data_a))
+                self.push(sample)
+                if sample.record:
+                    self.metrics.sample("Pressure Decay", elapsed, p['pressure_read_rate'], lateness)
+                    fit.add(elapsed, data_a['pressure'])
+                    if (p['decay_fit_tolerance'] > 0 and elapsed >= p['decay_min_time']
+                            and fit.converged(p['decay_fit_tolerance'])):
+                        early_stop = elapsed
+                        break
+
+                if await self.wait(clock.advance()):
+                    break
+            self.metrics.overruns("Pressure Decay", clock.skipped)
+
+        self.post('remaining', "0")
+        for name, value in fit.settings_rows():
+            self.recorder.add_setting(name, value)
+        self.recorder.add_setting("Decay Early Stop (s)", round(early_stop, 2) if early_stop is not None else "No")
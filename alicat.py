@@ -0,0 +1,94 @@
+# Alicat serial transaction layer
+# Every exchange with an Alicat is one transaction: write the command, then
+# return as soon as the terminating \r frame arrives. There is no fixed delay;
+# a per-transaction timeout bounds how long a missing reply can cost.
+#
+# Alicat data frame: ID Pressure Temperature VolumetricFlow MassFlow SetPoint Gas
+# Setpoint (AS/BS) and valve (AC/AHC) commands answer with the same frame.
+#
+# Fast poll mode skips the input-buffer flush before each transaction and
+# instead matches replies by unit ID, discarding stale frames, with a short
+# timeout. This is what makes 10-20 Hz A+B sampling possible.
+
+import time
+
+# Seconds to wait for a reply frame
+DEFAULT_TIMEOUT = 0.25
+FAST_POLL_TIMEOUT = 0.05
+
+
+def parse_frame(frame, device=None):
+    """Parse an Alicat data frame into a dict, or None if it is not one"""
+    data = frame.split()
+    if len(data) < 5:
+        return None
+    if device is not None and data[0] != device:
+        return None
+    try:
+        return {
+            'pressure': float(data[1]),
+            'temperature': float(data[2]),
+            'volumetric_flow': float(data[3]),
+            'mass_flow': float(data[4])
+        }
+    except ValueError:
+        return None
+
+
+class AlicatLink:
+    """Request/response transactions with Alicats sharing one serial line"""
+
+    def __init__(self, ser, timeout=None, fast_poll=False):
+        self.ser = ser
+        self.fast_poll = fast_poll
+        if timeout is None:
+            timeout = FAST_POLL_TIMEOUT if fast_poll else DEFAULT_TIMEOUT
+        self.timeout = timeout
+        self.timeouts = 0
+        self._port_timeout = None
+
+    def _set_port_timeout(self, seconds):
+        # Reconfiguring the port is a system call on Windows, so only do it on change
+        seconds = round(max(seconds, 0.001), 3)
+        if seconds != self._port_timeout:
+            self.ser.timeout = seconds
+            self._port_timeout = seconds
+
+    def transact(self, command, device=None, timeout=None):
+        """Send `command` and return the reply frame text, or None on timeout.
+
+        If `device` is given, frames from any other unit (late replies to an
+        earlier transaction) are discarded while waiting.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        if not self.fast_poll:
+            self.ser.reset_input_buffer()
+        self._set_port_timeout(timeout)
+        self.ser.write(command.encode() if isinstance(command, str) else command)
+
+        deadline = time.monotonic() + timeout
+        while True:
+            raw = self.ser.read_until(b"\r")
+            if not raw.endswith(b"\r"):
+                self.timeouts += 1
+                return None
+            frame = raw.decode('utf-8', errors='ignore').strip()
+            if device is None or frame.split()[:1] == [device]:
+                return frame
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.timeouts += 1
+                return None
+            self._set_port_timeout(remaining)
+
+    def poll(self, device):
+        """Read data from specified Alicat device (A or B)"""
+        frame = self.transact(f"{device}\r", device)
+        return parse_frame(frame, device) if frame else None
+
+    def command(self, command):
+        """Send a setpoint or valve command and return the unit's reply data"""
+        device = command[0]
+        frame = self.transact(command, device)
+        return parse_frame(frame, device) if frame else None
@@ -0,0 +1,178 @@
+# Alicat bus driver (asyncio)
+# One AlicatBus per serial line (both Alicats share the BB9 line).
+# - Every exchange goes through a single queue, so transactions on the
+#   shared line never interleave, whoever issues them
+# - Callers can submit several commands without awaiting each one, e.g. both
+#   setpoints, or a setpoint plus a poll; they go out back to back
+# - Setpoint and valve commands answer with a data frame, which is kept as
+#   the device's latest reading just like a poll
+# - The line itself is a pluggable transport:
+#     SerialTransport  pyserial port; on POSIX also a pty path such as the
+#                      one printed by alicat_emulator.py
+#     MemoryTransport  in-process responder, runs at full speed in tests
+# - With a RunMetrics attached, every transaction's latency is recorded
+# - Command bytes are cached per bus; a recipe (recipes.py) hands in the
+#   run's commands already encoded
+
+import asyncio
+import concurrent.futures
+import time
+
+import serial
+
+from alicat import AlicatLink, parse_frame
+
+
+def poll_command(device):
+    return f"{device}\r"
+
+
+def setpoint_command(device, psi):
+    return f"{device}S{psi}\r"
+
+
+def hold_valve_command(device):
+    return f"{device}HC\r"
+
+
+def release_valve_command(device):
+    return f"{device}C\r"
+
+
+class SerialTransport:
+    """Blocking AlicatLink transactions run on a dedicated I/O thread"""
+
+    def __init__(self, link, owns_port=False):
+        self.link = link
+        self.owns_port = owns_port
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="alicat-io")
+
+    @classmethod
+    def open(cls, port, baudrate=38400, timeout=None, fast_poll=False):
+        """Open a serial port (COM port or pty path) for exclusive use by a bus"""
+        ser = serial.Serial(port, baudrate, timeout=1)
+        return cls(AlicatLink(ser, timeout, fast_poll), owns_port=True)
+
+    async def exchange(self, payload, device):
+        """Send payload and return the reply frame text from `device`, or None"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.link.transact, payload, device)
+
+    async def close(self):
+        self.executor.shutdown(wait=True)
+        if self.owns_port and self.link.ser.is_open:
+            self.link.ser.close()
+
+
+class MemoryTransport:
+    """Transport backed by a responder: bytes command -> reply text or None.
+
+    The responder may be a plain function or a coroutine function (so an
+    emulator can model latency with asyncio.sleep).
+    """
+
+    def __init__(self, responder, timeout=0.25):
+        self.responder = responder
+        self.timeout = timeout
+        self.timeouts = 0
+
+    async def exchange(self, payload, device):
+        try:
+            reply = self.responder(payload)
+            if asyncio.iscoroutine(reply):
+                reply = await asyncio.wait_for(reply, self.timeout)
+        except asyncio.TimeoutError:
+            reply = None
+        if reply is None or not reply.strip().startswith(device):
+            self.timeouts += 1
+            return None
+        return reply.strip()
+
+    async def close(self):
+        pass
+
+
+class AlicatBus:
+    """Serialized, pipelined transactions with the Alicats on one line"""
+
+    def __init__(self, transport, metrics=None, commands=None):
+        self.transport = transport
+        self.metrics = metrics  # RunMetrics, fed one latency per transaction
+        self.queue = asyncio.Queue()
+        self.latest = {}  # device -> (loop time, reading)
+        self.task = None
+        self._commands = dict(commands or {})  # command text -> bytes
+
+    def encode(self, command):
+        """Command text -> bytes, cached since the same few commands repeat all run"""
+        payload = self._commands.get(command)
+        if payload is None:
+            payload = self._commands[command] = command.encode()
+        return payload
+
+    def submit(self, command):
+        """Queue a command without waiting; returns a future for the reply reading"""
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((self.encode(command), command[0], future))
+        return future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            payload, device, future = await self.queue.get()
+            try:
+                if future.cancelled():
+                    continue
+                start = time.perf_counter()
+                try:
+                    frame = await self.transport.exchange(payload, device)
+                except Exception as e:
+                    if not future.cancelled():
+                        future.set_exception(e)
+                    continue
+                reading = parse_frame(frame, device) if frame else None
+                if self.metrics is not None:
+                    self.metrics.transaction(device, time.perf_counter() - start, reading is not None)
+                if reading:
+                    self.latest[device] = (loop.time(), reading)
+                if not future.cancelled():
+                    future.set_result(reading)
+            finally:
+                self.queue.task_done()
+
+    async def transact(self, command):
+        return await self.submit(command)
+
+    async def poll(self, device):
+        """Current reading of one device, or None if it did not answer"""
+        return await self.submit(poll_command(device))
+
+    async def poll_all(self, *devices):
+        """Poll several devices back to back; returns their readings in order"""
+        return await asyncio.gather(*[self.submit(poll_command(device)) for device in devices])
+
+    async def set_pressure(self, device, psi):
+        """Change a device's pressure setpoint; returns the reply reading"""
+        return await self.submit(setpoint_command(device, psi))
+
+    async def hold_valve(self, device):
+        """Hold the device's valve closed"""
+        return await self.submit(hold_valve_command(device))
+
+    async def release_valve(self, device):
+        """Cancel a valve hold and return to closed-loop control"""
+        return await self.submit(release_valve_command(device))
+
+    async def close(self):
+        """Finish queued transactions, then release the transport"""
+        if self.task is not None:
+            await self.queue.join()
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.transport.close()
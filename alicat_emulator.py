@@ -0,0 +1,435 @@
+# Alicat emulator for hardware-free runs
+# Answers the commands the test sequence uses, for unit IDs A and B:
+#   A\r / B\r     poll, reply with a data frame
+#   AS<psi>\r     set pressure setpoint, reply with a data frame
+#   AC\r          cancel valve hold (closed-loop control), reply with a frame
+#   AHC\r         hold valve closed, reply with a frame
+# Frames look like the real thing:
+#   A +016.00 +025.00 +000.611 +000.650 +016.00 Air
+#
+# The readings come from a lumped catheter model (CatheterModel):
+# - Alicat A regulates the fixture volume to its setpoint, or is held shut
+# - The catheter is an orifice from the fixture to Alicat B; B vents it to
+#   ambient while its setpoint is below fixture pressure and closes otherwise
+# - A leak (linear conductance) drains the fixture to ambient, so a held
+#   decay is exponential toward ambient
+# Replies carry transmission latency, processing latency and noise; faults
+# (garbled frames, missing replies, slow replies) can be injected at random.
+#
+# Usage:
+#   python alicat_emulator.py serve            # pty, prints the port path
+#   python alicat_emulator.py serve COM31      # one end of a com0com pair
+#   python alicat_emulator.py bench            # full sequence, in memory
+#   python alicat_emulator.py bench --pty      # full sequence over a pty
+#   python alicat_emulator.py bench --pty --stations 8   # 8 benches at once
+# Point the recorder at the printed port: python Pressure_Flow_v2.py /dev/pts/5
+
+import argparse
+import asyncio
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+
+AMBIENT_PRESSURE = 14.7  # PSIA
+BAUD_RATE = 38400
+DEVICES = ('A', 'B')
+
+
+class CatheterModel:
+    """Fixture volume between Alicat A, the catheter orifice and Alicat B.
+
+    Flows are in SLPM and conductances in SLPM per PSI. Pressure changes by
+    net flow * ambient / (60 * volume) PSI per second (isothermal ideal gas).
+    """
+
+    def __init__(self, volume=0.05, leak=0.02, orifice=0.5, gain=2.0,
+                 max_flow=5.0, ambient=AMBIENT_PRESSURE, temperature=25.0):
+        self.volume = volume  # liters
+        self.leak = leak
+        self.orifice = orifice
+        self.gain = gain  # A controller, SLPM per PSI of error
+        self.max_flow = max_flow
+        self.ambient = ambient
+        self.temperature = temperature
+
+        self.pressure = ambient
+        self.setpoint = {'A': 0.0, 'B': 0.0}
+        self.hold = False
+        self.flow_a = 0.0
+        self.flow_b = 0.0
+
+    def b_open(self):
+        return self.setpoint['B'] < self.pressure
+
+    def outflows(self, pressure):
+        leak = self.leak * (pressure - self.ambient)
+        catheter = self.orifice * (pressure - self.ambient) if self.setpoint['B'] < pressure else 0.0
+        return leak, max(catheter, 0.0)
+
+    def step(self, dt, max_step=0.005):
+        """Advance the model by dt seconds"""
+        while dt > 0:
+            h = min(dt, max_step)
+            leak, catheter = self.outflows(self.pressure)
+            if self.hold:
+                inflow = 0.0
+            else:
+                demand = leak + catheter + self.gain * (self.setpoint['A'] - self.pressure)
+                inflow = min(max(demand, 0.0), self.max_flow)
+            self.pressure += (inflow - leak - catheter) * self.ambient / (60.0 * self.volume) * h
+            self.pressure = max(self.pressure, self.ambient)
+            self.flow_a = inflow
+            self.flow_b = catheter
+            dt -= h
+
+    def reading(self, device):
+        """(pressure, mass flow) as seen by `device`"""
+        if device == 'A':
+            return self.pressure, self.flow_a
+        if self.b_open():
+            # Vented: B sees little more than ambient downstream of the orifice
+            return self.ambient + 0.02 * (self.pressure - self.ambient), self.flow_b
+        return self.pressure, 0.0
+
+
+class Faults:
+    """Per-reply fault probabilities"""
+
+    def __init__(self, garble=0.0, drop=0.0, slow=0.0, slow_delay=0.5):
+        self.garble = garble
+        self.drop = drop
+        self.slow = slow
+        self.slow_delay = slow_delay
+
+    @classmethod
+    def parse(cls, text):
+        """'garble=0.01,drop=0.01,slow=0.02,slow_delay=0.4' -> Faults"""
+        faults = cls()
+        for item in filter(None, (text or "").split(',')):
+            key, value = item.split('=', 1)
+            if not hasattr(faults, key.strip()):
+                raise ValueError(f"Unknown fault: {key}")
+            setattr(faults, key.strip(), float(value))
+        return faults
+
+
+class AlicatEmulator:
+    """Two Alicats (A and B) on one line, backed by a CatheterModel"""
+
+    def __init__(self, model=None, faults=None, noise=0.01, latency=0.004,
+                 baud_rate=BAUD_RATE, seed=None):
+        self.model = model or CatheterModel()
+        self.faults = faults or Faults()
+        self.noise = noise  # standard deviation, PSI and SLPM
+        self.latency = latency  # processing time per command, seconds
+        self.baud_rate = baud_rate
+        self.random = random.Random(seed)
+        self.clock = time.monotonic
+        self.last_step = self.clock()
+        self.lock = threading.Lock()
+        self.commands = 0
+        self.faults_injected = 0
+
+    def frame(self, device):
+        pressure, mass_flow = self.model.reading(device)
+        pressure += self.random.gauss(0.0, self.noise)
+        mass_flow += self.random.gauss(0.0, self.noise)
+        volumetric_flow = mass_flow * self.model.ambient / max(pressure, 0.1)
+        temperature = self.model.temperature + self.random.gauss(0.0, 0.05)
+        return (f"{device} {pressure:+07.2f} {temperature:+07.2f} {volumetric_flow:+08.3f} "
+                f"{mass_flow:+08.3f} {self.model.setpoint[device]:+07.2f} Air")
+
+    def handle(self, command):
+        """Apply one command (bytes or text, with or without \\r); returns the reply frame or None"""
+        if isinstance(command, bytes):
+            command = command.decode('ascii', 'replace')
+        command = command.strip()
+        if not command or command[0] not in DEVICES:
+            return None
+        device, rest = command[0], command[1:].upper()
+
+        with self.lock:
+            now = self.clock()
+            self.model.step(now - self.last_step)
+            self.last_step = now
+            self.commands += 1
+            if rest.startswith('S'):
+                try:
+                    self.model.setpoint[device] = float(rest[1:])
+                except ValueError:
+                    return None
+                if device == 'A':
+                    self.model.hold = False
+            elif rest == 'HC':
+                if device == 'A':
+                    self.model.hold = True
+            elif rest == 'C':
+                if device == 'A':
+                    self.model.hold = False
+            elif rest:
+                return None
+            return self.frame(device) + "\r"
+
+    def reply_delay(self, command, reply):
+        """Seconds from the end of the command to the end of the reply"""
+        characters = len(command) + (len(reply) if reply else 0)
+        return self.latency + characters * 10.0 / self.baud_rate
+
+    def inject(self, reply):
+        """Apply random faults; returns (reply or None, extra delay)"""
+        faults = self.faults
+        if reply is None:
+            return None, 0.0
+        roll = self.random.random()
+        if roll < faults.drop:
+            self.faults_injected += 1
+            return None, 0.0
+        roll -= faults.drop
+        if roll < faults.garble:
+            self.faults_injected += 1
+            chars = list(reply[:-1])
+            for _ in range(3):
+                chars[self.random.randrange(len(chars))] = self.random.choice("?#~\x7f")
+            return "".join(chars) + "\r", 0.0
+        roll -= faults.garble
+        if roll < faults.slow:
+            self.faults_injected += 1
+            return reply, faults.slow_delay
+        return reply, 0.0
+
+    def respond(self, command):
+        """Blocking responder: reply text after the modelled delay, or None"""
+        reply, extra = self.inject(self.handle(command))
+        time.sleep(self.reply_delay(command, reply) + extra)
+        return reply
+
+    async def respond_async(self, command):
+        """Responder for alicat_bus.MemoryTransport"""
+        reply, extra = self.inject(self.handle(command))
+        await asyncio.sleep(self.reply_delay(command, reply) + extra)
+        return reply
+
+    def serve(self, read, write, stop=None):
+        """Answer commands from read(n) -> bytes with write(bytes) until stop is set"""
+        buffer = b""
+        while stop is None or not stop.is_set():
+            data = read(64)
+            if not data:
+                continue
+            buffer += data
+            while b"\r" in buffer:
+                command, buffer = buffer.split(b"\r", 1)
+                reply = self.respond(command + b"\r")
+                if reply is not None:
+                    write(reply.encode('ascii', 'replace'))
+
+
+def open_pty():
+    """Create a raw pty pair; returns (master fd, slave path)"""
+    import pty
+    import tty
+    master, slave = pty.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    return master, os.ttyname(slave)
+
+
+def serve_pty(emulator, stop=None):
+    """Serve on a new pty from a background thread; returns the port path"""
+    import select
+    master, path = open_pty()
+
+    def read(n):
+        ready, _, _ = select.select([master], [], [], 0.1)
+        return os.read(master, n) if ready else b""
+
+    thread = threading.Thread(target=emulator.serve, args=(read, lambda data: os.write(master, data), stop),
+                              daemon=True)
+    thread.start()
+    return path
+
+
+def serve_serial(emulator, port, stop=None):
+    """Serve on a real or virtual serial port (e.g. one end of a com0com pair)"""
+    import serial
+    ser = serial.Serial(port, emulator.baud_rate, timeout=0.1)
+    thread = threading.Thread(target=emulator.serve, args=(ser.read, ser.write, stop), daemon=True)
+    thread.start()
+    return port
+
+
+# Benchmark
+
+BENCH_PARAMETERS = {
+    'a_flow_test_pressure': 16.0,
+    'b_flow_test_pressure': 0.0,
+    'a_decay_test_pressure': 20.0,
+    'b_decay_test_pressure': 50.0,
+    'flow_sample_time': 5.0,
+    'pressure_sample_time': 10.0,
+    'read_rate': 0.25,
+    'pressure_read_rate': 0.0,
+    'pressurize_time': 5.0,
+    'adaptive_stabilize': True,
+    'stability_window': 1.0,
+    'stability_tolerance': 0.1,
+    'stability_slope': 0.05,
+    'stability_std': 0.05,
+    'ambient_pressure': AMBIENT_PRESSURE,
+    'decay_fit': "linear",
+    'decay_fit_tolerance': 0.0,
+    'decay_min_time': 3.0,
+}
+
+
+def run_sequences(transports, params, folder, scheduler=None):
+    """Run one flow + decay sequence per transport, concurrently.
+
+    Returns (seconds, [(excel path, recorder, metrics, final event)]).
+    """
+    from acquisition import AcquisitionWorker, SampleRing
+    from run_metrics import RunMetrics
+    from run_recorder import RunRecorder
+
+    runs = []
+    for index, transport in enumerate(transports):
+        excel_path = os.path.join(folder, f"bench_{index + 1}.xlsx")
+        recorder = RunRecorder(excel_path)
+        metrics = RunMetrics()
+        events = queue.Queue()
+        worker = AcquisitionWorker(transport, params, recorder, SampleRing(), events, metrics, scheduler)
+        runs.append((excel_path, recorder, metrics, events, worker))
+
+    start = time.perf_counter()
+    for run in runs:
+        run[-1].start()
+    for run in runs:
+        run[-1].join()
+    seconds = time.perf_counter() - start
+
+    results = []
+    for excel_path, recorder, metrics, events, worker in runs:
+        final = None
+        while not events.empty():
+            kind, value = events.get()
+            if kind in ('done', 'stopped', 'error'):
+                final = (kind, value)
+        results.append((excel_path, recorder, metrics, final))
+    return seconds, results
+
+
+def phase_rates(excel_path):
+    """Sample count and achieved rate (Hz) of each recorded phase"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(excel_path, read_only=True)
+    times = {}
+    for row in workbook["Data"].iter_rows(min_row=2, values_only=True):
+        if row and row[0]:
+            times.setdefault(row[0], []).append(row[1])
+    workbook.close()
+    rates = {}
+    for phase, values in times.items():
+        span = values[-1] - values[0]
+        rates[phase] = (len(values), (len(values) - 1) / span if span > 0 else 0.0)
+    return rates
+
+
+def bench(args):
+    from acquisition import Scheduler
+    from alicat_bus import MemoryTransport, SerialTransport
+
+    faults = Faults.parse(args.faults)
+    emulators = [AlicatEmulator(faults=faults, latency=args.latency, noise=args.noise)
+                 for _ in range(args.stations)]
+    params = dict(BENCH_PARAMETERS)
+    params.update(flow_sample_time=args.flow_time, pressure_sample_time=args.decay_time,
+                  read_rate=args.read_rate, pressure_read_rate=args.read_rate,
+                  pressurize_time=args.pressurize_time, adaptive_stabilize=not args.fixed_stabilize,
+                  decay_fit=args.decay_fit, decay_fit_tolerance=args.fit_tolerance)
+
+    stop = threading.Event()
+    if args.pty:
+        transports = [SerialTransport.open(serve_pty(emulator, stop), timeout=args.timeout, fast_poll=args.fast_poll)
+                      for emulator in emulators]
+        line = "pty" + (" (fast poll)" if args.fast_poll else "")
+    else:
+        transports = [MemoryTransport(emulator.respond_async, timeout=args.timeout or 0.25)
+                      for emulator in emulators]
+        line = "memory"
+
+    scheduler = Scheduler() if args.stations > 1 else None
+    with tempfile.TemporaryDirectory() as folder:
+        seconds, results = run_sequences(transports, params, folder, scheduler)
+        stop.set()
+        commands = sum(emulator.commands for emulator in emulators)
+        print(f"Transport:        {line}, {args.stations} station(s)")
+        print(f"Cycle time:       {seconds:.2f} s")
+        print(f"Commands:         {commands} ({commands / seconds:.1f}/s)")
+        print(f"Faults injected:  {sum(emulator.faults_injected for emulator in emulators)}")
+        for index, (excel_path, recorder, metrics, final) in enumerate(results):
+            if args.stations > 1:
+                print(f"Station {index + 1}")
+            print(f"Result:           {final[0] if final else 'none'}{': ' + final[1] if final and final[1] else ''}")
+            if final and final[0] == 'done':
+                save_start = time.perf_counter()
+                recorder.finish()
+                print(f"Save time:        {time.perf_counter() - save_start:.2f} s")
+                for phase, (count, rate) in phase_rates(excel_path).items():
+                    print(f"{phase + ':':<18}{count} samples, {rate:.1f} Hz")
+            for name, summary in metrics.settings_rows():
+                print(f"{name + ':':<18}{summary}")
+    if scheduler is not None:
+        scheduler.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Alicat A/B emulator with a catheter model")
+    parser.add_argument('--faults', default="", help="e.g. garble=0.01,drop=0.01,slow=0.01,slow_delay=0.5")
+    parser.add_argument('--latency', type=float, default=0.004, help="processing latency per reply (s)")
+    parser.add_argument('--noise', type=float, default=0.01, help="reading noise (PSI, SLPM)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help="answer on a pty (default) or a serial port")
+    serve.add_argument('port', nargs='?', help="serial port to serve on instead of a new pty")
+    serve.add_argument('--stations', type=int, default=1, help="number of ptys, one A/B pair each")
+
+    run = commands.add_parser('bench', help="run the test sequence against the emulator")
+    run.add_argument('--pty', action='store_true', help="go through pyserial and a pty")
+    run.add_argument('--fast-poll', action='store_true')
+    run.add_argument('--stations', type=int, default=1, help="benches to run concurrently")
+    run.add_argument('--timeout', type=float, default=None, help="transaction timeout (s)")
+    run.add_argument('--flow-time', type=float, default=BENCH_PARAMETERS['flow_sample_time'])
+    run.add_argument('--decay-time', type=float, default=BENCH_PARAMETERS['pressure_sample_time'])
+    run.add_argument('--pressurize-time', type=float, default=BENCH_PARAMETERS['pressurize_time'])
+    run.add_argument('--read-rate', type=float, default=0.0, help="seconds between recorded samples")
+    run.add_argument('--fixed-stabilize', action='store_true', help="always wait the full pressurize time")
+    run.add_argument('--decay-fit', choices=("linear", "exponential"), default="linear")
+    run.add_argument('--fit-tolerance', type=float, default=0.0, help="end the decay once the leak rate CI is within this (PSI/s)")
+
+    args = parser.parse_args(argv)
+    if args.command == 'bench':
+        bench(args)
+        return
+
+    faults = Faults.parse(args.faults)
+    if args.port:
+        serve_serial(AlicatEmulator(faults=faults, latency=args.latency, noise=args.noise), args.port)
+        print(f"Emulating Alicats A and B on {args.port}")
+    else:
+        for _ in range(args.stations):
+            emulator = AlicatEmulator(faults=faults, latency=args.latency, noise=args.noise)
+            print(f"Emulating Alicats A and B on {serve_pty(emulator)}")
+    print("Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Batch testing for the Pressure Flow Test recorder
+# - Part numbers are queued from a list file or scanned one at a time (a
+#   barcode scanner types the part number and Enter into the scan field)
+# - Idle stations take the next queued part as soon as their run ends
+# - Finishing a run (Settings summary, xlsx build, metrics file) happens on
+#   a background Finalizer thread, so the next part is already pressurizing
+#   while the previous one is written
+
+import concurrent.futures
+import csv
+import os
+
+
+def read_part_numbers(file_path):
+    """Part numbers from a list file: one per line, or the first column of a CSV.
+
+    Blank lines, # comments and a "Part Number" header are skipped.
+    """
+    with open(file_path, "r", encoding="utf-8-sig", newline="") as file:
+        if os.path.splitext(file_path)[1].lower() == ".csv":
+            values = [row[0] if row else "" for row in csv.reader(file)]
+        else:
+            values = file.read().splitlines()
+    parts = []
+    for value in values:
+        value = value.strip()
+        if not value or value.startswith('#') or value.lower() == "part number":
+            continue
+        parts.append(value)
+    return parts
+
+
+def finalize_run(recorder, metrics):
+    """Add the metrics summary to Settings, build the xlsx and write the metrics file"""
+    # The summary has to be in Settings before the save, so the "save" stage
+    # is only in the metrics file
+    for name, summary in metrics.settings_rows():
+        recorder.add_setting(name, summary)
+    with metrics.stage("save"):
+        recorder.finish()
+    metrics.write(recorder.excel_path)
+    return recorder.excel_path
+
+
+class Finalizer:
+    """Finishes completed runs on one background thread, in completion order"""
+
+    def __init__(self):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="finalize")
+        self.pending = []  # (context, future)
+
+    def submit(self, context, recorder, metrics):
+        """Queue a run for finalizing; `context` is handed back by completed()"""
+        self.pending.append((context, self.executor.submit(finalize_run, recorder, metrics)))
+
+    def completed(self):
+        """Return [(context, excel path or None, error or None)] for runs finished since the last call"""
+        done = [(context, future) for context, future in self.pending if future.done()]
+        if not done:
+            return []
+        self.pending = [(context, future) for context, future in self.pending if not future.done()]
+        results = []
+        for context, future in done:
+            error = future.exception()
+            results.append((context, None if error else future.result(), error))
+        return results
+
+    def shutdown(self):
+        """Wait for every queued run to be written"""
+        self.executor.shutdown(wait=True)
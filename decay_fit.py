@@ -0,0 +1,132 @@
+# Streaming fit of the pressure decay curve
+# Each recorded decay sample updates running moments, so the leak-rate
+# estimate and its 95% confidence interval are available after every sample
+# at O(1) cost. Models (DECAY_FIT in Test.ini):
+#   linear       P(t) = P0 + rate * t
+#   exponential  P(t) = ambient + (P0 - ambient) * exp(-t / tau)
+#                fitted as a line through ln(P - ambient); the reported leak
+#                rate is the fitted curve's slope at t = 0
+# The decay phase ends early once the interval's half-width is within
+# DECAY_FIT_TOLERANCE (PSI/s), at least DECAY_MIN_TIME has been recorded and
+# the fit has MIN_FIT_DF residual degrees of freedom.
+
+import math
+
+FIT_MODELS = ("linear", "exponential")
+
+# Two-sided 95% normal quantile
+Z_95 = 1.959964
+
+# Student-t 97.5% quantiles for 1-30 degrees of freedom
+T_95 = (12.7062, 4.3027, 3.1824, 2.7764, 2.5706, 2.4469, 2.3646, 2.3060, 2.2622, 2.2281,
+        2.2010, 2.1788, 2.1604, 2.1448, 2.1314, 2.1199, 2.1098, 2.1009, 2.0930, 2.0860,
+        2.0796, 2.0739, 2.0687, 2.0639, 2.0595, 2.0555, 2.0518, 2.0484, 2.0452, 2.0423)
+
+# Fewest residual degrees of freedom (samples - 2) the decay may stop early on
+MIN_FIT_DF = 3
+
+
+def t_quantile_95(df):
+    """Student-t 97.5% quantile: exact table up to df 30, Cornish-Fisher (4 terms, within 0.01%) above"""
+    if df <= len(T_95):
+        return T_95[df - 1]
+    z = Z_95
+    return (z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3))
+
+
+class LineFit:
+    """Incremental least-squares line with its residual variance"""
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.sxx = 0.0
+        self.sxy = 0.0
+        self.syy = 0.0
+
+    def add(self, x, y):
+        self.n += 1
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x += dx / self.n
+        self.mean_y += dy / self.n
+        self.sxx += dx * (x - self.mean_x)
+        self.sxy += dx * (y - self.mean_y)
+        self.syy += dy * (y - self.mean_y)
+
+    @property
+    def slope(self):
+        return self.sxy / self.sxx if self.sxx > 0 else math.nan
+
+    @property
+    def intercept(self):
+        return self.mean_y - self.slope * self.mean_x
+
+    def residual_variance(self):
+        """Variance of the residuals about the line; nan until there are 3 points"""
+        if self.n < 3 or self.sxx <= 0:
+            return math.nan
+        return max(self.syy - self.slope * self.sxy, 0.0) / (self.n - 2)
+
+
+class DecayFit:
+    """Leak rate (PSI/s) of a decay, with a 95% confidence half-width"""
+
+    def __init__(self, model="linear", ambient=14.7):
+        if model not in FIT_MODELS:
+            raise ValueError(f"Unknown decay fit model: {model}")
+        self.model = model
+        self.ambient = ambient
+        self.line = LineFit()
+
+    @property
+    def n(self):
+        return self.line.n
+
+    def add(self, t, pressure):
+        if self.model == "linear":
+            self.line.add(t, pressure)
+        elif pressure - self.ambient > 0:
+            self.line.add(t, math.log(pressure - self.ambient))
+
+    def leak_rate(self):
+        """(rate PSI/s, 95% half-width PSI/s); nan until there are enough points"""
+        line = self.line
+        variance = line.residual_variance()
+        if math.isnan(variance):
+            return math.nan, math.nan
+        t = t_quantile_95(line.n - 2)
+        if self.model == "linear":
+            return line.slope, t * math.sqrt(variance / line.sxx)
+        # d/dt of ambient + A * exp(slope * t) at t = 0 is slope * exp(intercept); its
+        # standard error (delta method) carries the intercept's uncertainty as well
+        scale = math.exp(line.intercept)
+        spread = (1 - line.slope * line.mean_x) ** 2 / line.sxx + line.slope ** 2 / line.n
+        return line.slope * scale, t * scale * math.sqrt(variance * spread)
+
+    def time_constant(self):
+        """Exponential model's tau in seconds (nan for the linear model)"""
+        if self.model != "exponential" or not self.line.slope < 0:
+            return math.nan
+        return -1.0 / self.line.slope
+
+    def converged(self, tolerance):
+        """True once the leak rate's 95% half-width is within `tolerance`, from MIN_FIT_DF + 2 samples"""
+        if self.line.n - 2 < MIN_FIT_DF:
+            return False
+        half_width = self.leak_rate()[1]
+        return not math.isnan(half_width) and half_width <= tolerance
+
+    def settings_rows(self):
+        """(name, value) rows for the Settings sheet"""
+        rate, half_width = self.leak_rate()
+        if math.isnan(rate):
+            return [("Decay Fit", f"{self.model} (not enough samples)")]
+        rows = [("Decay Fit", self.model),
+                ("Leak Rate (PSI/s)", round(rate, 5)),
+                ("Leak Rate 95% CI (± PSI/s)", round(half_width, 5))]
+        if self.model == "exponential":
+            rows.append(("Decay Time Constant (s)", round(self.time_constant(), 2)))
+        return rows
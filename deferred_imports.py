@@ -0,0 +1,34 @@
+# Deferred imports for fast GUI startup
+# The Tk windows come up before matplotlib and openpyxl are loaded. preload()
+# imports them on a background thread while the window is drawn; code that
+# needs a module first simply imports it, and Python's import lock makes
+# that import wait for the preload instead of repeating it.
+# Import times are kept in IMPORT_TIMES (reported by startup_bench.py --gui).
+
+import importlib
+import threading
+import time
+
+# Modules each GUI imports in the background after its window is up
+RECORDER_PRELOAD = ("live_plot", "openpyxl")
+PLOTTER_PRELOAD = ("matplotlib.pyplot", "matplotlib.backends.backend_tkagg")
+
+# module name -> seconds its background import took
+IMPORT_TIMES = {}
+
+
+def preload(names):
+    """Import modules on a daemon thread; returns the thread"""
+    def run():
+        for name in names:
+            start = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except Exception:
+                # The import where the module is needed reports the error
+                continue
+            IMPORT_TIMES[name] = time.perf_counter() - start
+
+    thread = threading.Thread(target=run, name="preload", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,177 @@
+# Test configuration for the Dual Alicat Pressure Flow Test
+# Test.ini is read here for both the GUI (Pressure_Flow_v2.py) and the
+# headless runner (pressure_flow_cli.py), so a run from either records the
+# same sequence and Settings. Nothing in this module imports Tk.
+# Keys before the first [PROFILE name] section are the defaults; the
+# per-part-number profiles are built by recipes.py.
+
+# Change path name for your box folder
+OUTPUT_PATH = r"C:\Users\patri\RnD\SW Test Data"
+
+INI_FILE = "Test.ini"
+
+# Serial port of the BB9 line when no STATIONS are configured
+SERIAL_PORT = 'COM23'
+
+# Pressures are absolute (PSI), times in seconds
+AMBIENT_PRESSURE = 14.7
+
+DEFAULTS = {
+    'ambient_pressure': AMBIENT_PRESSURE,
+    'a_flow_test_pressure': AMBIENT_PRESSURE + 10.0,
+    'b_flow_test_pressure': 0.0,
+    'a_decay_test_pressure': 0.0,
+    'b_decay_test_pressure': 0.0,
+    'flow_sample_time': 5.0,
+    'pressure_sample_time': 20.0,
+    'read_rate': .25,
+    'pressure_read_rate': 1.0,
+    'pressurize_time': 10.0,  # maximum stabilize time
+    'adaptive_stabilize': True,
+    'stability_window': 1.0,  # seconds
+    'stability_tolerance': 0.1,  # PSI from setpoint
+    'stability_slope': 0.05,  # PSI/s
+    'stability_std': 0.05,  # PSI
+    'decay_fit': "linear",  # or "exponential"
+    'decay_fit_tolerance': 0.0,  # PSI/s, 0 = always record PRESSURE_SAMPLE_TIME
+    'decay_min_time': 3.0,  # seconds
+    'transaction_timeout': None,  # seconds, None = AlicatLink default
+    'fast_poll': False,
+    'write_binary': False,
+    'stations_config': "",
+}
+
+
+# Test.ini section holding one part number profile: [PROFILE name]
+PROFILE_SECTION = "PROFILE"
+
+
+def parse_flag(value):
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+# Test.ini key -> (parameter, conversion)
+INI_KEYS = {
+    "A_FLOW_TEST_PRESSURE": ('a_flow_test_pressure', float),
+    "B_FLOW_TEST_PRESSURE": ('b_flow_test_pressure', float),
+    "A_DECAY_TEST_PRESSURE": ('a_decay_test_pressure', float),
+    "B_DECAY_TEST_PRESSURE": ('b_decay_test_pressure', float),
+    "FLOW_SAMPLE_TIME": ('flow_sample_time', float),
+    "PRESSURE_SAMPLE_TIME": ('pressure_sample_time', float),
+    "READ_RATE": ('read_rate', float),
+    "PRESSURE_READ_RATE": ('pressure_read_rate', float),
+    "PRESSURIZE_TIME": ('pressurize_time', float),
+    "ADAPTIVE_STABILIZE": ('adaptive_stabilize', parse_flag),
+    "STABILITY_WINDOW": ('stability_window', float),
+    "STABILITY_TOLERANCE": ('stability_tolerance', float),
+    "STABILITY_SLOPE": ('stability_slope', float),
+    "STABILITY_STD": ('stability_std', float),
+    "DECAY_FIT": ('decay_fit', str.lower),
+    "DECAY_FIT_TOLERANCE": ('decay_fit_tolerance', float),
+    "DECAY_MIN_TIME": ('decay_min_time', float),
+    "TRANSACTION_TIMEOUT": ('transaction_timeout', float),
+    "FAST_POLL": ('fast_poll', parse_flag),
+    "WRITE_BINARY": ('write_binary', parse_flag),
+    "STATIONS": ('stations_config', str),
+}
+
+
+def apply_setting(config, key, value):
+    """Set the parameter for a Test.ini KEY=value pair; returns False for an unknown key"""
+    if key not in INI_KEYS:
+        return False
+    name, convert = INI_KEYS[key]
+    config[name] = convert(value.strip())
+    return True
+
+
+def read_sections(file_path=INI_FILE):
+    """Test.ini as (default KEY=value pairs, [(profile name, pairs)]) in file order
+
+    Raises FileNotFoundError if it is missing and ValueError for a section
+    other than [PROFILE name].
+    """
+    defaults = []
+    profiles = []
+    pairs = defaults
+    with open(file_path, "r") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('[') and line.endswith(']'):
+                kind, _, name = line[1:-1].strip().partition(' ')
+                if kind.upper() != PROFILE_SECTION or not name.strip():
+                    raise ValueError(f"Unknown section {line}, expected [{PROFILE_SECTION} name]")
+                pairs = []
+                profiles.append((name.strip(), pairs))
+            elif "=" in line:
+                key, value = line.split('=', 1)
+                pairs.append((key.strip(), value))
+    return defaults, profiles
+
+
+def read_ini(file_path=INI_FILE):
+    """Default parameters from Test.ini over DEFAULTS; raises FileNotFoundError if it is missing"""
+    config = dict(DEFAULTS)
+    for key, value in read_sections(file_path)[0]:
+        apply_setting(config, key, value)
+    return config
+
+
+def create_default_ini(file_path=INI_FILE):
+    """Create a default Test.ini file"""
+    with open(file_path, "w") as file:
+        file.write("# Dual Alicat Test Configuration\n")
+        file.write("# Pressures in PSI\n")
+        file.write("# Times in seconds\n\n")
+        file.write("A_FLOW_TEST_PRESSURE=10.0\n")
+        file.write("B_FLOW_TEST_PRESSURE=0.0\n")
+        file.write("A_DECAY_TEST_PRESSURE=0.0\n")
+        file.write("B_DECAY_TEST_PRESSURE=0.0\n")
+        file.write("FLOW_SAMPLE_TIME=5.0\n")
+        file.write("PRESSURE_SAMPLE_TIME=20.0\n")
+        file.write("READ_RATE=1.0\n")
+        file.write("PRESSURE_READ_RATE=1.0\n")
+        file.write("PRESSURIZE_TIME=10.0\n")
+        file.write("ADAPTIVE_STABILIZE=1\n")
+        file.write("STABILITY_WINDOW=1.0\n")
+        file.write("STABILITY_TOLERANCE=0.1\n")
+        file.write("STABILITY_SLOPE=0.05\n")
+        file.write("STABILITY_STD=0.05\n")
+        file.write("DECAY_FIT=linear\n")
+        file.write("DECAY_FIT_TOLERANCE=0\n")
+        file.write("DECAY_MIN_TIME=3.0\n")
+        # Unset, so FAST_POLL=1 gets its short default timeout
+        file.write("# TRANSACTION_TIMEOUT=0.25\n")
+        file.write("FAST_POLL=0\n")
+        file.write("WRITE_BINARY=0\n")
+        file.write("# STATIONS=Bench 1:COM23, Bench 2:COM24\n\n")
+        file.write("# Part number profiles override the values above, e.g.\n")
+        file.write("# [PROFILE 5 Fr]\n")
+        file.write("# PART_NUMBERS=CTH-05*, 1205?\n")
+        file.write("# A_FLOW_TEST_PRESSURE=18\n")
+
+
+def run_settings(config, part_number, timestamp, station=None, profile=None):
+    """Settings rows journaled at the start of every run"""
+    settings = [("Part Number", part_number), ("Timestamp", timestamp)]
+    if station:
+        settings.append(("Station", station))
+    if profile:
+        settings.append(("Profile", profile))
+    settings += [
+        ("A Flow Test Pressure (PSI)", round(config['a_flow_test_pressure'], 2)),
+        ("B Flow Test Pressure (PSI)", round(config['b_flow_test_pressure'], 2)),
+        ("B Decay Test Pressure (PSI)", round(config['b_decay_test_pressure'], 2)),
+        ("Flow Sample Time (s)", round(config['flow_sample_time'], 2)),
+        ("Pressure Sample Time (s)", round(config['pressure_sample_time'], 2)),
+        ("Read Rate (s)", round(config['read_rate'], 2)),
+        ("Pressurize Time (s)", round(config['pressurize_time'], 2)),
+    ]
+    if config['adaptive_stabilize']:
+        settings.append(("Stability Criteria",
+                         f"±{config['stability_tolerance']} PSI, {config['stability_slope']} PSI/s, "
+                         f"σ {config['stability_std']} PSI over {config['stability_window']} s"))
+    settings.append(("Fast Poll", "On" if config['fast_poll'] else "Off"))
+    return settings
@@ -0,0 +1,176 @@
+# Live Plot for the Pressure Flow Test recorder
+# Keeps one persistent line per trace and redraws by blitting:
+# - Samples are appended to growable NumPy buffers; nothing is re-plotted
+# - Running min/max are updated per sample, so limits never rescan history
+# - refresh() draws at most MAX_FPS frames per second, however fast samples
+#   arrive; a full canvas.draw() only happens when an axis has to grow
+# - The flow phase gets its own axes (A and B mass flow), the decay phase the
+#   familiar Alicat A pressure trace
+
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+MAX_FPS = 10
+
+
+class Trace:
+    """Growable x/y buffers feeding one Line2D"""
+
+    def __init__(self, line, capacity=1024):
+        self.line = line
+        self.x = np.empty(capacity)
+        self.y = np.empty(capacity)
+        self.size = 0
+
+    def append(self, x, y):
+        if self.size == len(self.x):
+            self.x = np.resize(self.x, 2 * self.size)
+            self.y = np.resize(self.y, 2 * self.size)
+        self.x[self.size] = x
+        self.y[self.size] = y
+        self.size += 1
+
+    def clear(self):
+        self.size = 0
+        self.line.set_data([], [])
+
+    def sync(self):
+        self.line.set_data(self.x[:self.size], self.y[:self.size])
+
+
+class LiveAxes:
+    """One axes with its traces and incrementally maintained limits"""
+
+    def __init__(self, ax, padding=0.1):
+        self.ax = ax
+        self.padding = padding
+        self.traces = []
+        self.y_min = None
+        self.y_max = None
+        self.x_max = 1.0
+
+    def add_trace(self, *args, **kwargs):
+        (line,) = self.ax.plot([], [], *args, animated=True, **kwargs)
+        trace = Trace(line)
+        self.traces.append(trace)
+        return trace
+
+    def reset(self, duration):
+        for trace in self.traces:
+            trace.clear()
+        self.y_min = self.y_max = None
+        self.x_max = max(duration, 1.0)
+        self.ax.set_xlim(0, self.x_max)
+        self.ax.set_ylim(0, 1)
+
+    def extend_limits(self, x, y):
+        """Track the running range; returns True if the axes limits had to change"""
+        changed = False
+        if x > self.x_max:
+            self.x_max = x * 1.25
+            self.ax.set_xlim(0, self.x_max)
+            changed = True
+
+        if self.y_min is None:
+            self.y_min = self.y_max = y
+        else:
+            self.y_min = min(self.y_min, y)
+            self.y_max = max(self.y_max, y)
+            low, high = self.ax.get_ylim()
+            if low <= y <= high:
+                return changed
+
+        padding = (self.y_max - self.y_min) * self.padding or 1
+        self.ax.set_ylim(self.y_min - padding, self.y_max + padding)
+        return True
+
+
+class LivePlot:
+    """Flow and decay traces on a Tk canvas, redrawn by blitting"""
+
+    def __init__(self, master, max_fps=MAX_FPS):
+        self.min_interval = 1.0 / max_fps
+        self.last_frame = 0.0
+        self.dirty = False
+        self.needs_full_draw = True
+        self.background = None
+
+        self.fig, (ax_flow, ax_decay) = plt.subplots(2, 1, figsize=(8, 5))
+        ax_flow.set_ylabel('Flow (SLPM)')
+        ax_flow.set_title('Flow Test')
+        ax_flow.grid(True, alpha=0.3)
+        ax_decay.set_xlabel('Time (s)')
+        ax_decay.set_ylabel('Pressure (PSI)')
+        ax_decay.set_title('Alicat A Pressure Decay')
+        ax_decay.grid(True, alpha=0.3)
+
+        self.flow = LiveAxes(ax_flow)
+        self.flow_a = self.flow.add_trace('b-', linewidth=2, label='Alicat A Flow')
+        self.flow_b = self.flow.add_trace('r-', linewidth=2, label='Alicat B Flow')
+        self.decay = LiveAxes(ax_decay)
+        self.pressure_a = self.decay.add_trace('b-', linewidth=2, label='Alicat A Pressure')
+        ax_flow.legend(loc='upper right')
+        ax_decay.legend(loc='upper right')
+        self.fig.tight_layout()
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.canvas.draw()
+
+    def get_tk_widget(self):
+        return self.canvas.get_tk_widget()
+
+    def reset(self, flow_duration, decay_duration):
+        """Clear all traces and size the time axes for the coming run"""
+        self.flow.reset(flow_duration)
+        self.decay.reset(decay_duration)
+        self.needs_full_draw = True
+        self.dirty = True
+        self.refresh(force=True)
+
+    def add_flow(self, elapsed, flow_a, flow_b):
+        self.flow_a.append(elapsed, flow_a)
+        self.flow_b.append(elapsed, flow_b)
+        if self.flow.extend_limits(elapsed, flow_a) | self.flow.extend_limits(elapsed, flow_b):
+            self.needs_full_draw = True
+        self.dirty = True
+
+    def add_decay(self, elapsed, pressure):
+        self.pressure_a.append(elapsed, pressure)
+        if self.decay.extend_limits(elapsed, pressure):
+            self.needs_full_draw = True
+        self.dirty = True
+
+    def on_draw(self, event):
+        # Any full draw (ours, a resize, a Tk expose) invalidates the saved background
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_traces()
+
+    def draw_traces(self):
+        for axes in (self.flow, self.decay):
+            for trace in axes.traces:
+                axes.ax.draw_artist(trace.line)
+
+    def refresh(self, force=False):
+        """Draw pending samples if the frame-rate cap allows it; returns True if a frame was drawn"""
+        now = time.monotonic()
+        if not self.dirty or (not force and now - self.last_frame < self.min_interval):
+            return False
+        self.last_frame = now
+        self.dirty = False
+
+        for axes in (self.flow, self.decay):
+            for trace in axes.traces:
+                trace.sync()
+
+        if self.needs_full_draw or self.background is None:
+            self.needs_full_draw = False
+            self.canvas.draw()
+            return True
+        self.canvas.restore_region(self.background)
+        self.draw_traces()
+        self.canvas.blit(self.fig.bbox)
+        return True
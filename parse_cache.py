@@ -0,0 +1,147 @@
+# Parsed-data cache for the plotter
+# Every xlsx the plotter parses is kept as a .pfr copy (run_format.py) under
+# CACHE_DIR, so reopening it later is a memory-map instead of an XML parse.
+# - Entries are keyed by the source file's absolute path
+# - An entry is only used while the source's size and mtime still match
+# - index.json tracks last use; least recently used entries are evicted
+#   once the cache grows past MAX_CACHE_BYTES
+# - Worker processes can fill entries: write to part_path_for(), then add(),
+#   which moves the finished file into place; an output that will never be
+#   added is deleted with discard()
+# - One instance may be shared by threads (the run index scans in the background)
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+from run_format import RUN_SUFFIX, write_run
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".pressure_flow_cache")
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+INDEX_NAME = "index.json"
+# Suffix of a .pfr a worker is still writing
+PART_SUFFIX = ".part"
+
+
+class ParseCache:
+    """On-disk LRU cache of parsed test files"""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, INDEX_NAME)
+        self.entries = {}
+        self.dirty = False
+        self.lock = threading.RLock()
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                self.entries = json.load(file)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def key(file_path):
+        return hashlib.sha1(os.path.normcase(os.path.abspath(file_path)).encode('utf-8')).hexdigest()
+
+    def lookup(self, file_path):
+        """Return the cached .pfr path for `file_path`, or None if missing or stale"""
+        key = self.key(file_path)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            run_path = os.path.join(self.cache_dir, entry['file'])
+            if (stat.st_size != entry['size'] or stat.st_mtime_ns != entry['mtime_ns']
+                    or not os.path.exists(run_path)):
+                return None
+            entry['last_used'] = time.time()
+            self.dirty = True
+            return run_path
+
+    def run_path_for(self, file_path):
+        """Where the cached .pfr for the current version of `file_path` belongs"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # A new name per source version, so a stale copy that is still
+        # memory-mapped never has to be overwritten
+        mtime_ns = os.stat(file_path).st_mtime_ns
+        return os.path.join(self.cache_dir, f"{self.key(file_path)}_{mtime_ns}{RUN_SUFFIX}")
+
+    def part_path_for(self, file_path):
+        """A private name for a worker to write the .pfr of `file_path` to"""
+        return f"{self.run_path_for(file_path)}.{uuid.uuid4().hex}{PART_SUFFIX}"
+
+    def add(self, file_path, run_path):
+        """Register a .pfr written to run_path_for(file_path) or part_path_for(file_path)"""
+        if run_path.endswith(PART_SUFFIX):
+            final_path = run_path.rsplit(".", 2)[0]
+            os.replace(run_path, final_path)
+            run_path = final_path
+        stat = os.stat(file_path)
+        key = self.key(file_path)
+        file = os.path.basename(run_path)
+        with self.lock:
+            old = self.entries.get(key)
+            if old and old['file'] != file:
+                self._remove_file(old['file'])
+            self.entries[key] = {
+                'source': os.path.abspath(file_path),
+                'file': file,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'bytes': os.path.getsize(run_path),
+                'last_used': time.time(),
+            }
+            self.dirty = True
+            self.evict(keep=key)
+        return run_path
+
+    def discard(self, part_path):
+        """Delete a part_path_for() file that will not be added"""
+        self._remove_file(os.path.basename(part_path))
+
+    def store(self, file_path, settings, rows):
+        """Cache parsed Settings/Data rows for `file_path`; returns the .pfr path"""
+        run_path = write_run(self.run_path_for(file_path), settings, rows)
+        return self.add(file_path, run_path)
+
+    def _remove_file(self, file):
+        try:
+            os.remove(os.path.join(self.cache_dir, file))
+            return True
+        except FileNotFoundError:
+            return True
+        except OSError:
+            # Still mapped by this process on Windows; try again on a later eviction
+            return False
+
+    def evict(self, keep=None):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        with self.lock:
+            total = sum(entry['bytes'] for entry in self.entries.values())
+            for key in sorted(self.entries, key=lambda k: self.entries[k]['last_used']):
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                if self._remove_file(self.entries[key]['file']):
+                    total -= self.entries.pop(key)['bytes']
+                    self.dirty = True
+
+    def save(self):
+        """Write the index if anything changed"""
+        with self.lock:
+            if not self.dirty:
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = self.index_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(self.entries, file)
+            os.replace(temp_path, self.index_path)
+            self.dirty = False
@@ -0,0 +1,40 @@
+# Level-of-detail helpers for the data plotter
+# Full-resolution traces stay in memory; only a shape-preserving subset is
+# handed to matplotlib. Min/max bucketing keeps each bucket's extremes, so
+# spikes and the envelope of a noisy decay survive at any zoom level.
+
+import numpy as np
+
+
+def visible_range(x, x0, x1):
+    """Index range of sorted `x` covering [x0, x1], plus one point either side"""
+    start = max(int(np.searchsorted(x, x0, side='left')) - 1, 0)
+    stop = min(int(np.searchsorted(x, x1, side='right')) + 1, len(x))
+    return start, stop
+
+
+def minmax_decimate(x, y, x0, x1, buckets):
+    """Return (x, y, decimated) for the part of a trace visible in [x0, x1].
+
+    Up to `buckets` equal-count buckets each contribute their min and max
+    sample, in time order, so the result has at most about 2 * buckets points.
+    When the visible range already fits, the original arrays are sliced
+    without copying and `decimated` is False.
+    """
+    start, stop = visible_range(x, x0, x1)
+    count = stop - start
+    buckets = max(int(buckets), 1)
+    if count <= 2 * buckets:
+        return x[start:stop], y[start:stop], False
+
+    size = -(-count // buckets)
+    full = count // size
+    segments = y[start:start + full * size].reshape(full, size)
+    base = start + np.arange(full) * size
+    index = [base + segments.argmin(axis=1), base + segments.argmax(axis=1), [start, stop - 1]]
+    if start + full * size < stop:
+        tail = y[start + full * size:stop]
+        tail_start = start + full * size
+        index.append([tail_start + int(tail.argmin()), tail_start + int(tail.argmax())])
+    index = np.unique(np.concatenate(index))
+    return x[index], y[index], True
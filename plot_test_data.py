@@ -2,21 +2,66 @@
 # Reads Excel files from pressure/flow tests and visualizes the data
 # Features:
 #   - Browse and load Excel test data files
-#   - Display average flow rates from both Alicats
+#   - Per-run statistics (run_analytics.py): flow mean/std per phase, decay
+#     slope, time constant, pressure drop and pressure at fixed time marks
 #   - Plot pressure decay from Alicat A over time
 #   - Compare multiple test files on the same plot
 #   - Clear plot to start fresh comparison
+#   - Loads compact .pfr run files (run_format.py) by memory-mapping them
+#   - Caches parsed xlsx files on disk (parse_cache.py) so reopening is instant
+#   - Multi-select and whole-folder loading, parsed in a process pool
+#   - Level-of-detail drawing: traces are min/max decimated to the axes'
+#     pixel width and re-decimated for the visible range on zoom or pan
+#   - Cursor readout snaps to the nearest sample of every trace
+#   - Search Runs: find runs by part number, date range and station in the
+#     SQLite run index (run_index.py) and load them directly
+#   - Watch Folder: runs that benches finish in a folder are parsed in the
+#     background, indexed and added to the plot (run_watcher.py)
+#   - The window appears before matplotlib is loaded: it is imported in the
+#     background (deferred_imports.py) and the canvas is built on first use
+#   - Loaded runs are compact float32 Traces (trace_store.py) with their
+#     extremes precomputed; the axis limits are kept up to date as runs are
+#     added and removed instead of being rebuilt from the samples
+#   - Ensemble view: all decays resampled onto one time grid and drawn as a
+#     mean line, a +/- k sigma band, a min/max envelope and the outlier runs,
+#     a fixed handful of artists however many files are loaded
 
 import tkinter as tk
-from tkinter import messagebox, filedialog, simpledialog
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from openpyxl import load_workbook
+from tkinter import messagebox, filedialog, simpledialog, ttk
+import numpy as np
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from run_format import RUN_SUFFIX, convert_xlsx, load_run
+from parse_cache import ParseCache
+from plot_lod import minmax_decimate
+from trace_index import TraceIndex
+from trace_store import Trace, TraceSet
+from run_analytics import ENSEMBLE_SIGMA, PRESSURE_MARKS, analyze_runs, ensemble, run_series
+from run_index import INDEX_PATH, RunIndex
+from run_watcher import RunIngester
+from deferred_imports import PLOTTER_PRELOAD, preload
 
 # Default starting directory for file browser
 DEFAULT_DIR = r"C:\Users\patri\RnD\SW Test Data"
 
+# How often a multi-file load checks its worker processes (ms)
+LOAD_POLL_MS = 100
+
+# Cursor readout: at most one lookup per interval (ms), and how many deltas to list
+CURSOR_THROTTLE_MS = 30
+CURSOR_MAX_DELTAS = 6
+
+# Search Runs: rows listed per query, and how often a folder scan is checked (ms)
+SEARCH_LIMIT = 500
+SCAN_POLL_MS = 200
+
+# How often newly ingested runs from a watched folder are collected (ms)
+WATCH_POLL_MS = 500
+
+# Outlier runs named in the ensemble legend
+ENSEMBLE_MAX_NAMES = 5
+
 
 class DataPlottingApp:
     def __init__(self, root):
@@ -25,12 +70,34 @@ class DataPlottingApp:
         self.root.geometry("1000x700")
         
         # Data storage for multiple files
-        self.loaded_files = {}  # {filename: {'avg_flow_a': float, 'avg_flow_b': float, 'time': [], 'pressure': []}}
+        self.loaded_files = TraceSet()  # filename -> Trace (decay, per-phase flows, color, stats)
         self.plot_colors = ['blue', 'red', 'green', 'orange', 'purple', 'brown', 'pink', 'gray']
         self.color_index = 0
         
-        # Build GUI
+        # Parsed copies of previously loaded xlsx files
+        self.cache = ParseCache()
+        self.load_job = None
+        
+        # Plotted line per file; drawn from a decimated copy of the full data
+        self.lines = {}
+        self.lod_pending = False
+        
+        # Cursor readout: nearest-sample index, rebuilt lazily after any change
+        self.trace_index = None
+        self.cursor_position = None
+        self.cursor_pending = False
+        
+        # Run index for Search Runs; opened on first use, scans run on a thread
+        self.run_index = None
+        self.search_window = None
+        self.scan_job = None
+        
+        # Watch Folder: background ingester of newly finished runs
+        self.ingester = None
+        
+        # Build GUI; the plot canvas follows on first use (ensure_plot)
         self.build_gui()
+        preload(PLOTTER_PRELOAD)
         
     def build_gui(self):
         """Build the GUI interface"""
@@ -45,145 +112,298 @@ class DataPlottingApp:
         button_subframe = tk.Frame(control_frame, bg='lightgray')
         button_subframe.pack(anchor='w', padx=10, pady=5)
         
-        self.load_button = tk.Button(button_subframe, text="Load Excel File", command=self.load_file, 
+        self.load_button = tk.Button(button_subframe, text="Load Excel Files", command=self.load_file, 
                                      bg='green', fg='white', width=15, height=1)
         self.load_button.grid(row=0, column=0, padx=5)
         
+        self.load_folder_button = tk.Button(button_subframe, text="Load Folder", command=self.load_folder, 
+                                            bg='green', fg='white', width=15, height=1)
+        self.load_folder_button.grid(row=0, column=1, padx=5)
+        
         self.clear_plot_button = tk.Button(button_subframe, text="Clear Plot", command=self.clear_plot, 
                                           bg='orange', fg='white', width=15, height=1)
-        self.clear_plot_button.grid(row=0, column=1, padx=5)
+        self.clear_plot_button.grid(row=0, column=2, padx=5)
         
         self.remove_last_button = tk.Button(button_subframe, text="Remove Plot", command=self.remove_last_file, 
                                            bg='red', fg='white', width=15, height=1)
-        self.remove_last_button.grid(row=0, column=2, padx=5)
+        self.remove_last_button.grid(row=0, column=3, padx=5)
+        
+        self.search_button = tk.Button(button_subframe, text="Search Runs", command=self.open_search, 
+                                       bg='steelblue', fg='white', width=15, height=1)
+        self.search_button.grid(row=0, column=4, padx=5)
+        
+        self.watch_button = tk.Button(button_subframe, text="Watch Folder", command=self.toggle_watch, 
+                                      bg='steelblue', fg='white', width=15, height=1)
+        self.watch_button.grid(row=0, column=5, padx=5)
+        
+        self.ensemble_view = tk.BooleanVar(value=False)
+        tk.Checkbutton(button_subframe, text="Ensemble", variable=self.ensemble_view, command=self.update_plot,
+                       bg='lightgray').grid(row=0, column=6, padx=5)
         
         # Info panel
-        info_frame = tk.LabelFrame(self.root, text="Loaded Files & Average Flow Rates", padx=10, pady=10)
+        info_frame = tk.LabelFrame(self.root, text="Loaded Files & Run Statistics", padx=10, pady=10)
         info_frame.grid(row=1, column=0, columnspan=2, sticky='ew', padx=10, pady=5)
         
-        self.info_text = tk.Text(info_frame, height=8, width=120, state='disabled')
+        self.info_text = tk.Text(info_frame, height=8, width=120, state='disabled', wrap='none')
         scrollbar = tk.Scrollbar(info_frame, command=self.info_text.yview)
-        self.info_text.config(yscrollcommand=scrollbar.set)
+        x_scrollbar = tk.Scrollbar(info_frame, orient='horizontal', command=self.info_text.xview)
+        self.info_text.config(yscrollcommand=scrollbar.set, xscrollcommand=x_scrollbar.set)
         self.info_text.grid(row=0, column=0, sticky='nsew')
         scrollbar.grid(row=0, column=1, sticky='ns')
+        x_scrollbar.grid(row=1, column=0, sticky='ew')
+        info_frame.grid_columnconfigure(0, weight=1)
         
         # Plot area
-        plot_frame = tk.LabelFrame(self.root, text="Alicat A Pressure Decay Comparison", padx=10, pady=10)
-        plot_frame.grid(row=2, column=0, columnspan=2, sticky='nsew', padx=10, pady=10)
+        self.plot_frame = tk.LabelFrame(self.root, text="Alicat A Pressure Decay Comparison", padx=10, pady=10)
+        self.plot_frame.grid(row=2, column=0, columnspan=2, sticky='nsew', padx=10, pady=10)
+        
+        self.fig = self.ax = self.canvas = None
+        self.plot_placeholder = tk.Label(self.plot_frame, text="Load test data files to plot them",
+                                         fg='gray', font=('Arial', 12))
+        self.plot_placeholder.pack(fill='both', expand=True)
         
+        # Configure grid weights
+        self.root.grid_rowconfigure(2, weight=1)
+        self.root.grid_columnconfigure(0, weight=1)
+        
+    def ensure_plot(self):
+        """Build the matplotlib figure and canvas the first time something is plotted"""
+        if self.canvas is not None:
+            return
+        # Usually already imported by the background preload
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+        
+        self.plot_placeholder.destroy()
         self.fig, self.ax = plt.subplots(figsize=(10, 5))
         self.ax.set_xlabel('Time (s)', fontsize=12)
         self.ax.set_ylabel('Pressure (PSI)', fontsize=12)
         self.ax.set_title('Alicat A Pressure Decay - Multiple Test Comparison')
         self.ax.grid(True, alpha=0.3)
         
-        self.canvas = FigureCanvasTkAgg(self.fig, master=plot_frame)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
         self.canvas.draw()
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self.plot_frame, pack_toolbar=False)
+        self.toolbar.update()
+        self.toolbar.pack(side='bottom', fill='x')
         self.canvas.get_tk_widget().pack(fill='both', expand=True)
+        self.canvas.mpl_connect('resize_event', self.on_view_changed)
 
-        self.cursor_label = tk.Label(plot_frame, text="Time: -- s | Pressure: -- PSI", font=('Arial', 12))
+        self.cursor_label = tk.Label(self.plot_frame, text="Time: -- s | Pressure: -- PSI", font=('Arial', 12),
+                                     justify='left', wraplength=900)
         self.cursor_label.pack(anchor='w', padx=5, pady=(5, 0))
 
         self.canvas.mpl_connect('motion_notify_event', self.on_mouse_move)
         
-        # Configure grid weights
-        self.root.grid_rowconfigure(2, weight=1)
-        self.root.grid_columnconfigure(0, weight=1)
-        
     def load_file(self):
-        """Open file dialog and load Excel file"""
+        """Open file dialog and load one or more test data files"""
         # Determine starting directory
         start_dir = DEFAULT_DIR if os.path.exists(DEFAULT_DIR) else os.path.expanduser("~")
         
-        file_path = filedialog.askopenfilename(
+        file_paths = filedialog.askopenfilenames(
             initialdir=start_dir,
-            filetypes=[("Excel Files", "*.xlsx"), ("All Files", "*.*")],
-            title="Select Test Data File"
+            filetypes=[("Test Data Files", "*.xlsx *.pfr"), ("Excel Files", "*.xlsx"),
+                       ("Run Files", "*.pfr"), ("All Files", "*.*")],
+            title="Select Test Data Files"
         )
         
-        if not file_path:
+        if file_paths:
+            self.load_files(list(file_paths))
+    
+    def load_folder(self):
+        """Load every test data file in a folder"""
+        start_dir = DEFAULT_DIR if os.path.exists(DEFAULT_DIR) else os.path.expanduser("~")
+        folder = filedialog.askdirectory(initialdir=start_dir, title="Select Test Data Folder")
+        if not folder:
             return
         
-        try:
-            self.parse_excel_file(file_path)
-            self.update_plot()
-            self.update_info_display()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load file:\n{e}")
+        names = [name for name in sorted(os.listdir(folder)) if not name.startswith("~$")]
+        run_names = {os.path.splitext(name)[0] for name in names if name.lower().endswith(RUN_SUFFIX)}
+        file_paths = []
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            # A .pfr copy of an xlsx holds the same run; load it instead of the xlsx
+            if ext.lower() == RUN_SUFFIX or (ext.lower() == ".xlsx" and stem not in run_names):
+                file_paths.append(os.path.join(folder, name))
+        
+        if not file_paths:
+            messagebox.showinfo("Info", "No test data files found in that folder.")
+            return
+        self.load_files(file_paths)
     
-    def parse_excel_file(self, file_path):
-        """Parse Excel file and extract data"""
-        workbook = load_workbook(file_path)
+    def load_files(self, file_paths):
+        """Load files, parsing uncached xlsx files in a process pool"""
+        if self.load_job:
+            messagebox.showinfo("Info", "Files are still loading. Please wait or cancel first.")
+            return
         
-        # Get filename for display
-        filename = os.path.basename(file_path)
+        errors = []
+        skipped = []
+        pending = []
+        for file_path in file_paths:
+            filename = os.path.basename(file_path)
+            if filename in self.loaded_files:
+                skipped.append(filename)
+                continue
+            try:
+                if file_path.lower().endswith(RUN_SUFFIX):
+                    self.parse_run_file(file_path)
+                else:
+                    run_path = self.cache.lookup(file_path)
+                    if run_path is None:
+                        pending.append(file_path)
+                    else:
+                        self.parse_run_file(run_path, filename)
+            except Exception as e:
+                errors.append(f"{filename}: {e}")
+        
+        self.cache.save()
+        self.update_plot()
+        self.update_info_display()
         
-        # Check if file already loaded
-        if filename in self.loaded_files:
-            messagebox.showinfo("Info", f"{filename} is already loaded.")
+        if skipped and len(file_paths) == 1:
+            messagebox.showinfo("Info", f"{skipped[0]} is already loaded.")
+        if pending:
+            self.start_load_job(pending, errors)
+        elif errors:
+            self.show_load_errors(errors)
+    
+    def start_load_job(self, file_paths, errors):
+        """Parse xlsx files in worker processes and show a progress window"""
+        # Cache paths need a stat of each source; take them before there is a pool to leak
+        jobs = []
+        for file_path in file_paths:
+            try:
+                jobs.append((file_path, self.cache.part_path_for(file_path)))
+            except OSError as e:
+                errors.append(f"{os.path.basename(file_path)}: {e}")
+        if not jobs:
+            self.show_load_errors(errors)
+            return
+        file_paths = [file_path for file_path, _ in jobs]
+        
+        executor = ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1))
+        futures = {}
+        for file_path, part_path in jobs:
+            futures[executor.submit(convert_xlsx, file_path, part_path)] = (file_path, part_path)
+        
+        window = tk.Toplevel(self.root)
+        window.title("Loading Files")
+        window.geometry("400x120")
+        window.transient(self.root)
+        window.protocol("WM_DELETE_WINDOW", self.cancel_load_job)
+        
+        label = tk.Label(window, text=f"Parsing 0 of {len(file_paths)} files...", font=('Arial', 11))
+        label.pack(padx=10, pady=(10, 5))
+        progress = ttk.Progressbar(window, maximum=len(file_paths), length=360)
+        progress.pack(padx=10, pady=5)
+        tk.Button(window, text="Cancel", command=self.cancel_load_job, bg='gray', fg='white', width=12).pack(pady=5)
+        
+        self.load_job = {
+            'executor': executor,
+            'futures': futures,
+            'total': len(file_paths),
+            'done': 0,
+            'errors': errors,
+            'window': window,
+            'label': label,
+            'progress': progress,
+        }
+        self.root.after(LOAD_POLL_MS, self.poll_load_job)
+    
+    def poll_load_job(self):
+        """Add files whose parse has finished and update the progress window"""
+        job = self.load_job
+        if job is None:
             return
         
-        # Read data from Data sheet
-        if "Data" not in workbook.sheetnames:
-            raise ValueError("Excel file must contain a 'Data' sheet")
-        
-        data_sheet = workbook["Data"]
+        added = False
+        for future in [f for f in job['futures'] if f.done()]:
+            file_path, part_path = job['futures'].pop(future)
+            filename = os.path.basename(file_path)
+            job['done'] += 1
+            try:
+                try:
+                    run_path = self.cache.add(file_path, future.result())
+                except Exception:
+                    self.cache.discard(part_path)
+                    raise
+                if filename not in self.loaded_files:
+                    self.parse_run_file(run_path, filename)
+                    added = True
+            except Exception as e:
+                job['errors'].append(f"{filename}: {e}")
+        
+        if added:
+            self.update_plot()
+            self.update_info_display()
+        job['progress']['value'] = job['done']
+        job['label'].config(text=f"Parsing {job['done']} of {job['total']} files...")
         
-        time_data = []
-        pressure_data = []
-        flow_a_values = []
-        flow_b_values = []
+        if job['futures']:
+            self.root.after(LOAD_POLL_MS, self.poll_load_job)
+        else:
+            self.end_load_job()
+    
+    def cancel_load_job(self):
+        """Stop parsing; files that already finished stay loaded"""
+        if self.load_job:
+            # Parses that are running, or finished since the last poll, are never added
+            # to the cache, so their outputs are deleted as soon as they are written
+            for future, (_, part_path) in self.load_job['futures'].items():
+                if not future.cancel():
+                    future.add_done_callback(lambda _, part_path=part_path: self.cache.discard(part_path))
+            self.end_load_job()
+    
+    def end_load_job(self):
+        job = self.load_job
+        self.load_job = None
+        job['executor'].shutdown(wait=False, cancel_futures=True)
+        job['window'].destroy()
+        self.cache.save()
+        if job['errors']:
+            self.show_load_errors(job['errors'])
+    
+    def show_load_errors(self, errors):
+        shown = "\n".join(errors[:10])
+        if len(errors) > 10:
+            shown += f"\n... and {len(errors) - 10} more"
+        messagebox.showerror("Error", f"Failed to load {len(errors)} file(s):\n{shown}")
+    
+    def parse_run_file(self, file_path, filename=None):
+        """Load a .pfr run file; decay columns are memory-mapped, not copied"""
+        filename = filename or os.path.basename(file_path)
+        if filename in self.loaded_files:
+            messagebox.showinfo("Info", f"{filename} is already loaded.")
+            return
         
-        # Parse rows (skip header)
-        for row_idx, row in enumerate(data_sheet.iter_rows(min_row=2, values_only=True), start=2):
-            if row[0] is None:  # Skip empty rows
-                continue
-            
-            phase = row[0]
-            
-            # Only process Pressure Decay phase
-            if phase == "Pressure Decay":
-                try:
-                    time_val = float(row[1]) if row[1] is not None else 0
-                    pressure_val = float(row[2]) if row[2] is not None else 0
-                    flow_a = float(row[4]) if row[4] is not None else 0
-                    flow_b = float(row[5]) if row[5] is not None else 0
-                    
-                    time_data.append(time_val)
-                    pressure_data.append(pressure_val)
-                    flow_a_values.append(flow_a)
-                    flow_b_values.append(flow_b)
-                except (ValueError, TypeError):
-                    continue
-            elif phase == "Flow Test":
-                # Also collect flow data from Flow Test phase
-                try:
-                    flow_a = float(row[4]) if row[4] is not None else 0
-                    flow_b = float(row[5]) if row[5] is not None else 0
-                    flow_a_values.append(flow_a)
-                    flow_b_values.append(flow_b)
-                except (ValueError, TypeError):
-                    continue
-        
-        # Calculate averages
-        avg_flow_a = sum(flow_a_values) / len(flow_a_values) if flow_a_values else 0
-        avg_flow_b = sum(flow_b_values) / len(flow_b_values) if flow_b_values else 0
-        
-        # Store data
-        self.loaded_files[filename] = {
-            'avg_flow_a': avg_flow_a,
-            'avg_flow_b': avg_flow_b,
-            'time': time_data,
-            'pressure': pressure_data,
-            'color': self.plot_colors[self.color_index % len(self.plot_colors)]
-        }
+        series = run_series(load_run(file_path))
+        time_data = series.pop('time')
+        pressure_data = series.pop('pressure')
+        self.store_file(filename, time_data, pressure_data, series)
+    
+    def store_file(self, filename, time_data, pressure_data, flows):
+        """Add a parsed file to the loaded set with the next plot color.
+        
+        Statistics are filled in later, for all new files in one pass.
+        """
+        # Level-of-detail and cursor lookups binary-search the time axis
+        if len(time_data) > 1 and np.any(np.diff(time_data) < 0):
+            order = np.argsort(time_data, kind='stable')
+            time_data, pressure_data = time_data[order], pressure_data[order]
+        color = self.plot_colors[self.color_index % len(self.plot_colors)]
+        self.loaded_files.add(filename, Trace(time_data, pressure_data, flows, color))
         
         self.color_index += 1
         
     def update_plot(self):
         """Update the pressure decay plot with all loaded files"""
+        self.ensure_plot()
         self.ax.clear()
         
+        # The drawn lines and the cursor index belong to the previous set of traces
+        self.lines = {}
+        self.trace_index = None
         if not self.loaded_files:
             self.ax.set_xlabel('Time (s)', fontsize=12)
             self.ax.set_ylabel('Pressure (PSI)', fontsize=12)
@@ -192,69 +412,183 @@ class DataPlottingApp:
             self.canvas.draw()
             return
         
-        # Plot each loaded file
-        for filename, data in self.loaded_files.items():
-            if data['time'] and data['pressure']:
-                self.ax.plot(data['time'], data['pressure'], marker='o', linewidth=2, 
-                           label=filename, color=data['color'], markersize=3, alpha=0.7)
+        # Plot each loaded file, decimated to the axes' pixel width, or the ensemble of all of them
+        if self.ensemble_view.get():
+            self.plot_ensemble()
+        else:
+            buckets = self.ax.bbox.width
+            for filename, trace in self.loaded_files.items():
+                if trace.length:
+                    time_data, pressure_data, decimated = minmax_decimate(
+                        trace.time, trace.pressure, -np.inf, np.inf, buckets)
+                    (line,) = self.ax.plot(time_data, pressure_data, marker='' if decimated else 'o', linewidth=2, 
+                                           label=filename, color=trace.color, markersize=3, alpha=0.7)
+                    self.lines[filename] = line
         
         self.ax.set_xlabel('Time (s)', fontsize=12)
         self.ax.set_ylabel('Pressure (PSI)', fontsize=12)
         self.ax.set_title('Alicat A Pressure Decay - Multiple Test Comparison')
         self.ax.grid(True, alpha=0.3)
         
-        # Set reasonable y-axis limits
-        all_pressures = []
-        for data in self.loaded_files.values():
-            all_pressures.extend(data['pressure'])
-        if all_pressures:
-            min_p = min(all_pressures)
-            max_p = max(all_pressures)
+        # Set the axis limits from the ranges kept by the TraceSet (no pass over the samples)
+        time_range = self.loaded_files.time_range()
+        if time_range and time_range[1] > time_range[0]:
+            self.ax.set_xlim(*time_range)
+        pressure_range = self.loaded_files.pressure_range()
+        if pressure_range:
+            min_p, max_p = pressure_range
             padding = (max_p - min_p) * 0.1 or 1
             self.ax.set_ylim(min_p - padding, max_p + padding)
         
+        # ax.clear() drops callbacks, so reconnect the zoom/pan hook each time
+        self.ax.callbacks.connect('xlim_changed', self.on_view_changed)
         self.canvas.draw()
 
+    def plot_ensemble(self):
+        """Draw every loaded decay as one ensemble: min/max envelope, mean ± kσ band, mean and outliers"""
+        filenames = [filename for filename, trace in self.loaded_files.items() if trace.length]
+        result = ensemble([self.loaded_files[filename].time for filename in filenames],
+                          [self.loaded_files[filename].pressure for filename in filenames])
+        if result is None:
+            return
+        grid = result['time']
+        self.ax.fill_between(grid, result['min'], result['max'], color='lightgray', alpha=0.7, linewidth=0,
+                             label="Min / max")
+        self.ax.fill_between(grid, result['lower'], result['upper'], color='steelblue', alpha=0.35, linewidth=0,
+                             label=f"Mean ± {ENSEMBLE_SIGMA:g}σ")
+        self.ax.plot(grid, result['mean'], color='navy', linewidth=2, label=f"Mean ({len(filenames)} runs)")
+        
+        # All outlier runs are one LineCollection, drawn from their resampled traces
+        outliers = np.flatnonzero(result['outliers'])
+        if len(outliers):
+            from matplotlib.collections import LineCollection
+            segments = []
+            for i in outliers:
+                valid = np.isfinite(result['resampled'][i])
+                segments.append(np.column_stack((grid[valid], result['resampled'][i][valid])))
+            names = ", ".join(filenames[i] for i in outliers[:ENSEMBLE_MAX_NAMES])
+            if len(outliers) > ENSEMBLE_MAX_NAMES:
+                names += f", +{len(outliers) - ENSEMBLE_MAX_NAMES} more"
+            self.ax.add_collection(LineCollection(segments, colors='red', linewidths=1.2, alpha=0.8,
+                                                  label=f"Outliers: {names}"))
+        self.ax.legend(loc='upper right', fontsize=9)
+    
+    def on_view_changed(self, *args):
+        """Re-decimate once the current zoom/pan/resize settles"""
+        if not self.lod_pending:
+            self.lod_pending = True
+            self.root.after_idle(self.redecimate)
+    
+    def redecimate(self):
+        """Redraw every trace from the full data for the visible time range only"""
+        self.lod_pending = False
+        x0, x1 = self.ax.get_xlim()
+        buckets = self.ax.bbox.width
+        for filename, line in self.lines.items():
+            trace = self.loaded_files.get(filename)
+            if trace is None:
+                continue
+            time_data, pressure_data, decimated = minmax_decimate(trace.time, trace.pressure, x0, x1, buckets)
+            line.set_data(time_data, pressure_data)
+            line.set_marker('' if decimated else 'o')
+        self.canvas.draw_idle()
+
     def on_mouse_move(self, event):
-        """Update cursor readout with time and pressure under the mouse"""
+        """Remember the mouse position; the readout catches up every CURSOR_THROTTLE_MS"""
         if event.inaxes != self.ax or event.xdata is None or event.ydata is None:
+            self.cursor_position = None
+        else:
+            self.cursor_position = (event.xdata, event.ydata)
+        
+        if not self.cursor_pending:
+            self.cursor_pending = True
+            self.root.after(CURSOR_THROTTLE_MS, self.update_cursor)
+    
+    def update_cursor(self):
+        """Snap the readout to the nearest sample of every loaded trace"""
+        self.cursor_pending = False
+        if self.cursor_position is None:
             self.cursor_label.config(text="Time: -- s | Pressure: -- PSI")
             return
-
-        self.cursor_label.config(text=f"Time: {event.xdata:.2f} s | Pressure: {event.ydata:.2f} PSI")
+        
+        x, y = self.cursor_position
+        if not self.loaded_files:
+            self.cursor_label.config(text=f"Time: {x:.2f} s | Pressure: {y:.2f} PSI")
+            return
+        if self.trace_index is None:
+            self.trace_index = TraceIndex((filename, trace.time, trace.pressure)
+                                          for filename, trace in self.loaded_files.items())
+        if not len(self.trace_index):
+            self.cursor_label.config(text=f"Time: {x:.2f} s | Pressure: {y:.2f} PSI")
+            return
+        
+        names = self.trace_index.names
+        times, pressures = self.trace_index.nearest(x)
+        
+        # The trace under the mouse is the reference; the others are shown relative to it
+        ref = int(np.argmin(np.abs(pressures - y)))
+        text = f"{names[ref]} | Time: {times[ref]:.2f} s | Pressure: {pressures[ref]:.2f} PSI"
+        others = [i for i in range(len(names)) if i != ref]
+        if others:
+            deltas = " | ".join(f"{names[i]}: {pressures[i] - pressures[ref]:+.2f}"
+                                for i in others[:CURSOR_MAX_DELTAS])
+            if len(others) > CURSOR_MAX_DELTAS:
+                deltas += f" | +{len(others) - CURSOR_MAX_DELTAS} more"
+            text += f"\n\u0394P vs others (PSI): {deltas}"
+        self.cursor_label.config(text=text)
+    
+    def update_analytics(self):
+        """Compute statistics for every file that has none yet, in one bulk pass"""
+        pending = [trace for trace in self.loaded_files.values() if trace.stats is None]
+        for trace, stats in zip(pending, analyze_runs(pending)):
+            trace.stats = stats
     
     def update_info_display(self):
-        """Update the info text display with loaded files and flow data"""
+        """Update the info text display with loaded files and their statistics"""
+        self.update_analytics()
         self.info_text.config(state='normal')
         self.info_text.delete('1.0', tk.END)
         
         # Configure color tags for each file
-        for filename, data in self.loaded_files.items():
-            color = data['color']
-            self.info_text.tag_config(f"color_{filename}", foreground=color, font=('Courier', 12, 'bold'))
+        for filename, trace in self.loaded_files.items():
+            self.info_text.tag_config(f"color_{filename}", foreground=trace.color, font=('Courier', 12, 'bold'))
         
         if not self.loaded_files:
-            self.info_text.insert(tk.END, "No files loaded. Click 'Load Excel File' to get started.")
+            self.info_text.insert(tk.END, "No files loaded. Click 'Load Excel Files' or 'Load Folder' to get started.")
         else:
             # Calculate column widths based on actual data
             max_filename_len = max(len("File Name"), max(len(f) for f in self.loaded_files.keys()))
             col1_width = max_filename_len + 2
-            col2_width = 20
-            col3_width = 20
+            columns = [("Flow A (SLPM)", 18), ("Flow B (SLPM)", 18), ("Decay Flow A", 18), ("Decay Flow B", 18),
+                       ("Slope (PSI/s)", 14), ("Tau (s)", 9), ("Drop (PSI)", 11)]
+            columns += [(f"P@{mark:g}s (PSI)", 14) for mark in PRESSURE_MARKS]
+            
+            def number(value, digits=3):
+                return "-" if np.isnan(value) else f"{value:.{digits}f}"
+            
+            def mean_std(stats, name):
+                if np.isnan(stats[f'{name}_mean']):
+                    return "-"
+                return f"{stats[f'{name}_mean']:.3f} \u00b1 {number(stats[f'{name}_std'])}"
             
             # Create header
-            header = f"{'File Name':<{col1_width}} {'Avg Flow A (SLPM)':<{col2_width}} {'Avg Flow B (SLPM)':<{col3_width}}\n"
-            header += "-" * (col1_width + col2_width + col3_width) + "\n"
+            header = f"{'File Name':<{col1_width}}" + "".join(f" {title:<{width}}" for title, width in columns) + "\n"
+            header += "-" * (col1_width + sum(width + 1 for _, width in columns)) + "\n"
             self.info_text.insert(tk.END, header)
             
-            for filename, data in self.loaded_files.items():
+            for filename, trace in self.loaded_files.items():
                 # Insert filename with color tag
                 filename_str = f"{filename:<{col1_width}}"
                 self.info_text.insert(tk.END, filename_str, f"color_{filename}")
                 
-                # Insert flow data in normal text
-                flow_str = f"{data['avg_flow_a']:<{col2_width}.3f} {data['avg_flow_b']:<{col3_width}.3f}\n"
-                self.info_text.insert(tk.END, flow_str)
+                # Insert statistics in normal text (flows of the Flow Test, then the Pressure Decay phase)
+                stats = trace.stats
+                values = [mean_std(stats, 'flow_a'), mean_std(stats, 'flow_b'),
+                          mean_std(stats, 'decay_flow_a'), mean_std(stats, 'decay_flow_b'),
+                          number(stats['decay_slope'], 4), number(stats['time_constant'], 1),
+                          number(stats['pressure_drop'], 2)]
+                values += [number(stats['pressure_at'][mark], 2) for mark in PRESSURE_MARKS]
+                self.info_text.insert(tk.END, "".join(f" {value:<{width}}" for value, (_, width) in zip(values, columns)) + "\n")
         
         self.info_text.config(state='disabled')
     
@@ -303,8 +637,7 @@ class DataPlottingApp:
         # Add files to listbox with their colors
         for filename in file_list:
             listbox.insert(tk.END, filename)
-            color = self.loaded_files[filename]['color']
-            listbox.itemconfig(tk.END, fg=color)
+            listbox.itemconfig(tk.END, fg=self.loaded_files[filename].color)
         
         # Select first item by default
         if listbox.size() > 0:
@@ -333,6 +666,239 @@ class DataPlottingApp:
         tk.Button(button_frame, text="Remove", command=remove_selected, bg='red', fg='white', width=12, padx=10).pack(side='left', padx=5)
         tk.Button(button_frame, text="Cancel", command=cancel, bg='gray', fg='white', width=12, padx=10).pack(side='left', padx=5)
 
+    
+    def open_search(self):
+        """Show the Search Runs window: filter the run index and load matching runs"""
+        if self.search_window is not None:
+            self.search_window['window'].lift()
+            return
+        if self.run_index is None:
+            try:
+                self.run_index = RunIndex()
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not open the run index:\n{e}")
+                return
+        
+        window = tk.Toplevel(self.root)
+        window.title("Search Runs")
+        window.geometry("900x450")
+        window.protocol("WM_DELETE_WINDOW", self.close_search)
+        
+        filter_frame = tk.Frame(window)
+        filter_frame.pack(fill='x', padx=10, pady=(10, 5))
+        filters = {}
+        for column, (key, label, width) in enumerate([('part', "Part Number:", 16), ('since', "From:", 12),
+                                                      ('until', "To:", 12), ('station', "Station:", 12)]):
+            tk.Label(filter_frame, text=label).grid(row=0, column=2 * column, sticky='e', padx=(8, 2))
+            filters[key] = tk.StringVar()
+            entry = tk.Entry(filter_frame, textvariable=filters[key], width=width)
+            entry.grid(row=0, column=2 * column + 1, sticky='w')
+            entry.bind('<Return>', lambda event: self.run_search())
+        tk.Button(filter_frame, text="Search", command=self.run_search, bg='steelblue', fg='white', 
+                  width=10).grid(row=0, column=8, padx=8)
+        tk.Label(filter_frame, text="Part number: * and ? wildcards, otherwise any part containing the text. "
+                 "Dates: YYYY-MM-DD [HH:MM]", fg='gray').grid(row=1, column=0, columnspan=9, sticky='w', pady=(4, 0))
+        
+        tree_frame = tk.Frame(window)
+        tree_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        columns = [('timestamp', "Time", 140), ('part_number', "Part Number", 120), ('station', "Station", 90),
+                   ('flow_a_mean', "Flow A", 70), ('flow_b_mean', "Flow B", 70), ('decay_slope', "Slope", 80),
+                   ('leak_rate', "Leak Rate", 80), ('filename', "File", 240)]
+        tree = ttk.Treeview(tree_frame, columns=[key for key, _, _ in columns], show='headings', selectmode='extended')
+        for key, heading, width in columns:
+            tree.heading(key, text=heading)
+            tree.column(key, width=width, anchor='w' if key in ('part_number', 'station', 'filename') else 'e')
+        scrollbar = tk.Scrollbar(tree_frame, command=tree.yview)
+        tree.config(yscrollcommand=scrollbar.set)
+        tree.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
+        tree.bind('<Double-1>', lambda event: self.load_search_results(selected=True))
+        
+        button_frame = tk.Frame(window)
+        button_frame.pack(fill='x', padx=10, pady=(5, 10))
+        tk.Button(button_frame, text="Load Selected", command=lambda: self.load_search_results(selected=True), 
+                  bg='green', fg='white', width=14).pack(side='left', padx=5)
+        tk.Button(button_frame, text="Load All", command=lambda: self.load_search_results(selected=False), 
+                  bg='green', fg='white', width=14).pack(side='left', padx=5)
+        scan_button = tk.Button(button_frame, text="Scan Folder...", command=self.scan_folder, 
+                                bg='gray', fg='white', width=14)
+        scan_button.pack(side='left', padx=5)
+        status = tk.Label(button_frame, text="", anchor='w')
+        status.pack(side='left', fill='x', expand=True, padx=10)
+        
+        self.search_window = {
+            'window': window,
+            'filters': filters,
+            'tree': tree,
+            'paths': {},  # tree item -> run file path
+            'scan_button': scan_button,
+            'status': status,
+        }
+        self.run_search()
+    
+    def close_search(self):
+        """Close the Search Runs window; a running scan still finishes in the background"""
+        if self.search_window is not None:
+            self.search_window['window'].destroy()
+            self.search_window = None
+    
+    def run_search(self):
+        """List index rows matching the filters, newest first"""
+        search = self.search_window
+        if search is None:
+            return
+        filters = {key: var.get().strip() or None for key, var in search['filters'].items()}
+        try:
+            rows = self.run_index.search(limit=SEARCH_LIMIT, **filters)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e), parent=search['window'])
+            return
+        
+        def number(value, digits):
+            return "-" if value is None else f"{value:.{digits}f}"
+        
+        tree = search['tree']
+        tree.delete(*tree.get_children())
+        search['paths'] = {}
+        for row in rows:
+            item = tree.insert('', tk.END, values=(
+                row['timestamp'], row['part_number'] or "-", row['station'] or "-",
+                number(row['flow_a_mean'], 3), number(row['flow_b_mean'], 3),
+                number(row['decay_slope'], 4), number(row['leak_rate'], 4), row['filename']))
+            search['paths'][item] = row['path']
+        
+        if not self.scan_job:
+            more = " (showing the newest)" if len(rows) == SEARCH_LIMIT else ""
+            search['status'].config(text=f"{len(rows)} run(s){more}")
+    
+    def load_search_results(self, selected=True):
+        """Load the selected (or every listed) run into the plot"""
+        search = self.search_window
+        if search is None:
+            return
+        items = search['tree'].selection() if selected else search['tree'].get_children()
+        paths = [search['paths'][item] for item in items if item in search['paths']]
+        if not paths:
+            messagebox.showinfo("Info", "No runs selected.", parent=search['window'])
+            return
+        missing = [path for path in paths if not os.path.exists(path)]
+        if missing:
+            messagebox.showwarning("Warning", f"{len(missing)} run file(s) no longer exist; "
+                                   "scan the folder again to update the index.", parent=search['window'])
+            paths = [path for path in paths if path not in missing]
+        if paths:
+            self.load_files(paths)
+    
+    def scan_folder(self):
+        """Index new and changed runs under a folder on a background thread"""
+        if self.scan_job:
+            return
+        parent = self.search_window['window'] if self.search_window else self.root
+        start_dir = DEFAULT_DIR if os.path.exists(DEFAULT_DIR) else os.path.expanduser("~")
+        folder = filedialog.askdirectory(initialdir=start_dir, title="Select Folder to Index", parent=parent)
+        if not folder:
+            return
+        
+        job = {'folder': folder, 'done': 0, 'total': 0, 'result': None, 'error': None}
+        
+        def progress(done, total):
+            job['done'], job['total'] = done, total
+        
+        def scan():
+            # SQLite connections belong to their thread, so the scan opens its own
+            index = RunIndex(self.run_index.index_path)
+            try:
+                job['result'] = index.scan(folder, cache=self.cache, progress=progress)
+            except Exception as e:
+                job['error'] = e
+            finally:
+                index.close()
+        
+        job['thread'] = threading.Thread(target=scan, name="run-index-scan", daemon=True)
+        self.scan_job = job
+        if self.search_window:
+            self.search_window['scan_button'].config(state='disabled')
+        job['thread'].start()
+        self.root.after(SCAN_POLL_MS, self.poll_scan)
+    
+    def poll_scan(self):
+        """Show scan progress; refresh the search results once it is done"""
+        job = self.scan_job
+        search = self.search_window
+        if job['thread'].is_alive():
+            if search:
+                search['status'].config(text=f"Scanning {os.path.basename(job['folder']) or job['folder']}: "
+                                             f"{job['done']} of {job['total']} changed file(s)")
+            self.root.after(SCAN_POLL_MS, self.poll_scan)
+            return
+        
+        self.scan_job = None
+        if search:
+            search['scan_button'].config(state='normal')
+        if job['error'] is not None:
+            if search:
+                search['status'].config(text="Scan failed")
+            messagebox.showerror("Error", f"Scan failed:\n{job['error']}")
+            return
+        indexed, removed, errors = job['result']
+        if search:
+            self.run_search()
+            search['status'].config(text=f"Scan done: {indexed} indexed, {removed} removed, {len(errors)} failed")
+        if errors:
+            self.show_load_errors(errors)
+
+    
+    def toggle_watch(self):
+        """Start or stop adding runs as they are finished in a folder"""
+        if self.ingester:
+            self.ingester.stop(timeout=1.0)
+            self.ingester = None
+            self.watch_button.config(text="Watch Folder", bg='steelblue')
+            return
+        
+        start_dir = DEFAULT_DIR if os.path.exists(DEFAULT_DIR) else os.path.expanduser("~")
+        folder = filedialog.askdirectory(initialdir=start_dir, title="Select Folder to Watch")
+        if not folder:
+            return
+        try:
+            self.ingester = RunIngester(folder, cache=self.cache, index_path=INDEX_PATH)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not watch {folder}:\n{e}")
+            return
+        self.ingester.start()
+        self.watch_button.config(text="Stop Watching", bg='red')
+        self.root.after(WATCH_POLL_MS, self.poll_watch, self.ingester)
+    
+    def poll_watch(self, ingester):
+        """Add runs the watcher has finished parsing since the last check"""
+        if ingester is not self.ingester:
+            # Watching stopped (or restarted on another folder)
+            return
+        
+        added = False
+        errors = []
+        for file_path, run_path, error in ingester.completed():
+            filename = os.path.basename(file_path)
+            if error is not None:
+                errors.append(f"{filename}: {error}")
+                continue
+            if filename in self.loaded_files:
+                continue
+            try:
+                self.parse_run_file(run_path, filename)
+                added = True
+            except Exception as e:
+                errors.append(f"{filename}: {e}")
+        
+        if added:
+            self.update_plot()
+            self.update_info_display()
+            if self.search_window is not None:
+                self.run_search()
+        if errors:
+            self.show_load_errors(errors)
+        self.root.after(WATCH_POLL_MS, self.poll_watch, ingester)
+
 
 # Create and run the application
 if __name__ == "__main__":
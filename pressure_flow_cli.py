@@ -0,0 +1,195 @@
+# Headless Pressure Flow Test runner
+# Runs the same flow and decay sequence as Pressure_Flow_v2.py, configured
+# from the part number's recipe in Test.ini (recipes.py) plus command-line
+# options, so runs can be scripted from a line controller or started over
+# SSH. Never imports tkinter or matplotlib.
+#
+#   python pressure_flow_cli.py --part 12345 [--port COM23] [--output DIR]
+#                               [--ini Test.ini] [--set KEY=VALUE ...] [--samples]
+#
+# Progress and results are JSON lines on stdout, one object per line:
+#   {"event": "start", "part_number": ..., "profile": ..., "port": ..., "file": ..., "timestamp": ...}
+#   {"event": "phase", "phase": ..., "time": ...}
+#   {"event": "sample", "phase": ..., "elapsed": ..., "pressure_a": ..., ...}   (--samples)
+#   {"event": "result", "status": "done" | "stopped" | "error", "file": ..., "summary": {...}, "settings": {...}}
+#
+# Exit codes: 0 run complete, 1 test or save error, 2 bad arguments or
+# Test.ini, 3 serial port could not be opened, 130 stopped (Ctrl+C)
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import serial
+
+import ini_config
+from alicat import AlicatLink
+from alicat_bus import SerialTransport
+from acquisition import AcquisitionWorker, TEST_PARAMETERS
+from batch import finalize_run
+from recipes import DEFAULT_PROFILE, RecipeStore, build_recipe
+from run_metrics import RunMetrics
+from run_recorder import RunRecorder, journal_contents
+from stations import Station, parse_stations
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_PORT = 3
+EXIT_STOPPED = 130
+
+# How often the worker's samples and events are collected (seconds)
+DRAIN_INTERVAL = 0.05
+
+
+def emit(event, **fields):
+    """Write one JSON line to stdout"""
+    print(json.dumps({"event": event, **fields}, default=str), flush=True)
+
+
+def summarize(recorded):
+    """Flow means and decay pressures of the recorded samples"""
+    flow = [sample for sample in recorded if sample.phase == "Flow Test"]
+    decay = [sample for sample in recorded if sample.phase == "Pressure Decay"]
+    summary = {"flow_samples": len(flow), "decay_samples": len(decay)}
+    if flow:
+        summary["flow_a_mean"] = round(statistics.fmean(s.data_a['mass_flow'] for s in flow), 4)
+        summary["flow_b_mean"] = round(statistics.fmean(s.data_b['mass_flow'] for s in flow), 4)
+    if decay:
+        summary["decay_start_pressure"] = round(decay[0].data_a['pressure'], 3)
+        summary["decay_end_pressure"] = round(decay[-1].data_a['pressure'], 3)
+        summary["decay_time"] = round(decay[-1].elapsed, 2)
+        summary["pressure_drop"] = round(decay[0].data_a['pressure'] - decay[-1].data_a['pressure'], 3)
+    return summary
+
+
+def load_recipe(args):
+    """The part's recipe from Test.ini (if present) with --set overrides; raises ValueError on a bad value"""
+    ini_path = args.ini or ini_config.INI_FILE
+    if os.path.exists(ini_path):
+        store = RecipeStore(ini_path)
+        if store.error:
+            raise ValueError(store.error)
+        recipe = store.recipe_for(args.part)
+    elif args.ini:
+        raise ValueError(f"{args.ini} not found")
+    else:
+        print(f"{ini_path} not found, using default values", file=sys.stderr)
+        recipe = build_recipe(DEFAULT_PROFILE, (), dict(ini_config.DEFAULTS))
+    if not args.set:
+        return recipe
+    config = dict(recipe.config)
+    for setting in args.set:
+        key, separator, value = setting.partition('=')
+        if not separator or not ini_config.apply_setting(config, key.strip().upper(), value):
+            raise ValueError(f"Unknown setting: {setting}")
+    return build_recipe(recipe.name, recipe.patterns, config)
+
+
+def run_test(station, recipe, part_number, output_dir, samples=False):
+    """Run one test on an open station; returns the exit code"""
+    config = recipe.config
+    os.makedirs(output_dir, exist_ok=True)
+    station.excel_path, timestamp = station.output_path(output_dir, part_number)
+    station.recipe = recipe
+    station.recorder = RunRecorder(station.excel_path, binary=config['write_binary'])
+    profile = recipe.name if recipe.name != DEFAULT_PROFILE else None
+    for name, value in ini_config.run_settings(config, part_number, timestamp, profile=profile):
+        station.recorder.add_setting(name, value)
+    emit("start", part_number=part_number, profile=recipe.name, port=station.port, file=station.excel_path,
+         timestamp=timestamp)
+
+    station.metrics = RunMetrics()
+    params = {name: config[name] for name in TEST_PARAMETERS}
+    transport = SerialTransport(AlicatLink(station.ser, config['transaction_timeout'], config['fast_poll']))
+    station.worker = AcquisitionWorker(transport, params, station.recorder, station.samples,
+                                       station.events, station.metrics, commands=recipe.commands)
+    station.worker.start()
+    started = time.monotonic()
+
+    kind = value = None
+    while kind is None:
+        try:
+            time.sleep(DRAIN_INTERVAL)
+            for sample in station.samples.drain():
+                if not sample.record:
+                    continue
+                station.recorded.append(sample)
+                if samples:
+                    emit("sample", phase=sample.phase, elapsed=round(sample.elapsed, 3),
+                         pressure_a=sample.data_a['pressure'], flow_a=sample.data_a['mass_flow'],
+                         pressure_b=sample.data_b['pressure'] if sample.data_b else None,
+                         flow_b=sample.data_b['mass_flow'] if sample.data_b else None)
+            while not station.events.empty():
+                event, event_value = station.events.get_nowait()
+                if event == 'phase':
+                    emit("phase", phase=event_value, time=round(time.monotonic() - started, 2))
+                elif event != 'remaining':
+                    kind, value = event, event_value
+        except KeyboardInterrupt:
+            # The worker closes the valves at the next sample and reports 'stopped'
+            station.worker.stop()
+    station.worker.join()
+    station.worker = None
+
+    # Settings the worker added during the run (stabilize times, decay fit),
+    # read before finishing removes the journal
+    settings = {name: setting for name, setting in journal_contents(station.recorder.journal_path)[0]}
+    settings.update(station.metrics.settings_rows())
+    result = {"status": {'done': "done", 'stopped': "stopped"}.get(kind, "error"),
+              "part_number": part_number, "file": station.excel_path,
+              "duration": round(time.monotonic() - started, 2)}
+    if kind == 'error':
+        result["error"] = value
+    try:
+        finalize_run(station.recorder, station.metrics)
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"save failed: {e}; samples are kept in the .journal file next to it"
+    result["summary"] = summarize(station.recorded)
+    result["settings"] = settings
+    emit("result", **result)
+
+    if result["status"] == "done":
+        return EXIT_OK
+    return EXIT_STOPPED if result["status"] == "stopped" else EXIT_FAILED
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Run a Pressure Flow Test without the GUI")
+    parser.add_argument("--part", required=True, help="part number")
+    parser.add_argument("--port", help="serial port (default: first STATIONS entry in Test.ini, else COM23)")
+    parser.add_argument("--output", default=ini_config.OUTPUT_PATH, help="output folder (default: %(default)s)")
+    parser.add_argument("--ini", help="configuration file (default: Test.ini)")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a Test.ini setting, e.g. --set PRESSURE_SAMPLE_TIME=10")
+    parser.add_argument("--samples", action="store_true", help="also emit every recorded sample")
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return EXIT_OK if e.code == 0 else EXIT_USAGE
+
+    try:
+        recipe = load_recipe(args)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return EXIT_USAGE
+
+    name, port = (parse_stations(args.port or recipe.config['stations_config']) or [("Station 1", ini_config.SERIAL_PORT)])[0]
+    station = Station(name, port)
+    try:
+        station.ser = serial.Serial(port, 38400, timeout=1)  # Connect through BB9
+    except serial.SerialException as e:
+        emit("result", status="error", part_number=args.part, error=f"Could not open serial port {port}: {e}")
+        return EXIT_PORT
+    try:
+        return run_test(station, recipe, args.part, args.output, args.samples)
+    finally:
+        station.ser.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,159 @@
+# Test recipes: per part number profiles from Test.ini
+# Test.ini's top-level keys are the default recipe. A [PROFILE name] section
+# overrides them for the part numbers in its PART_NUMBERS list (comma
+# separated, * and ? wildcards, case-insensitive; the first matching profile
+# wins):
+#   [PROFILE 5 Fr]
+#   PART_NUMBERS=CTH-05*, 1205?
+#   A_FLOW_TEST_PRESSURE=18
+# - Every profile is validated once, when Test.ini is read, into an immutable
+#   Recipe whose Alicat commands are already encoded
+# - RecipeStore checks Test.ini's size and mtime (one stat) before handing out
+#   a recipe and rereads it when either changed, so edits apply from the next
+#   run without a restart. A running test keeps the recipe it started with.
+# - A Test.ini with errors is reported (RecipeStore.error) and the last good
+#   recipes stay in use
+# - Part number -> recipe lookups are cached until the next reload
+
+import collections
+import fnmatch
+import os
+import types
+
+import ini_config
+from alicat_bus import hold_valve_command, poll_command, release_valve_command, setpoint_command
+from decay_fit import FIT_MODELS
+
+DEFAULT_PROFILE = "Default"
+
+# Part numbers whose recipe is remembered between reloads
+MATCH_CACHE_SIZE = 1024
+
+# Profile key listing the part numbers a profile applies to
+PART_NUMBERS_KEY = "PART_NUMBERS"
+
+# Keys that apply to the whole program, not to one part number
+GLOBAL_KEYS = ("STATIONS",)
+
+# Parameters that must not be negative
+NON_NEGATIVE = (
+    'flow_sample_time', 'pressure_sample_time', 'read_rate', 'pressure_read_rate',
+    'pressurize_time', 'stability_window', 'stability_tolerance', 'stability_slope',
+    'stability_std', 'decay_fit_tolerance', 'decay_min_time',
+)
+
+# name: profile name; patterns: upper-case part number patterns;
+# config: read-only parameters; commands: read-only command text -> bytes
+Recipe = collections.namedtuple('Recipe', ['name', 'patterns', 'config', 'commands'])
+
+
+def recipe_commands(config):
+    """Every Alicat command a run with these parameters sends, encoded"""
+    commands = [poll_command('A'), poll_command('B'), hold_valve_command('A'), release_valve_command('A'),
+                setpoint_command('A', config['a_flow_test_pressure']),
+                setpoint_command('B', config['b_flow_test_pressure']),
+                setpoint_command('A', config['a_decay_test_pressure']),
+                setpoint_command('B', config['b_decay_test_pressure'])]
+    return {command: command.encode() for command in commands}
+
+
+def validate(name, config):
+    """Raise ValueError if a recipe's parameters cannot make a run"""
+    if config['decay_fit'] not in FIT_MODELS:
+        raise ValueError(f"{name}: DECAY_FIT must be one of {', '.join(FIT_MODELS)}")
+    for parameter in NON_NEGATIVE:
+        if config[parameter] < 0:
+            raise ValueError(f"{name}: {parameter.upper()} must not be negative")
+    if config['transaction_timeout'] is not None and config['transaction_timeout'] <= 0:
+        raise ValueError(f"{name}: TRANSACTION_TIMEOUT must be positive")
+
+
+def build_recipe(name, patterns, config):
+    validate(name, config)
+    return Recipe(name, tuple(patterns), types.MappingProxyType(config),
+                  types.MappingProxyType(recipe_commands(config)))
+
+
+def apply_pairs(name, config, pairs, profile):
+    """Apply KEY=value pairs to config; returns the PART_NUMBERS patterns"""
+    patterns = []
+    for key, value in pairs:
+        key = key.upper()
+        if profile and key == PART_NUMBERS_KEY:
+            patterns += [pattern.strip().upper() for pattern in value.split(',') if pattern.strip()]
+            continue
+        if profile and key in GLOBAL_KEYS:
+            raise ValueError(f"{name}: {key} applies to all parts and cannot be set in a profile")
+        try:
+            known = ini_config.apply_setting(config, key, value)
+        except ValueError as e:
+            raise ValueError(f"{name}: {key}: {e}") from None
+        if profile and not known:
+            raise ValueError(f"{name}: unknown setting {key}")
+    return patterns
+
+
+def load_recipes(file_path=ini_config.INI_FILE):
+    """(default Recipe, [profile Recipes]) from Test.ini; raises ValueError on a bad value"""
+    defaults, profiles = ini_config.read_sections(file_path)
+    base = dict(ini_config.DEFAULTS)
+    apply_pairs(DEFAULT_PROFILE, base, defaults, profile=False)
+    default = build_recipe(DEFAULT_PROFILE, (), base)
+
+    recipes = []
+    for name, pairs in profiles:
+        config = dict(base)
+        patterns = apply_pairs(name, config, pairs, profile=True)
+        if not patterns:
+            raise ValueError(f"{name}: no {PART_NUMBERS_KEY}")
+        recipes.append(build_recipe(name, patterns, config))
+    return default, recipes
+
+
+class RecipeStore:
+    """Test.ini recipes, reread whenever the file changes"""
+
+    def __init__(self, file_path=ini_config.INI_FILE):
+        self.file_path = file_path
+        self.signature = ()  # (size, mtime_ns) of the Test.ini read, None while it is missing
+        self.default = build_recipe(DEFAULT_PROFILE, (), dict(ini_config.DEFAULTS))
+        self.profiles = []
+        self.matches = {}
+        self.error = None
+        self.refresh()
+
+    def refresh(self):
+        """Reread Test.ini if it changed; returns True when the recipes were reloaded"""
+        try:
+            stat = os.stat(self.file_path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            signature = None
+        if signature == self.signature:
+            return False
+        self.signature = signature
+        if signature is None:
+            self.error = f"{self.file_path} not found"
+            return False
+        try:
+            default, profiles = load_recipes(self.file_path)
+        except (OSError, ValueError) as e:
+            self.error = f"{os.path.basename(self.file_path)}: {e}"
+            return False
+        self.default, self.profiles, self.error = default, profiles, None
+        self.matches = {}
+        return True
+
+    def recipe_for(self, part_number):
+        """The Recipe for a part number, from the current Test.ini"""
+        self.refresh()
+        recipe = self.matches.get(part_number)
+        if recipe is None:
+            key = part_number.strip().upper()
+            recipe = next((profile for profile in self.profiles
+                           if any(fnmatch.fnmatchcase(key, pattern) for pattern in profile.patterns)),
+                          self.default)
+            if len(self.matches) >= MATCH_CACHE_SIZE:
+                self.matches.clear()
+            self.matches[part_number] = recipe
+        return recipe
@@ -0,0 +1,235 @@
+# Run analytics for the data plotter
+# Per-run statistics computed in bulk with NumPy: all runs' samples are
+# concatenated once and every statistic is a handful of vectorized segment
+# reductions, so hundreds of runs are summarised in milliseconds.
+# - Flow mean/std of Alicat A and B per phase (Flow Test, Pressure Decay)
+# - Decay slope (least squares, PSI/s) and exponential time constant
+#   (fit of ln(P - ambient), seconds)
+# - Total pressure drop over the decay
+# - Decay pressure at fixed time marks (linear interpolation)
+# - Ensemble of many decays: every run resampled onto one time grid by the
+#   same interpolation, reduced to mean, standard deviation and min/max per
+#   grid time, with outlier runs flagged
+
+import warnings
+
+import numpy as np
+
+AMBIENT_PRESSURE = 14.7  # PSIA
+
+# Seconds into the decay at which the pressure is reported. All inside the
+# default 20 s decay, whose last sample is just before PRESSURE_SAMPLE_TIME.
+PRESSURE_MARKS = (5.0, 10.0, 15.0)
+
+# Ensemble: grid points across all runs' decays, width of the band around the
+# mean (standard deviations), and the RMS robust z-score above which a run is
+# an outlier (medians of fewer than OUTLIER_MIN_RUNS runs are too noisy)
+ENSEMBLE_POINTS = 400
+ENSEMBLE_SIGMA = 2.0
+OUTLIER_SCORE = 3.5
+OUTLIER_MIN_RUNS = 10
+
+
+def _segments(arrays):
+    """Concatenate arrays; returns (values, starts, stops, segment id of each value)"""
+    lengths = np.array([len(a) for a in arrays], dtype=np.int64)
+    stops = np.cumsum(lengths)
+    starts = stops - lengths
+    values = np.concatenate([np.asarray(a, dtype=np.float64) for a in arrays]) if arrays else np.empty(0)
+    ids = np.repeat(np.arange(len(arrays)), lengths)
+    return values, starts, stops, ids
+
+
+def _sums(values, starts, stops):
+    """Per-segment sums via one cumulative sum"""
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    return cumulative[stops] - cumulative[starts]
+
+
+def segment_mean_std(arrays):
+    """(mean, sample std) of each array, NaN entries ignored; NaN for empty arrays"""
+    values, starts, stops, _ = _segments(arrays)
+    valid = np.isfinite(values)
+    clean = np.where(valid, values, 0.0)
+    n = _sums(valid.astype(np.float64), starts, stops)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = _sums(clean, starts, stops) / n
+        centered = np.where(valid, values - np.repeat(mean, stops - starts), 0.0)
+        std = np.sqrt(_sums(centered * centered, starts, stops) / (n - 1))
+    std[n < 2] = np.nan
+    return mean, std
+
+
+def segment_slopes(times, values, weights=None):
+    """Least-squares slope of values against times for each pair of arrays"""
+    t, starts, stops, ids = _segments(times)
+    y = _segments(values)[0]
+    w = np.ones_like(t) if weights is None else _segments(weights)[0]
+    # Shift each run to start at 0 to keep the sums well conditioned
+    first = t[np.minimum(starts, max(len(t) - 1, 0))] if len(t) else np.empty(0)
+    t = t - first[ids]
+    n = _sums(w, starts, stops)
+    st = _sums(w * t, starts, stops)
+    sy = _sums(w * y, starts, stops)
+    stt = _sums(w * t * t, starts, stops)
+    sty = _sums(w * t * y, starts, stops)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (n * sty - st * sy) / (n * stt - st * st)
+    slope[n < 2] = np.nan
+    return slope
+
+
+def pressure_at(times, pressures, marks):
+    """Pressure of each run at each mark (runs x marks); NaN outside a run's time range"""
+    result = np.full((len(times), len(marks)), np.nan)
+    t, starts, stops, ids = _segments(times)
+    p = _segments(pressures)[0]
+    if not len(t):
+        return result
+    marks = np.asarray(marks, dtype=np.float64)
+    # One sorted key array: run i's samples at i * span + (t - origin)
+    origin = min(float(t.min()), float(marks.min()))
+    span = float(max(t.max(), marks.max()) - origin) + 2.0
+    keys = ids * span + (t - origin)
+    queries = (np.arange(len(times))[:, None] * span + (marks[None, :] - origin)).ravel()
+    position = np.searchsorted(keys, queries, side='right')
+
+    # Samples either side of each mark, kept inside the mark's run
+    first = np.repeat(starts, len(marks))
+    last = np.maximum(np.repeat(stops, len(marks)) - 1, first)
+    top = len(t) - 1
+    left = np.minimum(np.clip(position - 1, first, last), top)
+    right = np.minimum(np.clip(position, first, last), top)
+    query = np.tile(marks, len(times))
+    t0, t1 = t[left], t[right]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fraction = np.where(t1 > t0, (query - t0) / (t1 - t0), 0.0)
+    values = p[left] + fraction * (p[right] - p[left])
+    empty = np.repeat(stops - starts == 0, len(marks))
+    values[empty | (query < t0) | (query > t1)] = np.nan
+    return values.reshape(len(times), len(marks))
+
+
+def ensemble(times, pressures, points=ENSEMBLE_POINTS, sigma=ENSEMBLE_SIGMA, outlier_score=OUTLIER_SCORE):
+    """Statistics of many decay traces on a common time grid, or None without samples.
+
+    Each run is resampled at `points` times spanning every run (pressure_at,
+    NaN outside the run's own time range). Returns a dict of grid arrays
+    'time', 'mean', 'lower'/'upper' (mean -/+ sigma standard deviations),
+    'min', 'max' and 'count', plus 'resampled' (runs x points) and
+    'outliers' (bool per run). A run is an outlier when its RMS robust
+    z-score (distance from the median trace in MAD standard deviations, per
+    grid time) exceeds `outlier_score`; none are flagged below
+    OUTLIER_MIN_RUNS runs.
+    """
+    lengths = [len(t) for t in times]
+    if not any(lengths):
+        return None
+    start = min(float(np.min(t)) for t, n in zip(times, lengths) if n)
+    stop = max(float(np.max(t)) for t, n in zip(times, lengths) if n)
+    grid = np.linspace(start, stop, points if stop > start else 1)
+    resampled = pressure_at(times, pressures, grid)
+
+    valid = np.isfinite(resampled)
+    count = valid.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(valid, resampled, 0.0).sum(axis=0) / count
+        deviation = np.where(valid, resampled - mean, 0.0)
+        std = np.sqrt((deviation * deviation).sum(axis=0) / (count - 1))
+    std[count < 2] = np.nan
+    low = np.min(np.where(valid, resampled, np.inf), axis=0)
+    high = np.max(np.where(valid, resampled, -np.inf), axis=0)
+    low[count == 0] = np.nan
+    high[count == 0] = np.nan
+
+    outliers = np.zeros(len(times), dtype=bool)
+    scored = valid.any(axis=1)
+    if scored.sum() >= OUTLIER_MIN_RUNS:
+        with warnings.catch_warnings():
+            # Grid times covered by no run (or one) give NaN medians
+            warnings.simplefilter('ignore', RuntimeWarning)
+            runs = resampled[scored]
+            median = np.nanmedian(runs, axis=0)
+            spread = 1.4826 * np.nanmedian(np.abs(runs - median), axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                z = np.where(spread > 0, (runs - median) / spread, np.nan)
+            score = np.sqrt(np.nanmean(z * z, axis=1))
+        outliers[np.flatnonzero(scored)] = score > outlier_score
+
+    return {
+        'time': grid,
+        'mean': mean,
+        'lower': mean - sigma * std,
+        'upper': mean + sigma * std,
+        'min': low,
+        'max': high,
+        'count': count,
+        'resampled': resampled,
+        'outliers': outliers,
+    }
+
+
+def analyze_runs(runs, marks=PRESSURE_MARKS, ambient=AMBIENT_PRESSURE):
+    """Statistics for every run at once.
+
+    `runs` is a list of dicts with 'time'/'pressure' (decay, sorted by time)
+    and 'flow_test_a'/'flow_test_b'/'decay_flow_a'/'decay_flow_b' arrays.
+    Returns one dict of statistics per run, NaN where a value is undefined.
+    """
+    if not runs:
+        return []
+    times = [run['time'] for run in runs]
+    pressures = [run['pressure'] for run in runs]
+
+    columns = {}
+    for key, name in (('flow_test_a', 'flow_a'), ('flow_test_b', 'flow_b'),
+                      ('decay_flow_a', 'decay_flow_a'), ('decay_flow_b', 'decay_flow_b')):
+        columns[f'{name}_mean'], columns[f'{name}_std'] = segment_mean_std([run[key] for run in runs])
+
+    columns['decay_slope'] = segment_slopes(times, pressures)
+
+    # Exponential decay toward ambient: ln(P - ambient) is a line of slope -1/tau
+    excess = [np.asarray(p, dtype=np.float64) - ambient for p in pressures]
+    valid = [e > 0 for e in excess]
+    logs = [np.log(np.where(v, e, 1.0)) for e, v in zip(excess, valid)]
+    log_slope = segment_slopes(times, logs, [v.astype(np.float64) for v in valid])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        columns['time_constant'] = np.where(log_slope < 0, -1.0 / log_slope, np.nan)
+
+    lengths = np.array([len(p) for p in pressures])
+    stops = np.cumsum(lengths)
+    flat = _segments(pressures)[0]
+    has_data = lengths > 0
+    drop = np.full(len(runs), np.nan)
+    drop[has_data] = flat[(stops - lengths)[has_data]] - flat[stops[has_data] - 1]
+    columns['pressure_drop'] = drop
+
+    at_marks = pressure_at(times, pressures, marks)
+
+    results = []
+    for i in range(len(runs)):
+        stats = {name: float(values[i]) for name, values in columns.items()}
+        stats['pressure_at'] = {mark: float(at_marks[i, j]) for j, mark in enumerate(marks)}
+        results.append(stats)
+    return results
+
+
+def run_series(run):
+    """Decay trace and per-phase flows of a RunData (run_format.py), as analyze_runs expects.
+
+    Decay rows with a missing value are skipped, as the xlsx reader always did.
+    """
+    decay = run.phase_slice("Pressure Decay")
+    flow = run.phase_slice("Flow Test")
+    columns = [run[name][decay] for name in ('time', 'pressure_a', 'flow_a', 'flow_b')]
+    valid = np.isfinite(columns[0]) & np.isfinite(columns[1]) & np.isfinite(columns[2]) & np.isfinite(columns[3])
+    if not valid.all():
+        columns = [column[valid] for column in columns]
+    return {
+        'time': columns[0],
+        'pressure': columns[1],
+        'flow_test_a': run['flow_a'][flow],
+        'flow_test_b': run['flow_b'][flow],
+        'decay_flow_a': columns[2],
+        'decay_flow_b': columns[3],
+    }
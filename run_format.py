@@ -0,0 +1,204 @@
+# Pressure Flow Run Format (.pfr)
+# Compact columnar binary copy of a test run, readable without unzipping or
+# parsing XML. Columns are stored contiguously so readers can memory-map them.
+#
+# Layout (little-endian):
+#   8 bytes   magic b"PFRUN\x00\x00\x01"
+#   4 bytes   uint32 length of the JSON header
+#   n bytes   JSON header: rows, phases, settings, column names/dtypes/offsets
+#   columns   each starting on a 64-byte boundary
+#
+# Columns: phase (uint8 index into header "phases"), time, pressure_a,
+# pressure_b, flow_a, flow_b (float32; "N/A" cells are stored as NaN)
+#
+# Convert existing xlsx archives:
+#   python run_format.py convert <file.xlsx | directory> [...]
+
+import array
+import json
+import math
+import os
+import struct
+import sys
+
+MAGIC = b"PFRUN\x00\x00\x01"
+RUN_SUFFIX = ".pfr"
+ALIGNMENT = 64
+
+PHASES = ["Flow Test", "Pressure Decay"]
+
+# (name, array typecode, numpy dtype)
+COLUMNS = [
+    ('phase', 'B', '|u1'),
+    ('time', 'f', '<f4'),
+    ('pressure_a', 'f', '<f4'),
+    ('pressure_b', 'f', '<f4'),
+    ('flow_a', 'f', '<f4'),
+    ('flow_b', 'f', '<f4'),
+]
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _padding(offset):
+    return -offset % ALIGNMENT
+
+
+def write_run(run_path, settings, rows):
+    """Write a .pfr file from Settings (name, value) pairs and Data rows.
+
+    `rows` are Data sheet rows without the header:
+    [phase, time, A pressure, B pressure, A flow, B flow]
+    """
+    phases = list(PHASES)
+    columns = [array.array(code) for _, code, _ in COLUMNS]
+    for row in rows:
+        if not row or row[0] is None:
+            continue
+        if row[0] not in phases:
+            phases.append(row[0])
+        columns[0].append(phases.index(row[0]))
+        for column, value in zip(columns[1:], row[1:6]):
+            column.append(_number(value))
+    if sys.byteorder != 'little':
+        for column in columns:
+            column.byteswap()
+
+    rows_written = len(columns[0])
+    header = {
+        'rows': rows_written,
+        'phases': phases,
+        'settings': [[name, value] for name, value in settings],
+        'columns': [],
+    }
+    # Offsets depend on the header length, so size the header with placeholders first
+    for (name, _, dtype), column in zip(COLUMNS, columns):
+        header['columns'].append({'name': name, 'dtype': dtype, 'offset': 0})
+    while True:
+        encoded = json.dumps(header, default=str).encode('utf-8')
+        offset = len(MAGIC) + 4 + len(encoded)
+        offsets = []
+        for column in columns:
+            offset += _padding(offset)
+            offsets.append(offset)
+            offset += column.itemsize * len(column)
+        if [c['offset'] for c in header['columns']] == offsets:
+            break
+        for entry, column_offset in zip(header['columns'], offsets):
+            entry['offset'] = column_offset
+
+    temp_path = run_path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(MAGIC)
+        file.write(struct.pack('<I', len(encoded)))
+        file.write(encoded)
+        for column, column_offset in zip(columns, offsets):
+            file.write(b"\x00" * (column_offset - file.tell()))
+            column.tofile(file)
+    os.replace(temp_path, run_path)
+    return run_path
+
+
+class RunData:
+    """Memory-mapped view of a .pfr file"""
+
+    def __init__(self, run_path):
+        # Only readers need NumPy; the recorder writes .pfr files without it
+        import numpy as np
+
+        self.path = run_path
+        self.buffer = np.memmap(run_path, dtype=np.uint8, mode='r')
+        if bytes(self.buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{os.path.basename(run_path)} is not a pressure flow run file")
+        (header_len,) = struct.unpack('<I', bytes(self.buffer[8:12]))
+        header = json.loads(bytes(self.buffer[12:12 + header_len]).decode('utf-8'))
+        self.rows = header['rows']
+        self.phases = header['phases']
+        self.settings = [tuple(pair) for pair in header['settings']]
+        self.columns = {}
+        for column in header['columns']:
+            dtype = np.dtype(column['dtype'])
+            start = column['offset']
+            # Slicing the memmap and viewing it does not copy any data
+            self.columns[column['name']] = self.buffer[start:start + dtype.itemsize * self.rows].view(dtype)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def phase_slice(self, phase):
+        """Rows of one phase: a slice when they are contiguous, else a boolean mask"""
+        import numpy as np
+
+        if phase not in self.phases:
+            return slice(0, 0)
+        mask = self.columns['phase'] == self.phases.index(phase)
+        index = np.flatnonzero(mask)
+        if len(index) == 0:
+            return slice(0, 0)
+        if index[-1] - index[0] + 1 == len(index):
+            return slice(int(index[0]), int(index[-1]) + 1)
+        return mask
+
+
+def load_run(run_path):
+    """Open a .pfr file without copying its columns"""
+    return RunData(run_path)
+
+
+def read_xlsx(excel_path):
+    """Read (settings, rows) from a Settings/Data test workbook"""
+    # openpyxl takes longer to import than everything else here; only pay for it when reading xlsx
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        if "Data" not in workbook.sheetnames:
+            raise ValueError("Excel file must contain a 'Data' sheet")
+        settings = []
+        if "Settings" in workbook.sheetnames:
+            for row in workbook["Settings"].iter_rows(min_row=2, values_only=True):
+                if row and row[0] is not None:
+                    settings.append((row[0], row[1] if len(row) > 1 else None))
+        rows = [row for row in workbook["Data"].iter_rows(min_row=2, values_only=True)]
+    finally:
+        workbook.close()
+    return settings, rows
+
+
+def convert_xlsx(excel_path, run_path=None):
+    """Write a .pfr copy of an xlsx run; returns the .pfr path"""
+    if run_path is None:
+        run_path = os.path.splitext(excel_path)[0] + RUN_SUFFIX
+    settings, rows = read_xlsx(excel_path)
+    return write_run(run_path, settings, rows)
+
+
+def convert_archive(paths):
+    """Convert xlsx files and directories of them, skipping up-to-date copies"""
+    for target in paths:
+        if os.path.isdir(target):
+            excel_paths = [os.path.join(target, name) for name in sorted(os.listdir(target))
+                           if name.lower().endswith(".xlsx") and not name.startswith("~$")]
+        else:
+            excel_paths = [target]
+        for excel_path in excel_paths:
+            run_path = os.path.splitext(excel_path)[0] + RUN_SUFFIX
+            if os.path.exists(run_path) and os.path.getmtime(run_path) >= os.path.getmtime(excel_path):
+                continue
+            try:
+                convert_xlsx(excel_path, run_path)
+                print(run_path)
+            except Exception as e:
+                print(f"{excel_path}: {e}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "convert":
+        print("usage: python run_format.py convert <file.xlsx | directory> [...]")
+        sys.exit(2)
+    convert_archive(sys.argv[2:])
@@ -0,0 +1,337 @@
+# Run Index
+# SQLite index of every test run under the test-data folders, so runs can be
+# found by part number, date or station without opening each workbook.
+# - One row per run file: fingerprint (size, mtime_ns), part number,
+#   timestamp, station, the whole Settings sheet as JSON and summary
+#   statistics (run_analytics.py) plus the leak rate recorded by the decay fit
+# - scan() is incremental: only new or changed files are parsed, rows of
+#   deleted files are dropped. Parsing goes through the plotter's ParseCache,
+#   so indexed files also open instantly in the plotter afterwards
+# - add_files() indexes given files only (the folder watcher, run_watcher.py)
+# - A .pfr copy next to an xlsx holds the same run; only the .pfr is indexed
+# - The index lives in the parse cache folder (INDEX_PATH), per machine
+#
+# Command line:
+#   python run_index.py scan <folder> [...]
+#   python run_index.py search [--part PATTERN] [--since DATE] [--until DATE] [--station NAME]
+
+import argparse
+import datetime
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from run_format import RUN_SUFFIX, convert_xlsx, load_run, read_xlsx
+from parse_cache import CACHE_DIR, ParseCache
+from run_analytics import analyze_runs, run_series
+
+INDEX_PATH = os.path.join(CACHE_DIR, "run_index.sqlite")
+
+# Runs summarised per analyze_runs() call while scanning
+SCAN_CHUNK = 200
+
+# Summary columns filled from analyze_runs()
+STAT_COLUMNS = ["flow_a_mean", "flow_b_mean", "decay_flow_a_mean", "decay_flow_b_mean",
+                "decay_slope", "time_constant", "pressure_drop"]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    part_number TEXT,
+    timestamp TEXT,
+    station TEXT,
+    settings TEXT,
+    rows INTEGER,
+    {", ".join(f"{name} REAL" for name in STAT_COLUMNS)},
+    leak_rate REAL,
+    indexed_at REAL
+);
+CREATE INDEX IF NOT EXISTS runs_part ON runs (part_number);
+CREATE INDEX IF NOT EXISTS runs_timestamp ON runs (timestamp);
+CREATE INDEX IF NOT EXISTS runs_folder ON runs (folder);
+"""
+
+# {part}_{YYYYMMDD_HHMMSS}[_{station}] as written by the recorder
+FILE_TIMESTAMP = re.compile(r"_(\d{8}_\d{6})(?:_|$)")
+
+
+def run_files(folder):
+    """Test data files under `folder`, preferring a .pfr copy over its xlsx"""
+    paths = []
+    for directory, _, names in os.walk(folder):
+        names = [name for name in names if not name.startswith("~$")]
+        run_stems = {os.path.splitext(name)[0] for name in names if name.lower().endswith(RUN_SUFFIX)}
+        for name in sorted(names):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() == RUN_SUFFIX or (ext.lower() == ".xlsx" and stem not in run_stems):
+                paths.append(os.path.abspath(os.path.join(directory, name)))
+    return paths
+
+
+def _timestamp(settings, file_path):
+    """Run time as 'YYYY-MM-DD HH:MM:SS': Settings, then the file name, then the file's mtime"""
+    for value in (settings.get("Timestamp"), FILE_TIMESTAMP.search(os.path.basename(file_path))):
+        if hasattr(value, 'group'):
+            value = value.group(1)
+        try:
+            return datetime.datetime.strptime(str(value), "%Y%m%d_%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+    return datetime.datetime.fromtimestamp(os.path.getmtime(file_path)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def _date_bound(text, end=False):
+    """'YYYY-MM-DD[ HH:MM[:SS]]' -> comparable timestamp text; a bare date covers the whole day"""
+    text = text.strip()
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            value = datetime.datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if fmt == "%Y-%m-%d" and end:
+            value = value.replace(hour=23, minute=59, second=59)
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    raise ValueError(f"Invalid date: {text} (expected YYYY-MM-DD or YYYY-MM-DD HH:MM)")
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _like_pattern(pattern):
+    """Part number pattern -> SQL LIKE: * and ? are wildcards, otherwise a substring match"""
+    escaped = _escape_like(pattern)
+    if "*" not in pattern and "?" not in pattern:
+        return f"%{escaped}%"
+    return escaped.replace("*", "%").replace("?", "_")
+
+
+class RunIndex:
+    """SQLite index of run files; one instance per thread"""
+
+    def __init__(self, index_path=INDEX_PATH):
+        self.index_path = index_path
+        os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+        self.db = sqlite3.connect(index_path, timeout=10)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def scan(self, folder, cache=None, jobs=None, progress=None):
+        """Bring the index up to date with `folder` (recursively).
+
+        Returns (added or updated, removed, errors). `progress(done, total)`
+        is called as changed files are parsed.
+        """
+        folder = os.path.abspath(folder)
+        known = {row['path']: (row['size'], row['mtime_ns']) for row in self.db.execute(
+            "SELECT path, size, mtime_ns FROM runs WHERE folder = ? OR folder LIKE ? ESCAPE '\\'",
+            (folder, _escape_like(os.path.join(folder, "")) + "%"))}
+
+        changed = []
+        present = set()
+        stat_errors = []
+        for file_path in run_files(folder):
+            try:
+                stat = os.stat(file_path)
+            except OSError as e:
+                stat_errors.append(f"{os.path.basename(file_path)}: {e}")
+                if os.path.lexists(file_path):
+                    # Locked, not deleted: keep its row until it can be read again
+                    present.add(file_path)
+                continue
+            present.add(file_path)
+            if known.get(file_path) != (stat.st_size, stat.st_mtime_ns):
+                changed.append(file_path)
+
+        removed = [path for path in known if path not in present]
+        with self.db:
+            self.db.executemany("DELETE FROM runs WHERE path = ?", [(path,) for path in removed])
+
+        indexed, errors = self.add_files(changed, cache, jobs, progress)
+        return indexed, len(removed), stat_errors + errors
+
+    def add_files(self, file_paths, cache=None, jobs=None, progress=None):
+        """Index (or re-index) specific run files; returns (indexed, errors)"""
+        cache = cache or ParseCache()
+        errors = []
+        indexed = 0
+        run_paths = self._run_paths([os.path.abspath(path) for path in file_paths], cache, jobs, errors, progress)
+        for start in range(0, len(run_paths), SCAN_CHUNK):
+            indexed += self._index_chunk(run_paths[start:start + SCAN_CHUNK], errors)
+        cache.save()
+        return indexed, errors
+
+    def _run_paths(self, file_paths, cache, jobs, errors, progress):
+        """[(file path, .pfr path)] for each file, parsing uncached xlsx files in worker processes"""
+        run_paths = []
+        pending = []
+        for file_path in file_paths:
+            if file_path.lower().endswith(RUN_SUFFIX):
+                run_paths.append((file_path, file_path))
+                continue
+            run_path = cache.lookup(file_path)
+            if run_path is None:
+                pending.append(file_path)
+            else:
+                run_paths.append((file_path, run_path))
+        if progress:
+            progress(len(run_paths), len(file_paths))
+
+        workers = min(len(pending), jobs or os.cpu_count() or 1)
+        if workers == 1:
+            # A single parser: no point starting a worker process
+            for file_path in pending:
+                try:
+                    run_paths.append((file_path, cache.store(file_path, *read_xlsx(file_path))))
+                except Exception as e:
+                    errors.append(f"{os.path.basename(file_path)}: {e}")
+                if progress:
+                    progress(len(run_paths) + len(errors), len(file_paths))
+        elif workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [(file_path, executor.submit(convert_xlsx, file_path, cache.run_path_for(file_path)))
+                           for file_path in pending]
+                for file_path, future in futures:
+                    try:
+                        run_paths.append((file_path, cache.add(file_path, future.result())))
+                    except Exception as e:
+                        errors.append(f"{os.path.basename(file_path)}: {e}")
+                    if progress:
+                        progress(len(run_paths) + len(errors), len(file_paths))
+        return run_paths
+
+    def _index_chunk(self, run_paths, errors):
+        """Summarise a chunk of runs in one analyze_runs() pass and store their rows"""
+        runs = []
+        for file_path, run_path in run_paths:
+            try:
+                run = load_run(run_path)
+                runs.append((file_path, run, run_series(run)))
+            except Exception as e:
+                errors.append(f"{os.path.basename(file_path)}: {e}")
+        statistics = analyze_runs([series for _, _, series in runs])
+
+        records = []
+        for (file_path, run, _), stats in zip(runs, statistics):
+            try:
+                stat = os.stat(file_path)
+            except OSError as e:
+                # Deleted or locked since it was listed
+                errors.append(f"{os.path.basename(file_path)}: {e}")
+                continue
+            settings = {str(name): value for name, value in run.settings}
+            part_number = settings.get("Part Number")
+            records.append((
+                file_path, os.path.dirname(file_path), os.path.basename(file_path),
+                stat.st_size, stat.st_mtime_ns,
+                str(part_number) if part_number is not None else None,
+                _timestamp(settings, file_path),
+                settings.get("Station"),
+                json.dumps(run.settings, default=str),
+                run.rows,
+                *[_number(stats[name]) for name in STAT_COLUMNS],
+                _number(settings.get("Leak Rate (PSI/s)")),
+                time.time(),
+            ))
+        columns = ["path", "folder", "filename", "size", "mtime_ns", "part_number", "timestamp",
+                   "station", "settings", "rows", *STAT_COLUMNS, "leak_rate", "indexed_at"]
+        with self.db:
+            self.db.executemany(
+                f"INSERT OR REPLACE INTO runs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                records)
+        return len(records)
+
+    def search(self, part=None, since=None, until=None, station=None, limit=1000):
+        """Runs matching every given filter, newest first, as sqlite3.Row objects.
+
+        `part` may use * and ? wildcards; without them it matches anywhere in
+        the part number. `since`/`until` are 'YYYY-MM-DD[ HH:MM]' (inclusive).
+        """
+        clauses = []
+        values = []
+        if part:
+            clauses.append("part_number LIKE ? ESCAPE '\\'")
+            values.append(_like_pattern(part))
+        if since:
+            clauses.append("timestamp >= ?")
+            values.append(_date_bound(since))
+        if until:
+            clauses.append("timestamp <= ?")
+            values.append(_date_bound(until, end=True))
+        if station:
+            clauses.append("station LIKE ? ESCAPE '\\'")
+            values.append(_like_pattern(station))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        values.append(limit)
+        return self.db.execute(f"SELECT * FROM runs {where} ORDER BY timestamp DESC LIMIT ?", values).fetchall()
+
+
+def _format(value, digits):
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Index and search pressure flow test runs")
+    parser.add_argument("--index", default=INDEX_PATH, help="index database (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    scan = commands.add_parser("scan", help="index new and changed runs under folders")
+    scan.add_argument("folders", nargs="+")
+    scan.add_argument("--jobs", type=int, default=None, help="parser processes (default: one per CPU)")
+    search = commands.add_parser("search", help="list indexed runs")
+    search.add_argument("--part", help="part number, * and ? wildcards")
+    search.add_argument("--since", help="YYYY-MM-DD[ HH:MM]")
+    search.add_argument("--until", help="YYYY-MM-DD[ HH:MM]")
+    search.add_argument("--station")
+    search.add_argument("--limit", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    index = RunIndex(args.index)
+    try:
+        if args.command == "scan":
+            failed = False
+            for folder in args.folders:
+                started = time.perf_counter()
+                indexed, removed, errors = index.scan(folder, jobs=args.jobs)
+                for error in errors:
+                    print(error, file=sys.stderr)
+                failed = failed or bool(errors)
+                print(f"{folder}: {indexed} indexed, {removed} removed, {len(errors)} failed "
+                      f"({time.perf_counter() - started:.1f} s)")
+            return 1 if failed else 0
+
+        try:
+            rows = index.search(args.part, args.since, args.until, args.station, args.limit)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        for row in rows:
+            print(f"{row['timestamp']}  {row['part_number'] or '-':<16} {row['station'] or '-':<10} "
+                  f"slope {_format(row['decay_slope'], 4):>8}  flow A {_format(row['flow_a_mean'], 3):>7}  "
+                  f"{row['path']}")
+        return 0
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
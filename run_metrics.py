@@ -0,0 +1,215 @@
+# Run metrics for the Pressure Flow Test
+# Cheap, always-on instrumentation of where a run's time goes:
+# - Transaction latency per device (AlicatBus), kept as a fixed log-spaced
+#   histogram so every transaction costs one bisect and a few additions
+# - Stage timings: setup, stabilize and record per phase, plus the GUI's
+#   draw and save; "sleep" is the time spent in the sequence's waits, which
+#   is also counted in the stage the wait belongs to
+# - Achieved vs requested sample interval per phase, with jitter (standard
+#   deviation of the interval), accumulated in constant time per sample
+# - Each sample's lateness against its SampleClock deadline (acquisition.py),
+#   and the number of overrun slots that were skipped; the per-sample
+#   lateness is kept for the metrics file
+# The summary goes into the run's Settings sheet; the full metrics, histogram
+# buckets included, are written next to the xlsx as {part}_{timestamp}.metrics.json
+
+import bisect
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+
+METRICS_SUFFIX = ".metrics.json"
+
+# Histogram bucket upper bounds in seconds: 0.1 ms to ~6.5 s, 8 per decade
+LATENCY_BUCKETS = tuple(1e-4 * 10 ** (i / 8) for i in range(39))
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with exact count/mean/min/max"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.failures = 0
+
+    def add(self, seconds, ok=True):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        if not ok:
+            self.failures += 1
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (0-100)"""
+        if not self.count:
+            return 0.0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(LATENCY_BUCKETS[i], self.max) if i < len(LATENCY_BUCKETS) else self.max
+        return self.max
+
+    def summary(self):
+        mean = self.total / self.count if self.count else 0.0
+        return {
+            'count': self.count,
+            'failures': self.failures,
+            'mean': mean,
+            'min': self.min if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': self.max,
+            'buckets': [[bound, count] for bound, count in zip(LATENCY_BUCKETS + (None,), self.counts) if count],
+        }
+
+
+class IntervalStats:
+    """Achieved sample interval vs the requested one (Welford mean/variance)"""
+
+    def __init__(self, requested):
+        self.requested = requested
+        self.last = None
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.late = []  # per sample: seconds behind its deadline
+        self.late_total = 0.0
+        self.late_max = 0.0
+        self.skipped = 0
+
+    def add(self, elapsed, lateness=0.0):
+        self.late.append(lateness)
+        self.late_total += lateness
+        self.late_max = max(self.late_max, lateness)
+        if self.last is not None:
+            interval = elapsed - self.last
+            self.count += 1
+            delta = interval - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (interval - self.mean)
+            self.min = min(self.min, interval)
+            self.max = max(self.max, interval)
+        self.last = elapsed
+
+    @property
+    def jitter(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def summary(self):
+        return {
+            'requested': self.requested,
+            'intervals': self.count,
+            'mean': self.mean,
+            'jitter': self.jitter,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'rate_hz': 1.0 / self.mean if self.mean > 0 else 0.0,
+            'late_mean': self.late_total / len(self.late) if self.late else 0.0,
+            'late_max': self.late_max,
+            'skipped': self.skipped,
+            'lateness_ms': [round(seconds * 1e3, 2) for seconds in self.late],
+        }
+
+
+class RunMetrics:
+    """Everything measured during one run; safe to feed from the worker and the GUI"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.transactions = {}  # device -> LatencyHistogram
+        self.stages = {}  # name -> [total seconds, count, max seconds]
+        self.intervals = {}  # phase -> IntervalStats
+        self.started = time.time()
+
+    def transaction(self, device, seconds, ok=True):
+        """One bus transaction with `device` took `seconds`"""
+        histogram = self.transactions.get(device)
+        if histogram is None:
+            histogram = self.transactions[device] = LatencyHistogram()
+        histogram.add(seconds, ok)
+
+    def add_stage(self, name, seconds):
+        with self.lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                self.stages[name] = [seconds, 1, seconds]
+            else:
+                stage[0] += seconds
+                stage[1] += 1
+                stage[2] = max(stage[2], seconds)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time the enclosed block as (part of) stage `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def sample(self, phase, elapsed, requested, lateness=0.0):
+        """A recorded sample of `phase` at `elapsed` seconds, `lateness` seconds after its deadline;
+        `requested` is the target interval"""
+        stats = self.intervals.get(phase)
+        if stats is None:
+            stats = self.intervals[phase] = IntervalStats(requested)
+        stats.add(elapsed, lateness)
+
+    def overruns(self, phase, skipped):
+        """`skipped` sample slots of `phase` were dropped because a sample overran"""
+        if phase in self.intervals:
+            self.intervals[phase].skipped += skipped
+
+    def summary(self):
+        with self.lock:
+            stages = {name: {'seconds': total, 'count': count, 'max': longest}
+                      for name, (total, count, longest) in self.stages.items()}
+        return {
+            'started': self.started,
+            'transactions': {device: h.summary() for device, h in sorted(self.transactions.items())},
+            'stages': stages,
+            'intervals': {phase: stats.summary() for phase, stats in self.intervals.items()},
+        }
+
+    def settings_rows(self):
+        """(name, value) rows summarising the run for the Settings sheet"""
+        rows = []
+        for device, histogram in sorted(self.transactions.items()):
+            s = histogram.summary()
+            rows.append((f"{device} Latency (ms)",
+                         f"mean {s['mean'] * 1e3:.1f}, p95 {s['p95'] * 1e3:.1f}, max {s['max'] * 1e3:.1f} "
+                         f"({s['count']} transactions, {s['failures']} failed)"))
+        for phase, stats in self.intervals.items():
+            s = stats.summary()
+            rows.append((f"{phase} Interval (s)",
+                         f"requested {s['requested']:.3f}, achieved {s['mean']:.3f}, "
+                         f"jitter {s['jitter']:.4f} ({s['rate_hz']:.1f} Hz), late mean "
+                         f"{s['late_mean'] * 1e3:.1f} ms, max {s['late_max'] * 1e3:.1f} ms, "
+                         f"{s['skipped']} skipped"))
+        with self.lock:
+            stages = list(self.stages.items())
+        if stages:
+            rows.append(("Stage Times (s)", ", ".join(f"{name} {total:.2f}" for name, (total, _, _) in stages)))
+        return rows
+
+    def write(self, excel_path):
+        """Write the metrics file next to the run's xlsx; returns its path"""
+        metrics_path = os.path.splitext(excel_path)[0] + METRICS_SUFFIX
+        temp_path = metrics_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.summary(), file, indent=1)
+        os.replace(temp_path, metrics_path)
+        return metrics_path
@@ -0,0 +1,125 @@
+# Run Recorder
+# Streams a test run to disk with bounded per-sample cost.
+# - Every Settings/Data row is appended to a JSON-lines journal next to the
+#   target file ({part}_{timestamp}.xlsx.journal) and flushed immediately,
+#   so a crash loses at most the row being written
+# - finish() builds the usual Settings/Data xlsx once, in openpyxl
+#   write-only mode, writes it to a temp file and renames it into place
+# - With binary=True a columnar .pfr copy is written too (run_format.py)
+# - A journal left behind by a crash can be turned into an xlsx with:
+#       python run_recorder.py recover <file.xlsx.journal> [...]
+
+import json
+import os
+import sys
+import time
+
+from run_format import RUN_SUFFIX, write_run
+
+JOURNAL_SUFFIX = ".journal"
+
+# Data sheet header row
+DATA_HEADER = ["Phase", "Time (s)", "A Pressure (PSI)", "B Pressure (PSI)",
+               "A Flow (SLPM)", "B Flow (SLPM)"]
+
+# Journal lines are flushed per row; fsync at most this often (seconds)
+FSYNC_INTERVAL = 1.0
+
+
+class RunRecorder:
+    """Append-only recorder for one run's Settings and Data rows"""
+
+    def __init__(self, excel_path, binary=False):
+        self.excel_path = excel_path
+        self.binary = binary
+        self.journal_path = excel_path + JOURNAL_SUFFIX
+        self.journal = open(self.journal_path, "w", encoding="utf-8")
+        self.rows = 0
+        self._last_sync = time.monotonic()
+        self.add_setting("Setting", "Value")
+        self.add_row(DATA_HEADER)
+
+    def _write(self, sheet, values):
+        self.journal.write(json.dumps([sheet] + list(values)) + "\n")
+        self.journal.flush()
+        now = time.monotonic()
+        if now - self._last_sync >= FSYNC_INTERVAL:
+            os.fsync(self.journal.fileno())
+            self._last_sync = now
+
+    def add_setting(self, name, value):
+        """Append a row to the Settings sheet"""
+        self._write("Settings", [name, value])
+
+    def add_row(self, row):
+        """Append a row to the Data sheet"""
+        self._write("Data", row)
+        self.rows += 1
+
+    def finish(self):
+        """Close the journal, build the xlsx and remove the journal"""
+        if not self.journal.closed:
+            self.journal.close()
+        build_workbook(self.journal_path, self.excel_path)
+        if self.binary:
+            write_run(os.path.splitext(self.excel_path)[0] + RUN_SUFFIX,
+                      *journal_contents(self.journal_path))
+        os.remove(self.journal_path)
+        return self.excel_path
+
+
+def read_journal(journal_path):
+    """Yield (sheet, values) pairs from a journal, stopping at a torn last line"""
+    with open(journal_path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            yield entry[0], entry[1:]
+
+
+def journal_contents(journal_path):
+    """Return (settings, rows) from a journal, without the header rows"""
+    settings, rows = [], []
+    for sheet, values in read_journal(journal_path):
+        if sheet == "Settings":
+            settings.append(values)
+        else:
+            rows.append(values)
+    return settings[1:], rows[1:]
+
+
+def build_workbook(journal_path, excel_path):
+    """Write the Settings/Data xlsx for a journal in a single pass"""
+    # Imported on first use (the Finalizer thread), not while the GUI starts
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheets = {
+        "Settings": workbook.create_sheet(title="Settings"),
+        "Data": workbook.create_sheet(title="Data"),
+    }
+    for sheet, values in read_journal(journal_path):
+        sheets[sheet].append(values)
+
+    # Save beside the target and rename, so readers never see a half-written file
+    temp_path = excel_path + ".tmp"
+    workbook.save(temp_path)
+    os.replace(temp_path, excel_path)
+
+
+def recover(journal_path):
+    """Rebuild the xlsx for a journal left behind by an interrupted run"""
+    excel_path = journal_path[:-len(JOURNAL_SUFFIX)]
+    build_workbook(journal_path, excel_path)
+    os.remove(journal_path)
+    return excel_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "recover":
+        print("usage: python run_recorder.py recover <file.xlsx.journal> [...]")
+        sys.exit(2)
+    for journal in sys.argv[2:]:
+        print(recover(journal))
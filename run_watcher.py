@@ -0,0 +1,207 @@
+# Run Watcher
+# Picks up runs as the benches finish them in a shared data folder, so the
+# plotter and the run index stay current without rescanning the archive.
+# - The folder is only listed when its modification time changes (a file was
+#   created, renamed or deleted); otherwise a poll is one stat() call
+# - Only names not seen before are considered, and only .xlsx/.pfr runs:
+#   temp files (.tmp), recorder journals and Office lock files (~$) are ignored
+# - A new file is ready once its recorder journal is gone and its size and
+#   mtime have held still for SETTLE_TIME (covers copies and sync clients)
+# - A .pfr copy holds the same run as the xlsx beside it; only the .pfr is
+#   reported
+# - RunIngester does the polling, parsing (through the ParseCache) and
+#   indexing on a background thread; the GUI collects finished runs with
+#   completed()
+#
+# Command line (keeps the run index current):
+#   python run_watcher.py <folder> [--existing]
+
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+from run_format import RUN_SUFFIX, read_xlsx
+from run_recorder import JOURNAL_SUFFIX
+from parse_cache import ParseCache
+from run_index import INDEX_PATH, RunIndex
+
+POLL_INTERVAL = 1.0  # seconds
+SETTLE_TIME = 2.0  # seconds a new file's size and mtime must hold still
+
+# A directory mtime this recent may hide a later change within the same
+# timestamp tick (coarse clocks on network shares), so list it again
+RACY_NS = 2 * 10 ** 9
+
+RUN_EXTENSIONS = (".xlsx", RUN_SUFFIX)
+
+
+def is_run_name(name):
+    """True for a finished-run file name (not a temp, journal or lock file)"""
+    lower = name.lower()
+    return not name.startswith(("~$", ".")) and lower.endswith(RUN_EXTENSIONS)
+
+
+class RunWatcher:
+    """Reports run files that appear in a folder once they have finished writing"""
+
+    def __init__(self, folder, settle_time=SETTLE_TIME, include_existing=False):
+        self.folder = folder
+        self.settle_time = settle_time
+        self.dir_mtime = None
+        self.seen = set()
+        self.pending = {}  # name -> ((size, mtime_ns), unchanged since) or None
+        if not include_existing:
+            self._list()
+
+    def _list(self):
+        """New names since the last listing"""
+        names = set(os.listdir(self.folder))
+        added = names - self.seen
+        # Forget deleted names, so a run written again under the same name is seen
+        self.seen = names
+        return added
+
+    def _journal_path(self, name):
+        stem, ext = os.path.splitext(name)
+        excel_name = stem + ".xlsx" if ext.lower() == RUN_SUFFIX else name
+        return os.path.join(self.folder, excel_name + JOURNAL_SUFFIX)
+
+    def poll(self, now=None):
+        """Paths of runs that became ready since the last poll"""
+        now = time.monotonic() if now is None else now
+        try:
+            dir_mtime = os.stat(self.folder).st_mtime_ns
+        except OSError:
+            return []
+        if dir_mtime != self.dir_mtime or time.time_ns() - dir_mtime < RACY_NS:
+            self.dir_mtime = dir_mtime
+            for name in self._list():
+                if is_run_name(name):
+                    self.pending[name] = None
+
+        ready = []
+        for name, entry in list(self.pending.items()):
+            path = os.path.join(self.folder, name)
+            if os.path.exists(self._journal_path(name)):
+                # The recorder removes its journal last
+                self.pending[name] = None
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Deleted or renamed before it settled
+                del self.pending[name]
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if entry is None or entry[0] != signature:
+                self.pending[name] = (signature, now)
+            elif now - entry[1] >= self.settle_time:
+                del self.pending[name]
+                ready.append(path)
+
+        # Skip an xlsx whose .pfr copy exists; the .pfr is reported on its own
+        return [path for path in ready if path.lower().endswith(RUN_SUFFIX)
+                or not os.path.exists(os.path.splitext(path)[0] + RUN_SUFFIX)]
+
+
+class RunIngester:
+    """Watches a folder on a background thread, parsing and indexing new runs"""
+
+    def __init__(self, folder, cache=None, index_path=None, interval=POLL_INTERVAL,
+                 settle_time=SETTLE_TIME, include_existing=False):
+        self.folder = folder
+        self.cache = cache or ParseCache()
+        self.index_path = index_path
+        self.interval = interval
+        self.watcher = RunWatcher(folder, settle_time, include_existing)
+        self.results = queue.Queue()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="run-watcher", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        self.thread.join(timeout)
+
+    def run(self):
+        index = None
+        if self.index_path:
+            # SQLite connections belong to their thread
+            index = RunIndex(self.index_path)
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    self.ingest(self.watcher.poll(), index)
+                except Exception as e:
+                    self.results.put((self.folder, None, e))
+                self.stop_event.wait(self.interval)
+        finally:
+            if index is not None:
+                index.close()
+
+    def ingest(self, file_paths, index=None):
+        """Parse new runs into the cache, index them and queue the results"""
+        if not file_paths:
+            return
+        parsed = []
+        for file_path in file_paths:
+            try:
+                if file_path.lower().endswith(RUN_SUFFIX):
+                    run_path = file_path
+                else:
+                    run_path = self.cache.lookup(file_path) or self.cache.store(file_path, *read_xlsx(file_path))
+                parsed.append((file_path, run_path))
+            except Exception as e:
+                self.results.put((file_path, None, e))
+        self.cache.save()
+        if index is not None and parsed:
+            _, errors = index.add_files([file_path for file_path, _ in parsed], self.cache)
+            for error in errors:
+                self.results.put((self.folder, None, error))
+        for file_path, run_path in parsed:
+            self.results.put((file_path, run_path, None))
+
+    def completed(self):
+        """Return [(file path, .pfr path or None, error or None)] for runs ingested since the last call"""
+        results = []
+        while True:
+            try:
+                results.append(self.results.get_nowait())
+            except queue.Empty:
+                return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Index new pressure flow test runs as they are written")
+    parser.add_argument("folder")
+    parser.add_argument("--index", default=INDEX_PATH, help="index database (default: %(default)s)")
+    parser.add_argument("--existing", action="store_true", help="also ingest runs already in the folder")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="seconds between polls")
+    args = parser.parse_args(argv)
+
+    ingester = RunIngester(args.folder, index_path=args.index, interval=args.interval,
+                           include_existing=args.existing)
+    ingester.start()
+    print(f"Watching {args.folder} (Ctrl+C to stop)")
+    try:
+        while ingester.thread.is_alive():
+            time.sleep(args.interval)
+            for file_path, _, error in ingester.completed():
+                if error is None:
+                    print(file_path)
+                else:
+                    print(f"{file_path}: {error}", file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ingester.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
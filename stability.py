@@ -0,0 +1,67 @@
+# Pressure stability detection for the stabilize steps
+# Instead of always waiting PRESSURIZE_TIME, the worker polls Alicat A and
+# moves on once the pressure over the last STABILITY_WINDOW seconds is
+# - on setpoint:  |mean - setpoint| <= STABILITY_TOLERANCE (PSI)
+# - flat:         |least-squares slope| <= STABILITY_SLOPE (PSI/s)
+# - quiet:        standard deviation <= STABILITY_STD (PSI)
+# PRESSURIZE_TIME remains the upper bound. Window sums are updated as
+# samples enter and leave, so each sample costs O(1).
+
+import collections
+import math
+
+
+class StabilityDetector:
+    """Rolling-window slope/deviation check of pressure against a setpoint"""
+
+    def __init__(self, setpoint, window=1.0, tolerance=0.1, max_slope=0.05, max_std=0.05, min_samples=5):
+        self.setpoint = setpoint
+        self.window = window
+        self.tolerance = tolerance
+        self.max_slope = max_slope
+        self.max_std = max_std
+        self.min_samples = min_samples
+        self.samples = collections.deque()
+        self.origin = None
+        self.sums = [0.0] * 5  # t, p, t*t, t*p, p*p
+
+    def _update(self, t, p, sign):
+        sums = self.sums
+        sums[0] += sign * t
+        sums[1] += sign * p
+        sums[2] += sign * t * t
+        sums[3] += sign * t * p
+        sums[4] += sign * p * p
+
+    def add(self, t, pressure):
+        """Add a reading at time t (seconds); returns True once the window is stable"""
+        if self.origin is None:
+            self.origin = t
+        t -= self.origin
+        self.samples.append((t, pressure))
+        self._update(t, pressure, 1)
+        # Drop samples while the rest still spans the whole window
+        while len(self.samples) > 2 and t - self.samples[1][0] >= self.window:
+            self._update(*self.samples.popleft(), -1)
+        return self.stable()
+
+    def stats(self):
+        """(mean, slope, std) of the current window"""
+        n = len(self.samples)
+        if n == 0:
+            return math.nan, math.nan, math.nan
+        st, sp, stt, stp, spp = self.sums
+        mean = sp / n
+        var_t = stt - st * st / n
+        slope = (stp - st * sp / n) / var_t if var_t > 1e-12 else 0.0
+        var_p = max(spp - sp * sp / n, 0.0) / max(n - 1, 1)
+        return mean, slope, math.sqrt(var_p)
+
+    def stable(self):
+        if len(self.samples) < self.min_samples:
+            return False
+        if self.samples[-1][0] - self.samples[0][0] < self.window:
+            return False
+        mean, slope, std = self.stats()
+        return (abs(mean - self.setpoint) <= self.tolerance and abs(slope) <= self.max_slope
+                and std <= self.max_std)
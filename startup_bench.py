@@ -0,0 +1,121 @@
+# Startup benchmark for the recorder, the plotter and the headless runner
+# Each entry point is imported in a fresh interpreter, several times, and the
+# best time is checked against its budget. Modules that have to stay
+# deferred (loaded in the background or on first use, deferred_imports.py)
+# fail the check if the import pulls them in anyway.
+# With a display, --gui also times each window from Tk() until it is drawn,
+# and reports how long the background preload took after that.
+#
+#   python startup_bench.py [--runs 5] [--gui] [--scale 2.0]
+#
+# --scale multiplies every budget, for slower PCs. Exit code 1 if a budget or
+# a deferred-module rule is broken.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# module -> (import budget in seconds, modules it must not import at load)
+IMPORT_BUDGETS = {
+    "Pressure_Flow_v2": (0.25, ("matplotlib", "openpyxl", "numpy")),
+    "plot_test_data": (0.35, ("matplotlib", "openpyxl")),
+    "pressure_flow_cli": (0.25, ("tkinter", "matplotlib", "openpyxl", "numpy")),
+}
+
+# (module, app class, constructor arguments after root, window budget in seconds).
+# The recorder gets a port that cannot open, which must not delay the window.
+GUI_BUDGETS = [
+    ("Pressure_Flow_v2", "DualAlicatTestApp", [["Bench:startup-bench-no-port"]], 0.6),
+    ("plot_test_data", "DataPlottingApp", [], 0.6),
+]
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "modules": sorted(sys.modules)}))
+"""
+
+GUI_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import tkinter as tk
+module = __import__(sys.argv[1])
+root = tk.Tk()
+app = getattr(module, sys.argv[2])(root, *json.loads(sys.argv[3]))
+root.update()
+seconds = time.perf_counter() - start
+import threading, deferred_imports
+for thread in threading.enumerate():
+    if thread.name == "preload":
+        thread.join()
+root.destroy()
+print(json.dumps({"seconds": seconds, "preload": sum(deferred_imports.IMPORT_TIMES.values())}))
+"""
+
+
+def probe(code, *args):
+    """Run a probe in a fresh interpreter from the repository folder; returns its JSON result"""
+    folder = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, "-c", code, *args], cwd=folder, capture_output=True,
+                            text=True, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "probe failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def loaded(modules, name):
+    return name in modules or any(module.startswith(name + ".") for module in modules)
+
+
+def bench_imports(runs, scale):
+    """Print and check import times; returns the number of failures"""
+    failures = 0
+    print(f"{'Import':<20}{'best (s)':>10}{'budget (s)':>12}  deferred modules loaded")
+    for module, (budget, deferred) in IMPORT_BUDGETS.items():
+        results = [probe(IMPORT_PROBE, module) for _ in range(runs)]
+        best = min(result["seconds"] for result in results)
+        early = [name for name in deferred if loaded(results[0]["modules"], name)]
+        ok = best <= budget * scale and not early
+        failures += not ok
+        print(f"{module:<20}{best:>10.3f}{budget * scale:>12.3f}  {', '.join(early) or '-'}"
+              f"{'' if ok else '  FAIL'}")
+    return failures
+
+
+def bench_windows(runs, scale):
+    """Print and check time to a drawn window; returns the number of failures"""
+    failures = 0
+    print(f"\n{'Window':<20}{'best (s)':>10}{'budget (s)':>12}{'preload (s)':>13}")
+    for module, app_class, args, budget in GUI_BUDGETS:
+        results = [probe(GUI_PROBE, module, app_class, json.dumps(args)) for _ in range(runs)]
+        best = min(results, key=lambda result: result["seconds"])
+        ok = best["seconds"] <= budget * scale
+        failures += not ok
+        print(f"{module:<20}{best['seconds']:>10.3f}{budget * scale:>12.3f}{best['preload']:>13.3f}"
+              f"{'' if ok else '  FAIL'}")
+    return failures
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Check startup times against their budgets")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per entry point")
+    parser.add_argument("--gui", action="store_true", help="also time the windows (needs a display)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget")
+    args = parser.parse_args(argv)
+
+    try:
+        failures = bench_imports(args.runs, args.scale)
+        if args.gui:
+            failures += bench_windows(args.runs, args.scale)
+    except RuntimeError as e:
+        print(f"Probe failed: {e}", file=sys.stderr)
+        return 1
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,71 @@
+# Test stations for the Pressure Flow Test recorder
+# A station is one bench: its own serial line (BB9 with an Alicat A/B pair),
+# part number, output file and acquisition run. Any number of stations run
+# concurrently on one shared Scheduler (acquisition.py).
+#
+# Stations are configured in Test.ini or on the command line as a comma
+# separated list of ports, optionally named:
+#   STATIONS=Bench 1:COM23, Bench 2:COM24
+#   python Pressure_Flow_v2.py COM23 COM24
+# Without either, there is a single station on the default port.
+
+import datetime
+import os
+import queue
+import re
+
+from acquisition import SampleRing
+
+
+def parse_stations(entries):
+    """['Bench 1:COM23', 'COM24'] or 'Bench 1:COM23, COM24' -> [(name, port)]"""
+    if isinstance(entries, str):
+        entries = entries.split(',')
+    stations = []
+    for entry in entries:
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, port = entry.rpartition(':')
+        if not name or len(name) == 1:
+            # No name, or a drive-letter style path
+            name, port = "", entry
+        stations.append((name.strip() or f"Station {len(stations) + 1}", port.strip()))
+    return stations
+
+
+class Station:
+    """State of one bench: port, current run and its buffers"""
+
+    def __init__(self, name, port):
+        self.name = name
+        self.port = port
+        self.ser = None
+        self.error = None  # why the port last failed to open
+        self.connecting = False  # a background open of the port is in progress
+        self.worker = None
+        self.recorder = None
+        self.metrics = None
+        self.recipe = None  # Recipe of the current or last run (recipes.py)
+        self.excel_path = None
+        self.batch_run = False  # the current run was started from the batch queue
+        self.samples = SampleRing()
+        self.events = queue.Queue()
+        self.recorded = []  # this run's recorded samples, for replaying the live plot
+        self.vars = {}  # Tk variables of the station's status row
+        self.widgets = {}  # its Start/Stop buttons, when it has its own
+
+    @property
+    def busy(self):
+        return self.worker is not None
+
+    @property
+    def tag(self):
+        """Station name made safe for a file name"""
+        return re.sub(r'[^A-Za-z0-9_-]+', '_', self.name).strip('_')
+
+    def output_path(self, folder, part_number, tagged=False):
+        """{part}_{timestamp}.xlsx in `folder`, with the station tag if `tagged`"""
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        suffix = f"_{self.tag}" if tagged else ""
+        return os.path.join(folder, f"{part_number}_{timestamp}{suffix}.xlsx"), timestamp
@@ -0,0 +1,120 @@
+# Compact trace storage for the data plotter
+# Each loaded run is one Trace: float32 arrays (the memory-mapped .pfr
+# columns are float32 already, so they are kept without copying) plus the
+# length and time/pressure extremes computed once when the run is loaded.
+# TraceSet keeps the loaded runs in load order and maintains the global axis
+# limits as runs are added and removed, so a redraw never scans the samples:
+# - add: the new trace's extremes are folded into the limits
+# - remove: the limits are only recomputed (from the per-trace extremes, not
+#   the samples) when the removed trace held one of them
+
+import math
+
+import numpy as np
+
+# Flow series of a run, as run_analytics.run_series returns them
+FLOW_SERIES = ('flow_test_a', 'flow_test_b', 'decay_flow_a', 'decay_flow_b')
+
+
+def compact(values):
+    """float32 array of values; float32 arrays and memmaps are not copied"""
+    return np.asarray(values, dtype=np.float32)
+
+
+class Trace:
+    """One loaded run: decay trace, per-phase flows, plot color and statistics"""
+
+    __slots__ = ('time', 'pressure', 'flow_test_a', 'flow_test_b', 'decay_flow_a', 'decay_flow_b',
+                 'color', 'stats', 'length', 't_min', 't_max', 'p_min', 'p_max')
+
+    def __init__(self, time_data, pressure_data, flows, color):
+        self.time = compact(time_data)
+        self.pressure = compact(pressure_data)
+        for name in FLOW_SERIES:
+            setattr(self, name, compact(flows.get(name, ())))
+        self.color = color
+        self.stats = None  # filled in by the plotter, for all new runs in one pass
+        self.length = min(len(self.time), len(self.pressure))
+        if self.length:
+            # Time is sorted; the pressure extremes are the only pass over the samples
+            self.t_min, self.t_max = float(self.time[0]), float(self.time[self.length - 1])
+            self.p_min, self.p_max = float(self.pressure.min()), float(self.pressure.max())
+        else:
+            self.t_min = self.t_max = self.p_min = self.p_max = math.nan
+
+    def __getitem__(self, name):
+        """Series by name, so analyze_runs can read a Trace like run_series' dict"""
+        return getattr(self, name)
+
+
+class TraceSet:
+    """Loaded traces by name, in load order, with incrementally maintained axis limits"""
+
+    def __init__(self):
+        self.traces = {}
+        self._reset_limits()
+
+    def _reset_limits(self):
+        self.t_min = self.p_min = math.inf
+        self.t_max = self.p_max = -math.inf
+
+    def _include(self, trace):
+        if trace.length:
+            self.t_min = min(self.t_min, trace.t_min)
+            self.t_max = max(self.t_max, trace.t_max)
+            self.p_min = min(self.p_min, trace.p_min)
+            self.p_max = max(self.p_max, trace.p_max)
+
+    def add(self, name, trace):
+        if name in self.traces:
+            self.remove(name)
+        self.traces[name] = trace
+        self._include(trace)
+
+    def remove(self, name):
+        trace = self.traces.pop(name)
+        if trace.length and (trace.t_min <= self.t_min or trace.t_max >= self.t_max
+                             or trace.p_min <= self.p_min or trace.p_max >= self.p_max):
+            self._reset_limits()
+            for other in self.traces.values():
+                self._include(other)
+        return trace
+
+    def clear(self):
+        self.traces.clear()
+        self._reset_limits()
+
+    def time_range(self):
+        """(min, max) time over all traces, or None when no trace has samples"""
+        return (self.t_min, self.t_max) if self.t_min <= self.t_max else None
+
+    def pressure_range(self):
+        """(min, max) pressure over all traces, or None when no trace has samples"""
+        return (self.p_min, self.p_max) if self.p_min <= self.p_max else None
+
+    def __len__(self):
+        return len(self.traces)
+
+    def __contains__(self, name):
+        return name in self.traces
+
+    def __iter__(self):
+        return iter(self.traces)
+
+    def __getitem__(self, name):
+        return self.traces[name]
+
+    def __delitem__(self, name):
+        self.remove(name)
+
+    def get(self, name, default=None):
+        return self.traces.get(name, default)
+
+    def keys(self):
+        return self.traces.keys()
+
+    def values(self):
+        return self.traces.values()
+
+    def items(self):
+        return self.traces.items()